@@ -0,0 +1,52 @@
+#
+# This file is part of Invenio.
+# Copyright (C) 2016-2018 CERN.
+#
+# Invenio is free software; you can redistribute it and/or modify it
+# under the terms of the MIT License; see LICENSE file for more details.
+
+"""Create the ``records_citations`` table.
+
+The table is created empty, run ``inspirehep citations backfill`` to fill
+it from the references of the existing records.
+"""
+
+from __future__ import absolute_import, division, print_function
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy_utils.types import UUIDType
+
+
+# revision identifiers, used by Alembic.
+revision = '1c4c5996712d'
+down_revision = '0bc0a6ee1bc0'
+branch_labels = ()
+depends_on = None
+
+
+def upgrade():
+    """Upgrade database."""
+    op.create_table(
+        'records_citations',
+        sa.Column(
+            'citer_id',
+            UUIDType,
+            sa.ForeignKey('records_metadata.id', ondelete='CASCADE'),
+            nullable=False,
+        ),
+        sa.Column('cited_pid_type', sa.String(6), nullable=False),
+        sa.Column('cited_pid_value', sa.String(255), nullable=False),
+        sa.PrimaryKeyConstraint('citer_id', 'cited_pid_type', 'cited_pid_value'),
+    )
+    op.create_index(
+        'ix_records_citations_cited',
+        'records_citations',
+        ['cited_pid_type', 'cited_pid_value'],
+    )
+
+
+def downgrade():
+    """Downgrade database."""
+    op.drop_index('ix_records_citations_cited', 'records_citations')
+    op.drop_table('records_citations')
@@ -0,0 +1,39 @@
+#
+# This file is part of Invenio.
+# Copyright (C) 2016-2018 CERN.
+#
+# Invenio is free software; you can redistribute it and/or modify it
+# under the terms of the MIT License; see LICENSE file for more details.
+
+"""Add the ``error_signature`` column to ``legacy_records_mirror``."""
+
+from __future__ import absolute_import, division, print_function
+
+import sqlalchemy as sa
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'a7f1d3c5e9b2'
+down_revision = '1c4c5996712d'
+branch_labels = ()
+depends_on = None
+
+
+def upgrade():
+    """Upgrade database."""
+    op.add_column(
+        'legacy_records_mirror',
+        sa.Column('error_signature', sa.String(40), nullable=True),
+    )
+    op.create_index(
+        'ix_legacy_records_mirror_error_signature',
+        'legacy_records_mirror',
+        ['error_signature'],
+    )
+
+
+def downgrade():
+    """Downgrade database."""
+    op.drop_index('ix_legacy_records_mirror_error_signature', 'legacy_records_mirror')
+    op.drop_column('legacy_records_mirror', 'error_signature')
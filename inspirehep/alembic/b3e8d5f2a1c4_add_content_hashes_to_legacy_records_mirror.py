@@ -0,0 +1,38 @@
+#
+# This file is part of Invenio.
+# Copyright (C) 2016-2018 CERN.
+#
+# Invenio is free software; you can redistribute it and/or modify it
+# under the terms of the MIT License; see LICENSE file for more details.
+
+"""Add the content hash columns to ``legacy_records_mirror``."""
+
+from __future__ import absolute_import, division, print_function
+
+import sqlalchemy as sa
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'b3e8d5f2a1c4'
+down_revision = 'a7f1d3c5e9b2'
+branch_labels = ()
+depends_on = None
+
+
+def upgrade():
+    """Upgrade database."""
+    op.add_column(
+        'legacy_records_mirror',
+        sa.Column('content_hash', sa.String(40), nullable=True),
+    )
+    op.add_column(
+        'legacy_records_mirror',
+        sa.Column('migrated_hash', sa.String(40), nullable=True),
+    )
+
+
+def downgrade():
+    """Downgrade database."""
+    op.drop_column('legacy_records_mirror', 'migrated_hash')
+    op.drop_column('legacy_records_mirror', 'content_hash')
@@ -0,0 +1,54 @@
+#
+# This file is part of Invenio.
+# Copyright (C) 2016-2018 CERN.
+#
+# Invenio is free software; you can redistribute it and/or modify it
+# under the terms of the MIT License; see LICENSE file for more details.
+
+"""Create the ``workflows_step_timing`` table."""
+
+from __future__ import absolute_import, division, print_function
+
+import sqlalchemy as sa
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'c5a9e2d7f3b1'
+down_revision = 'b3e8d5f2a1c4'
+branch_labels = ()
+depends_on = None
+
+
+def upgrade():
+    """Upgrade database."""
+    op.create_table(
+        'workflows_step_timing',
+        sa.Column('id', sa.Integer, primary_key=True, autoincrement=True),
+        sa.Column('created', sa.DateTime, nullable=False),
+        sa.Column(
+            'object_id',
+            sa.Integer,
+            sa.ForeignKey('workflows_object.id', ondelete='CASCADE'),
+            nullable=False,
+        ),
+        sa.Column('workflow', sa.String(255), nullable=False),
+        sa.Column('step', sa.String(255), nullable=False),
+        sa.Column('wall_time', sa.Float, nullable=False),
+        sa.Column('cpu_time', sa.Float, nullable=False),
+        sa.Column('rss_delta', sa.Integer, nullable=False),
+        sa.Column('http_calls', sa.Integer, nullable=False),
+        sa.Column('es_calls', sa.Integer, nullable=False),
+        sa.Column('db_calls', sa.Integer, nullable=False),
+    )
+    op.create_index(
+        'ix_workflows_step_timing_object_id',
+        'workflows_step_timing',
+        ['object_id'],
+    )
+
+
+def downgrade():
+    """Downgrade database."""
+    op.drop_index('ix_workflows_step_timing_object_id', 'workflows_step_timing')
+    op.drop_table('workflows_step_timing')
@@ -0,0 +1,104 @@
+#
+# This file is part of Invenio.
+# Copyright (C) 2016-2018 CERN.
+#
+# Invenio is free software; you can redistribute it and/or modify it
+# under the terms of the MIT License; see LICENSE file for more details.
+
+"""Move ``article`` workflows to the new ``ENHANCE_RECORD`` layout.
+
+``ENHANCE_RECORD`` used to be 14 top-level tasks of the ``article``
+workflow, starting at index 13. It is now a single ``run_steps`` task at
+the same index, so every later top-level index is shifted by 13. As the
+branches of ``IF`` and ``IF_ELSE`` are nested lists, only the first
+element of ``callback_pos`` needs to be rewritten.
+"""
+
+from __future__ import absolute_import, division, print_function
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy_utils.types import JSONType, UUIDType
+
+
+# revision identifiers, used by Alembic.
+revision = 'e4d2b8a6c1f7'
+down_revision = 'c5a9e2d7f3b1'
+branch_labels = ()
+depends_on = None
+
+ENHANCE_RECORD_START = 13
+OLD_ENHANCE_RECORD_LENGTH = 14
+SHIFT = OLD_ENHANCE_RECORD_LENGTH - 1
+
+workflows_workflow = sa.table(
+    'workflows_workflow',
+    sa.column('uuid', UUIDType),
+    sa.column('name', sa.String),
+)
+
+workflows_object = sa.table(
+    'workflows_object',
+    sa.column('id', sa.Integer),
+    sa.column('id_workflow', UUIDType),
+    sa.column('callback_pos', JSONType),
+)
+
+
+def upgrade_callback_pos(callback_pos):
+    """Map a position of the old layout to the new one.
+
+    Objects stopped inside the old ``ENHANCE_RECORD`` tasks restart the
+    whole ``run_steps`` task.
+    """
+    if not callback_pos or callback_pos[0] < ENHANCE_RECORD_START:
+        return callback_pos
+    if callback_pos[0] < ENHANCE_RECORD_START + OLD_ENHANCE_RECORD_LENGTH:
+        return [ENHANCE_RECORD_START]
+    return [callback_pos[0] - SHIFT] + callback_pos[1:]
+
+
+def downgrade_callback_pos(callback_pos):
+    """Map a position of the new layout to the old one.
+
+    Objects stopped in the ``run_steps`` task restart the first of the old
+    ``ENHANCE_RECORD`` tasks.
+    """
+    if not callback_pos or callback_pos[0] < ENHANCE_RECORD_START:
+        return callback_pos
+    if callback_pos[0] == ENHANCE_RECORD_START:
+        return [ENHANCE_RECORD_START]
+    return [callback_pos[0] + SHIFT] + callback_pos[1:]
+
+
+def _rewrite_callback_pos(rewrite):
+    bind = op.get_bind()
+    query = sa.select([
+        workflows_object.c.id,
+        workflows_object.c.callback_pos,
+    ]).select_from(
+        workflows_object.join(
+            workflows_workflow,
+            workflows_object.c.id_workflow == workflows_workflow.c.uuid,
+        )
+    ).where(workflows_workflow.c.name == 'article')
+
+    for object_id, callback_pos in bind.execute(query).fetchall():
+        new_callback_pos = rewrite(callback_pos)
+        if new_callback_pos == callback_pos:
+            continue
+        bind.execute(
+            workflows_object.update()
+            .where(workflows_object.c.id == object_id)
+            .values(callback_pos=new_callback_pos)
+        )
+
+
+def upgrade():
+    """Upgrade database."""
+    _rewrite_callback_pos(upgrade_callback_pos)
+
+
+def downgrade():
+    """Downgrade database."""
+    _rewrite_callback_pos(downgrade_callback_pos)
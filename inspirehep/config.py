@@ -207,6 +207,11 @@ RECORD_EDITOR_FILE_UPLOAD_FOLDER = 'inspirehep/modules/editor/temp'
 # Path to where journal kb file is stored from `inspirehep.modules.refextract.tasks.create_journal_kb_file`
 # On production, if you enable celery beat change this path to point to a shared space.
 REFEXTRACT_JOURNAL_KB_PATH = pkg_resources.resource_filename('refextract', 'references/kbs/journal-titles.kb')
+# Local directory where each version of the journal kb is copied, defaults to
+# a directory in the system temporary directory.
+REFEXTRACT_KB_CACHE_DIR = None
+# Seconds between two checks of the version of the journal kb in each worker.
+REFEXTRACT_KB_CHECK_INTERVAL = 60
 
 # Search
 # ======
@@ -225,6 +230,17 @@ SEARCH_TYPEAHEAD_HINT_URL = '/search/suggest?field=%TYPE&query=%QUERY'
 SEARCH_TYPEAHEAD_DEFAULT_SET = 'invenio'
 
 SEARCH_ELASTIC_HOSTS = ['localhost']
+SEARCH_SCAN_SLICES = 1
+"""Number of slices scrolled in parallel by the batch tasks scanning large
+parts of an index, i.e. ``add_citation_counts`` and ``get_records_to_update``.
+
+Note:
+
+  With the default value of 1, a plain ``scan`` is used. The number of slices
+  should not exceed the number of shards of the index being scanned.
+"""
+SEARCH_SCAN_QUEUE_SIZE = 10000
+"""Maximum number of hits fetched by the slices and waiting to be consumed."""
 SEARCH_UI_BASE_TEMPLATE = BASE_TEMPLATE
 SEARCH_UI_SEARCH_TEMPLATE = 'search/search.html'
 SEARCH_UI_SEARCH_API = '/api/literature/'
@@ -232,6 +248,7 @@ SEARCH_UI_SEARCH_INDEX = 'records-hep'
 INSPIRE_ENDPOINT_TO_INDEX = {
     'authors': 'records-authors',
     'conferences': 'records-conferences',
+    'data': 'records-data',
     'experiments': 'records-experiments',
     'institutions': 'records-institutions',
     'jobs': 'records-jobs',
@@ -1067,6 +1084,37 @@ Note:
   This variable takes precedence over ``RECORDS_SKIP_FILES``, but can be
   overriden by the tasks in the ``inspirehep.modules.migrator.tasks`` module.
 """
+RECORDS_MIGRATION_CONTINUOUS_BATCH_SIZE = 100
+"""Number of records pushed by Legacy migrated in a single transaction."""
+RECORDS_MIGRATION_CONVERSION_WORKERS = 1
+"""Number of processes converting the MARCXML of a chunk of migrated records.
+
+Note:
+
+  A pool of processes cannot be created from a daemonic process, so values
+  greater than 1 cannot be used with the default pool of the Celery workers.
+"""
+MIGRATOR_MARCXML_CODEC = 'zlib'
+"""Codec compressing the MARCXML stored in the mirror, either ``zstd`` or ``zlib``.
+
+Note:
+
+  Records compressed with any codec can be read, run ``inspirehep migrate
+  recompress`` after changing it to compress the existing records again.
+  Only switch to ``zstd`` once all the workers reading the mirror can
+  decompress it, as older ones cannot.
+"""
+MIGRATOR_MARCXML_ZSTD_LEVEL = 9
+"""Compression level of the ``zstd`` codec."""
+MIGRATOR_MARCXML_ZSTD_DICTIONARY = None
+"""Path of the dictionary used by the ``zstd`` codec, if any.
+
+Note:
+
+  It can be trained with ``inspirehep migrate train-dictionary``. The
+  records compressed with a dictionary can only be read with that same
+  dictionary: to replace it, first recompress the mirror without one.
+"""
 
 JSONSCHEMAS_HOST = "localhost:5000"
 JSONSCHEMAS_REPLACE_REFS = True
@@ -1076,6 +1124,13 @@ INDEXER_DEFAULT_INDEX = "records-hep"
 INDEXER_DEFAULT_DOC_TYPE = "hep"
 INDEXER_REPLACE_REFS = False
 INDEXER_BULK_REQUEST_TIMEOUT = float(900)
+INDEXER_BULK_CHUNK_SIZE = 500
+"""Maximum number of records buffered before being sent to ES in bulk."""
+INDEXER_BULK_QUEUE = None
+"""If set, the name of the Celery queue on which records are indexed.
+
+When ``None``, records are indexed by the process that committed them.
+"""
 
 # OAuthclient
 # ===========
@@ -1546,6 +1601,21 @@ INSPIRE_REF_UPDATER_WHITELISTS = {
 }
 """Controls which fields are updated when the referred record is updated."""
 
+# Configuration for the citation counts
+# =====================================
+INSPIRE_CITATION_COUNTS_UPDATE_WINDOW = 10
+"""Seconds during which changes of citation counts are collected before
+being sent to ES in a single batch."""
+
+# Configuration for the author names cache
+# ========================================
+INSPIRE_NAME_CACHE_SIZE = 100000
+"""Maximum number of name variations and phonetic blocks cached by each process."""
+
+INSPIRE_NAME_CACHE_REDIS_TTL = None
+"""Seconds during which name variations and phonetic blocks are shared
+between processes through Redis. ``None`` disables the shared cache."""
+
 # Configuration for the matcher
 # =============================
 EXACT_MATCH = exact_match
@@ -24,12 +24,19 @@
 
 from __future__ import absolute_import, division, print_function
 
+import hashlib
+import json
 import re
 
-
 import numpy as np
+import six
 from beard.utils.strings import asciify
 from beard.clustering import block_phonetic
+from flask import current_app
+from redis import StrictRedis
+
+from inspire_utils.name import generate_name_variations
+from inspirehep.utils.cache import LRUCache
 
 
 _bai_parentheses_cleaner = \
@@ -126,3 +133,127 @@ def phonetic_blocks(full_names, phonetic_algorithm='nysiis'):
     )
 
     return dict(zip(full_names, phonetic_blocks))
+
+
+class NameCache(object):
+    """Cache of the name variations and phonetic blocks of author names.
+
+    The same names appear on thousands of collaboration papers, so the
+    results are kept in a per-process :class:`~inspirehep.utils.cache.LRUCache`
+    keyed by full name. If a ``redis`` client is given, the results are also
+    shared with the other processes for ``redis_ttl`` seconds.
+    """
+
+    REDIS_KEY_PREFIX = 'inspire_name_cache'
+
+    def __init__(self, maxsize, redis=None, redis_ttl=None):
+        self.entries = LRUCache(maxsize)
+        self.redis = redis
+        self.redis_ttl = redis_ttl
+        self.redis_hits = 0
+
+    def get_name_variations(self, full_name):
+        """Return the result of ``generate_name_variations`` for a name."""
+        name_variations = self._get_many(
+            'name_variations',
+            [full_name],
+            lambda names: {name: generate_name_variations(name) for name in names},
+        )[full_name]
+        return list(name_variations)
+
+    def get_phonetic_blocks(self, full_names, phonetic_algorithm='nysiis'):
+        """Return the result of ``phonetic_blocks`` for a list of names.
+
+        Only the names which are not cached are passed to ``phonetic_blocks``,
+        in a single call.
+        """
+        return self._get_many(
+            'phonetic_block_' + phonetic_algorithm,
+            full_names,
+            lambda names: phonetic_blocks(names, phonetic_algorithm=phonetic_algorithm),
+        )
+
+    def info(self):
+        """Return the statistics of the cache."""
+        info = self.entries.info()
+        info['redis_hits'] = self.redis_hits
+        return info
+
+    def _get_many(self, kind, full_names, compute):
+        result = {}
+        missing = []
+        for full_name in set(full_names):
+            value = self.entries.get((kind, full_name))
+            if value is None:
+                missing.append(full_name)
+            else:
+                result[full_name] = value
+
+        if missing and self.redis:
+            missing = self._get_from_redis(kind, missing, result)
+
+        if missing:
+            computed = compute(missing)
+            for full_name in missing:
+                self.entries.set((kind, full_name), computed[full_name])
+            result.update(computed)
+            if self.redis:
+                self._set_in_redis(kind, computed)
+
+        return result
+
+    def _get_redis_key(self, kind, full_name):
+        name_hash = hashlib.sha1(six.text_type(full_name).encode('utf-8')).hexdigest()
+        return '{}:{}:{}'.format(self.REDIS_KEY_PREFIX, kind, name_hash)
+
+    def _get_from_redis(self, kind, full_names, result):
+        values = self.redis.mget(
+            [self._get_redis_key(kind, full_name) for full_name in full_names])
+
+        still_missing = []
+        for full_name, value in zip(full_names, values):
+            if value is None:
+                still_missing.append(full_name)
+                continue
+
+            value = json.loads(value)
+            self.entries.set((kind, full_name), value)
+            result[full_name] = value
+            self.redis_hits += 1
+
+        return still_missing
+
+    def _set_in_redis(self, kind, values):
+        pipeline = self.redis.pipeline(transaction=False)
+        for full_name, value in six.iteritems(values):
+            pipeline.set(
+                self._get_redis_key(kind, full_name),
+                json.dumps(value),
+                ex=self.redis_ttl,
+            )
+        pipeline.execute()
+
+
+_name_cache = None
+
+
+def get_name_cache():
+    """Return the :class:`NameCache` of the current process.
+
+    It is created on first use, from ``INSPIRE_NAME_CACHE_SIZE``. Redis is
+    used as a shared cache if ``INSPIRE_NAME_CACHE_REDIS_TTL`` is set.
+    """
+    global _name_cache
+    if _name_cache is None:
+        redis = None
+        redis_ttl = current_app.config.get('INSPIRE_NAME_CACHE_REDIS_TTL')
+        if redis_ttl:
+            redis = StrictRedis.from_url(current_app.config['CACHE_REDIS_URL'])
+
+        _name_cache = NameCache(
+            maxsize=current_app.config.get('INSPIRE_NAME_CACHE_SIZE', 100000),
+            redis=redis,
+            redis_ttl=redis_ttl,
+        )
+
+    return _name_cache
@@ -41,17 +41,22 @@ from dojson.contrib.marc21.utils import create_record
 from flask import current_app
 from flask.cli import with_appcontext
 
+from invenio_db import db
 from inspire_dojson import marcxml2record
 from inspire_schemas.api import validate
 
 from inspirehep.utils.schema import ensure_valid_schema
+from .compression import train_zstd_dictionary
 from .models import LegacyRecordsMirror
 from .tasks import (
     add_citation_counts,
     migrate_from_file,
     migrate_from_mirror,
+    migrate_from_mirror_locally,
     migrate_record_from_legacy,
     populate_mirror_from_file,
+    populate_mirror_from_file_in_parallel,
+    recompress_mirror,
 )
 from .utils import get_collection
 
@@ -82,11 +87,25 @@ def migrate():
               help='Wait for migration to complete. This only has an effect if the -w flag is not set.')
 @click.option('-f', '--force', is_flag=True, default=False,
               help='Force the task to run even in debug mode.')
+@click.option('-j', '--mirror-workers', type=int, default=1,
+              help='Number of processes used to populate the mirror.')
+@click.option('--resume-from', default=None,
+              help='Name of the prodsync tarball member from which to resume populating the mirror.')
+@click.option('--local-workers', type=int, default=0,
+              help='Number of local processes used to migrate the records instead of the Celery workers.')
+@click.option('--failures-file', type=click.Path(dir_okay=False, writable=True, resolve_path=True),
+              default='migration_failures.csv',
+              help='File to which the records that failed to migrate are written. '
+                   'This only has an effect if --local-workers is set.')
 @with_appcontext
 def migrate_file(file_name,
                  mirror_only=False,
                  wait=False,
-                 force=False):
+                 force=False,
+                 mirror_workers=1,
+                 resume_from=None,
+                 local_workers=0,
+                 failures_file='migration_failures.csv'):
     """Migrate the records in the provided file.
 
     The file can be an (optionally-gzipped) XML file containing MARCXML, or a
@@ -95,8 +114,25 @@ def migrate_file(file_name,
     halt_if_debug_mode(force=force)
     click.echo("Migrating records from file: {0}".format(file_name))
 
-    populate_mirror_from_file(file_name)
-    if not mirror_only:
+    if mirror_workers > 1 or resume_from:
+        populate_mirror_from_file_in_parallel(
+            file_name,
+            workers=mirror_workers,
+            resume_from=resume_from,
+        )
+    else:
+        populate_mirror_from_file(file_name)
+    if mirror_only:
+        return
+
+    if local_workers > 0:
+        failed = migrate_from_mirror_locally(
+            workers=local_workers,
+            failures_output=failures_file,
+        )
+        if failed:
+            click.echo('{} records failed to migrate, see {}'.format(failed, failures_file), err=True)
+    else:
         migrate_from_mirror(wait_for_results=wait)
 
 
@@ -121,6 +157,40 @@ def mirror(also_migrate=None,
     migrate_from_mirror(also_migrate=also_migrate, wait_for_results=wait)
 
 
+@migrate.command()
+@click.option('--wait', '-w', is_flag=True, default=False,
+              help='Recompress the records in this process instead of in a Celery worker.')
+@with_appcontext
+def recompress(wait=False):
+    """Compress again the mirror with the configured codec."""
+    if wait:
+        count = recompress_mirror()
+        click.echo('Recompressed {} records of the mirror'.format(count))
+    else:
+        recompress_mirror.delay()
+        click.echo('Scheduled the recompression of the mirror')
+
+
+@migrate.command('train-dictionary')
+@click.argument('output', type=click.Path(dir_okay=False, writable=True, resolve_path=True))
+@click.option('--samples', '-n', type=int, default=10000,
+              help='Number of records of the mirror on which the dictionary is trained.')
+@click.option('--size', '-s', type=int, default=112640,
+              help='Maximum size in bytes of the dictionary.')
+@with_appcontext
+def train_dictionary(output, samples=10000, size=112640):
+    """Train a zstd dictionary on a random sample of the mirror.
+
+    To use it, point MIGRATOR_MARCXML_ZSTD_DICTIONARY to the output file
+    and recompress the mirror.
+    """
+    query = LegacyRecordsMirror.query.order_by(db.func.random()).limit(samples)
+    dictionary = train_zstd_dictionary([record.marcxml for record in query], size)
+    with open(output, 'wb') as fd:
+        fd.write(dictionary)
+    click.echo('Trained a dictionary of {} bytes on {} records'.format(len(dictionary), samples))
+
+
 @migrate.command()
 @click.argument('recid', type=int)
 @with_appcontext
@@ -178,19 +248,36 @@ def one(recid):
 
 
 @migrator.command()
-def count_citations():
+@click.option('--slices', '-s', type=int, default=None,
+              help='Number of slices of the HEP index scrolled in parallel.')
+def count_citations(slices):
     """Adds field citation_count to every record in 'HEP' and calculates its proper value."""
     click.echo("Adding citation_count to all records")
-    add_citation_counts()
+    add_citation_counts(slices=slices)
 
 
 @migrator.command()
 @click.option('--output', '-o', default="/tmp/broken-records.csv",
               help='Specifiy where to report errors.')
+@click.option('--by-signature', is_flag=True, default=False,
+              help='Only report the number of errors of each class.')
 @with_appcontext
-def reporterrors(output):
-    """Reports in a friendly way all failed records and corresponding motivation."""
+def reporterrors(output, by_signature):
+    """Reports in a friendly way all failed records and corresponding motivation.
+
+    With ``--by-signature``, only the number of errors of each class is
+    reported, most frequent first, with the signature and one of the errors
+    of the class.
+    """
     click.echo("Reporting broken records into {0}".format(output))
+    if by_signature:
+        with open(output, "w") as out:
+            csv_writer = csv.writer(out)
+            for signature, count, error in LegacyRecordsMirror.count_errors():
+                csv_writer.writerow((count, signature, error.encode('utf8')))
+        click.echo("Dumped errors into {}".format(output))
+        return
+
     errors = {}
     results = LegacyRecordsMirror.query.filter(LegacyRecordsMirror.valid == False) # noqa: ignore=F712
     results_length = results.count()
@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of INSPIRE.
+# Copyright (C) 2018 CERN.
+#
+# INSPIRE is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# INSPIRE is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with INSPIRE. If not, see <http://www.gnu.org/licenses/>.
+#
+# In applying this license, CERN does not waive the privileges and immunities
+# granted to it by virtue of its status as an Intergovernmental Organization
+# or submit itself to any jurisdiction.
+
+
+"""Compression of the MARCXML stored in the legacy records mirror."""
+
+from __future__ import absolute_import, division, print_function
+
+import threading
+import zlib
+
+import zstandard
+from flask import current_app, has_app_context
+
+ZLIB_HEADER = b'\x01'
+ZSTD_HEADER = b'\x02'
+ZSTD_DICTIONARY_HEADER = b'\x03'
+ZLIB_PREFIX = b'\x78'
+"""First byte of the zlib streams, which are stored without header."""
+
+DEFAULT_CODEC = 'zlib'
+DEFAULT_ZSTD_LEVEL = 9
+
+# The zstd objects must not be used by several threads at the same time.
+_zstd_cache = threading.local()
+
+
+def _get_config(key, default=None):
+    if has_app_context():
+        return current_app.config.get(key, default)
+    return default
+
+
+def _get_zstd_cache(name):
+    if not hasattr(_zstd_cache, name):
+        setattr(_zstd_cache, name, {})
+    return getattr(_zstd_cache, name)
+
+
+def _get_zstd_dictionary(path):
+    dictionaries = _get_zstd_cache('dictionaries')
+    if path not in dictionaries:
+        with open(path, 'rb') as fd:
+            dictionaries[path] = zstandard.ZstdCompressionDict(fd.read())
+    return dictionaries[path]
+
+
+def _get_zstd_compressor(level, dictionary_path):
+    compressors = _get_zstd_cache('compressors')
+    key = level, dictionary_path
+    if key not in compressors:
+        dictionary = _get_zstd_dictionary(dictionary_path) if dictionary_path else None
+        compressors[key] = zstandard.ZstdCompressor(level=level, dict_data=dictionary)
+    return compressors[key]
+
+
+def _get_zstd_decompressor(dictionary_path):
+    decompressors = _get_zstd_cache('decompressors')
+    if dictionary_path not in decompressors:
+        dictionary = _get_zstd_dictionary(dictionary_path) if dictionary_path else None
+        decompressors[dictionary_path] = zstandard.ZstdDecompressor(dict_data=dictionary)
+    return decompressors[dictionary_path]
+
+
+def get_current_header():
+    """Get the first byte of the records compressed with the configured codec."""
+    if _get_config('MIGRATOR_MARCXML_CODEC', DEFAULT_CODEC) == 'zlib':
+        return ZLIB_PREFIX
+    if _get_config('MIGRATOR_MARCXML_ZSTD_DICTIONARY'):
+        return ZSTD_DICTIONARY_HEADER
+    return ZSTD_HEADER
+
+
+def compress_marcxml(marcxml):
+    """Compress a MARCXML record with the configured codec.
+
+    The first byte of the result identifies how it was compressed, so that
+    records compressed with any codec can be read by :func:`decompress_marcxml`.
+    With ``zlib``, no header is added, so that the records can also be read
+    by the versions predating the headers.
+    """
+    header = get_current_header()
+    if header == ZLIB_PREFIX:
+        return zlib.compress(marcxml)
+
+    level = _get_config('MIGRATOR_MARCXML_ZSTD_LEVEL', DEFAULT_ZSTD_LEVEL)
+    dictionary_path = _get_config('MIGRATOR_MARCXML_ZSTD_DICTIONARY')
+    return header + _get_zstd_compressor(level, dictionary_path).compress(marcxml)
+
+
+def decompress_marcxml(data):
+    """Decompress a MARCXML record compressed by :func:`compress_marcxml`.
+
+    Records stored before the header byte was introduced are either zlib
+    compressed or not compressed at all, and are also supported.
+    """
+    header, payload = data[:1], data[1:]
+    if header == ZLIB_HEADER:
+        return zlib.decompress(payload)
+    elif header == ZSTD_HEADER:
+        return _get_zstd_decompressor(None).decompress(payload)
+    elif header == ZSTD_DICTIONARY_HEADER:
+        dictionary_path = _get_config('MIGRATOR_MARCXML_ZSTD_DICTIONARY')
+        if not dictionary_path:
+            raise ValueError('MIGRATOR_MARCXML_ZSTD_DICTIONARY is needed to decompress this record')
+        return _get_zstd_decompressor(dictionary_path).decompress(payload)
+
+    try:
+        return zlib.decompress(data)
+    except zlib.error:
+        # Legacy uncompress data?
+        return bytes(data)
+
+
+def train_zstd_dictionary(samples, size):
+    """Train a zstd dictionary on a sample of MARCXML records.
+
+    Args:
+        samples(List[bytes]): the MARCXML records.
+        size(int): the maximum size in bytes of the dictionary.
+
+    Returns:
+        bytes: the dictionary, to be saved in the file pointed to by
+        ``MIGRATOR_MARCXML_ZSTD_DICTIONARY``.
+    """
+    return zstandard.train_dictionary(size, samples).as_bytes()
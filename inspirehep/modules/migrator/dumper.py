@@ -26,7 +26,7 @@ from __future__ import absolute_import, division, print_function
 
 from marshmallow import ValidationError
 
-from .serializers.schemas.json import ErrorList
+from .serializers.schemas.json import ErrorClassList, ErrorList
 
 
 def marshmallow_dumper(schema_class):
@@ -41,3 +41,4 @@ def marshmallow_dumper(schema_class):
 
 
 migrator_error_list_dumper = marshmallow_dumper(ErrorList)
+migrator_error_class_list_dumper = marshmallow_dumper(ErrorClassList)
@@ -25,13 +25,16 @@
 from __future__ import absolute_import, division, print_function
 
 import re
-
 from datetime import datetime
-from zlib import compress, decompress, error
+from hashlib import sha1
 
 from invenio_db import db
+from jsonschema import ValidationError
+from sqlalchemy import desc, func
 from sqlalchemy.ext.hybrid import hybrid_property
+from sqlalchemy.sql.expression import false
 
+from .compression import compress_marcxml, decompress_marcxml
 from .utils import get_collection_from_marcxml
 
 
@@ -40,6 +43,7 @@ class LegacyRecordsMirror(db.Model):
 
     __table_args__ = (
         db.Index('ix_legacy_records_mirror_valid_collection', 'valid', 'collection'),
+        db.Index('ix_legacy_records_mirror_error_signature', 'error_signature'),
     )
 
     recid = db.Column(db.Integer, primary_key=True)
@@ -47,22 +51,41 @@ class LegacyRecordsMirror(db.Model):
     _marcxml = db.Column('marcxml', db.LargeBinary, nullable=False)
     valid = db.Column(db.Boolean, default=None, nullable=True)
     _errors = db.Column('errors', db.Text(), nullable=True)
+    error_signature = db.Column(db.String(40), nullable=True)
+    content_hash = db.Column(db.String(40), nullable=True)
+    migrated_hash = db.Column(db.String(40), nullable=True)
     collection = db.Column(db.Text(), default='')
 
     re_recid = re.compile('<controlfield.*?tag=.001.*?>(?P<recid>\d+)</controlfield>')
 
     @hybrid_property
     def marcxml(self):
-        """marcxml column wrapper to compress/decompress on the fly."""
-        try:
-            return decompress(self._marcxml)
-        except error:
-            # Legacy uncompress data?
-            return self._marcxml
+        """marcxml column wrapper to compress/decompress on the fly.
+
+        The decompressed value is cached until the compressed one changes.
+        """
+        cached = self.__dict__.get('_marcxml_cache')
+        if cached is not None and cached[0] is self._marcxml:
+            return cached[1]
+
+        value = decompress_marcxml(self._marcxml)
+        self.__dict__['_marcxml_cache'] = self._marcxml, value
+        return value
 
     @marcxml.setter
     def marcxml(self, value):
-        self._marcxml = compress(value)
+        self._marcxml = compress_marcxml(value)
+        self.__dict__['_marcxml_cache'] = self._marcxml, value
+        self.content_hash = self.hash_marcxml(value)
+
+    @staticmethod
+    def hash_marcxml(marcxml):
+        return sha1(marcxml).hexdigest()
+
+    def mark_as_migrated(self):
+        """Set the ``valid`` flag and remember the content that was migrated."""
+        self.valid = True
+        self.migrated_hash = self.content_hash
 
     @hybrid_property
     def error(self):
@@ -71,24 +94,84 @@ class LegacyRecordsMirror(db.Model):
     @error.setter
     def error(self, value):
         """Errors column setter that stores an Exception and sets the ``valid`` flag."""
+        self.set_error_message(self.format_error(value), self.get_error_signature(value))
+
+    def set_error_message(self, message, signature=None):
+        """Store an error already formatted by :meth:`format_error`.
+
+        This is useful when the error happened in another process, as
+        exceptions cannot always be sent back to the current one.
+        """
         self.valid = False
-        self.collection = get_collection_from_marcxml(self.marcxml)
-        self._errors = u'{}: {}'.format(type(value).__name__, value)
+        if not self.collection:
+            self.collection = get_collection_from_marcxml(self.marcxml)
+        self._errors = message
+        self.error_signature = signature
+
+    @staticmethod
+    def format_error(exc):
+        return u'{}: {}'.format(type(exc).__name__, exc)
+
+    @staticmethod
+    def get_error_signature(exc):
+        """Hash what identifies a class of errors: the type and schema path of an exception.
+
+        Errors with the same signature, like validation errors of the same
+        field, can then be counted together.
+        """
+        error_class = type(exc).__name__
+        if isinstance(exc, ValidationError):
+            error_class += u':' + u'.'.join(str(part) for part in exc.schema_path)
+        return sha1(error_class.encode('utf8')).hexdigest()
+
+    @classmethod
+    def count_errors(cls, limit=None):
+        """Count the errors of the records not deleted on Legacy by signature.
+
+        The errors stored before their signatures existed are counted
+        together, with a ``None`` signature, until they are migrated again.
+
+        Args:
+            limit(Optional[int]): number of most frequent error signatures to return.
+
+        Returns:
+            List[Tuple[str, int, str]]: the signature of each class of errors,
+            its number of occurrences and one of the errors, by decreasing
+            number of occurrences.
+        """
+        count = func.count().label('count')
+        query = db.session.query(
+            cls.error_signature.label('signature'),
+            count,
+            func.min(cls._errors).label('error'),
+        ).filter(
+            cls.valid == false(),
+            cls.collection != 'DELETED',
+        ).group_by(
+            cls.error_signature,
+        ).order_by(
+            desc(count),
+        ).limit(limit)
+
+        return query.all()
 
     @classmethod
-    def from_marcxml(cls, raw_record):
+    def from_marcxml(cls, raw_record, recid=None):
         """Create an instance from a MARCXML record.
 
         The record must have a ``001`` tag containing the recid, otherwise it raises a ValueError.
+        The ``recid`` can be passed if it is already known, to avoid looking for it again.
         """
-        try:
-            recid = int(cls.re_recid.search(raw_record).group('recid'))
-        except AttributeError:
-            raise ValueError('The MARCXML record contains no recid or recid is malformed')
+        if recid is None:
+            try:
+                recid = int(cls.re_recid.search(raw_record).group('recid'))
+            except AttributeError:
+                raise ValueError('The MARCXML record contains no recid or recid is malformed')
         # FIXME also get last_updated from marcxml
         record = cls(recid=recid)
         record.marcxml = raw_record
         record.valid = None
+        record.collection = get_collection_from_marcxml(raw_record)
         return record
 
 
@@ -44,3 +44,21 @@ class ErrorList(Schema):
 
     class Meta:
         strict = True
+
+
+class ErrorClass(Schema):
+    """Schema for classes of errors of mirror records."""
+    signature = fields.Str(required=True, allow_none=True)
+    count = fields.Int(required=True)
+    error = fields.Str(required=True)
+
+    class Meta:
+        strict = True
+
+
+class ErrorClassList(Schema):
+    """Schema for list of classes of errors of mirror records."""
+    data = fields.List(fields.Nested(ErrorClass), required=True)
+
+    class Meta:
+        strict = True
@@ -24,53 +24,84 @@
 
 from __future__ import absolute_import, division, print_function
 
+import csv
 import gzip
 import re
 import tarfile
 import zlib
-from collections import Counter
 from contextlib import closing
-from itertools import chain
+from datetime import datetime
+from io import BytesIO
+from multiprocessing import Pool
+from time import time
+from uuid import uuid4
 
 import click
 import requests
 
 from celery import group, shared_task
 from elasticsearch.helpers import bulk as es_bulk
-from elasticsearch.helpers import scan as es_scan
 from flask import current_app
 from flask_sqlalchemy import models_committed
 from functools import wraps
 from jsonschema import ValidationError
 from redis import StrictRedis
 from redis_lock import Lock
+from sqlalchemy import and_, bindparam, func, literal, select, tuple_
+from sqlalchemy.dialects.postgresql import insert
 
 from invenio_db import db
 from invenio_pidstore.models import PersistentIdentifier
+from invenio_records.signals import after_record_insert, after_record_update
 from invenio_search import current_search_client as es
 from invenio_search.utils import schema_to_index
 
 from inspire_dojson import marcxml2record
-from inspire_utils.dedupers import dedupe_list
-from inspire_utils.helpers import force_list
+from inspire_dojson.utils import strip_empty_values
 from inspire_utils.logging import getStackTraceLogger
-from inspire_utils.record import get_value
+from inspirehep.modules.pidstore.providers.recid import InspireRecordIdProvider
 from inspirehep.modules.records.api import InspireRecord
 from inspirehep.modules.pidstore.utils import (
-    get_pid_types_from_endpoints,
+    get_pid_type_from_endpoint,
+    get_pid_type_from_schema,
 )
+from inspirehep.modules.records.models import RecordCitations
 from inspirehep.modules.records.receivers import index_after_commit
+from inspirehep.modules.search.scan import sliced_scan
 from inspirehep.utils.schema import ensure_valid_schema
 from inspirehep.utils.record import create_index_op
 
+from .compression import compress_marcxml, decompress_marcxml, get_current_header
 from .models import LegacyRecordsMirror
+from .utils import get_collection_from_marcxml
 
 LOGGER = getStackTraceLogger(__name__)
 
 CHUNK_SIZE = 100
+SKIPPED = object()
+"""Returned instead of a record when it was skipped because it did not change."""
 LARGE_CHUNK_SIZE = 2000
 
+READ_CHUNK_SIZE = 1024 * 1024
+RECORD_START_TAG = b'<record'
+RECORD_END_TAG = b'</record>'
+
 split_marc = re.compile('<record.*?>.*?</record>', re.DOTALL)
+re_last_modified = re.compile('<controlfield[^>]*tag=.005[^>]*>(?P<date>\d{14})')
+
+LEGACY_RECORDS_QUEUE = 'legacy_records'
+LEGACY_RECORDS_PROCESSING = 'legacy_records_processing'
+LEGACY_RECORDS_STATS = 'legacy_records_stats'
+
+MOVE_BATCH_TO_PROCESSING_SCRIPT = """
+local records = redis.call('LRANGE', KEYS[1], 0, tonumber(ARGV[1]) - 1)
+if #records > 0 then
+    redis.call('LTRIM', KEYS[1], #records, -1)
+    redis.call('RPUSH', KEYS[2], unpack(records))
+end
+return records
+"""
+"""Atomically move the first ``ARGV[1]`` records of a queue to a processing list."""
 
 
 def disable_orcid_push(task_function):
@@ -130,21 +161,92 @@ def split_stream(stream):
             buf.append(row)
 
 
-def read_file(source):
+def split_records(chunks):
+    """Split a MARCXML stream into records, without decoding it.
+
+    Unlike :func:`split_stream`, the stream can be made of chunks of any
+    size, each byte is scanned only once, and the recid of each record is
+    extracted while splitting.
+
+    Args:
+        chunks(Iterable[bytes]): the MARCXML stream.
+
+    Yields:
+        Tuple[int, bytes]: the recid, or ``None`` if it is missing, and the
+        MARCXML of each record.
+    """
+    buf = b''
+    start = None
+    search_from = 0
+    for chunk in chunks:
+        buf += chunk
+        while True:
+            if start is None:
+                start = _find_record_start(buf, search_from)
+                if start < 0:
+                    # Keep what could be the beginning of a start tag.
+                    search_from = max(search_from, len(buf) - len(RECORD_START_TAG))
+                    start = None
+                    break
+                elif start + len(RECORD_START_TAG) >= len(buf):
+                    search_from = start
+                    start = None
+                    break
+                search_from = start + len(RECORD_START_TAG)
+
+            end = buf.find(RECORD_END_TAG, search_from)
+            if end < 0:
+                search_from = max(search_from, len(buf) - len(RECORD_END_TAG) + 1)
+                break
+
+            end += len(RECORD_END_TAG)
+            record = buf[start:end]
+            match = LegacyRecordsMirror.re_recid.search(record)
+            yield int(match.group('recid')) if match else None, record
+            start, search_from = None, end
+
+        consumed = search_from if start is None else start
+        buf = buf[consumed:]
+        search_from -= consumed
+        if start is not None:
+            start = 0
+
+
+def _find_record_start(buf, search_from):
+    """Find a ``<record>`` tag, skipping other tags with the same prefix."""
+    while True:
+        start = buf.find(RECORD_START_TAG, search_from)
+        next_char = buf[start + len(RECORD_START_TAG):start + len(RECORD_START_TAG) + 1]
+        if start < 0 or not next_char or next_char in b'> \t\r\n':
+            return start
+        search_from = start + 1
+
+
+def read_file(source, chunk_size=None):
+    """Read a MARCXML file, by lines or by chunks of ``chunk_size`` bytes.
+
+    The file can be an (optionally-gzipped) XML file containing MARCXML, or a
+    prodsync tarball.
+    """
+    def _read(fd):
+        if chunk_size:
+            return iter(lambda: fd.read(chunk_size), b'')
+        return fd
+
     if source.endswith('.gz'):
         with gzip.open(source, 'rb') as fd:
-            for line in fd:
+            for line in _read(fd):
                 yield line
     elif source.endswith('.tar'):  # assuming prodsync tarball
         with closing(tarfile.open(source)) as tar:
             for file_ in tar:
                 print('Processing {}'.format(file_.name))
                 unzipped = gzip.GzipFile(fileobj=tar.extractfile(file_), mode='rb')
-                for line in unzipped:
+                for line in _read(unzipped):
                     yield line
     else:
         with open(source, 'rb') as fd:
-            for line in fd:
+            for line in _read(fd):
                 yield line
 
 
@@ -158,7 +260,9 @@ def migrate_record_from_legacy(recid):
 def migrate_from_mirror(also_migrate=None, wait_for_results=False, skip_files=None):
     """Migrate legacy records from the local mirror.
 
-    By default, only the records that have not been migrated yet are migrated.
+    By default, only the records that have not been migrated yet are migrated,
+    skipping those whose content is the same as the last one migrated
+    successfully.
 
     Args:
         also_migrate(Optional[string]): if set to ``'broken'``, also broken
@@ -178,13 +282,11 @@ def migrate_from_mirror(also_migrate=None, wait_for_results=False, skip_files=No
             False,
         )
 
-    query = LegacyRecordsMirror.query.with_entities(LegacyRecordsMirror.recid)
     if also_migrate is None:
-        query = query.filter(LegacyRecordsMirror.valid.is_(None))
-    elif also_migrate == 'broken':
-        query = query.filter(LegacyRecordsMirror.valid.isnot(True))
-    elif also_migrate != 'all':
-        raise ValueError('"also_migrate" should be either None, "all" or "broken"')
+        skipped = mark_unchanged_records_as_migrated()
+        print('Skipped {} records unchanged since their last migration'.format(skipped))
+
+    query = _get_recids_to_migrate(also_migrate)
 
     if wait_for_results:
         # if the wait_for_results is true we enable returning results from the
@@ -210,132 +312,672 @@ def migrate_from_mirror(also_migrate=None, wait_for_results=False, skip_files=No
         print('All migration tasks have been completed.')
 
 
+def mark_unchanged_records_as_migrated():
+    """Mark as valid the records not migrated since their content last changed.
+
+    These are the records whose content is the same as the last one migrated
+    successfully, so there is no need to migrate them again.
+
+    Returns:
+        int: the number of records marked as valid.
+    """
+    count = LegacyRecordsMirror.query.filter(
+        LegacyRecordsMirror.valid.is_(None),
+        LegacyRecordsMirror.content_hash == LegacyRecordsMirror.migrated_hash,
+    ).update({LegacyRecordsMirror.valid: True}, synchronize_session=False)
+    db.session.commit()
+
+    return count
+
+
+def _get_recids_to_migrate(also_migrate=None):
+    """Get the query of the recids to migrate, see :func:`migrate_from_mirror`."""
+    query = LegacyRecordsMirror.query.with_entities(LegacyRecordsMirror.recid)
+    if also_migrate is None:
+        query = query.filter(LegacyRecordsMirror.valid.is_(None))
+    elif also_migrate == 'broken':
+        query = query.filter(LegacyRecordsMirror.valid.isnot(True))
+    elif also_migrate != 'all':
+        raise ValueError('"also_migrate" should be either None, "all" or "broken"')
+
+    return query
+
+
+def migrate_from_mirror_locally(workers, also_migrate=None, skip_files=None, failures_output=None):
+    """Migrate legacy records from the local mirror in a pool of processes.
+
+    Unlike :func:`migrate_from_mirror`, it does not need Celery: each worker
+    process creates its own application, with its own DB connections, and
+    migrates and indexes chunks of records like
+    :func:`migrate_recids_from_mirror`.
+
+    Args:
+        workers(int): number of worker processes.
+        also_migrate(Optional[string]): see :func:`migrate_from_mirror`.
+        skip_files(Optional[bool]): see :func:`migrate_from_mirror`.
+        failures_output(Optional[str]): path of a CSV file to which the recid
+            and the error of each record that failed to migrate are written.
+
+    Returns:
+        int: the number of records that failed to migrate.
+    """
+    if skip_files is None:
+        skip_files = current_app.config.get(
+            'RECORDS_MIGRATION_SKIP_FILES',
+            False,
+        )
+
+    if also_migrate is None:
+        skipped = mark_unchanged_records_as_migrated()
+        print('Skipped {} records unchanged since their last migration'.format(skipped))
+
+    # The recids are loaded before the engine is disposed, as the chunks are
+    # consumed by a thread of the pool.
+    query = _get_recids_to_migrate(also_migrate)
+    recids = [res.recid for res in query.yield_per(LARGE_CHUNK_SIZE)]
+    total = len(recids)
+    chunks = ((chunk, skip_files) for chunk in chunker(recids))
+
+    # The connections of the current process must not be shared with the workers.
+    db.session.close()
+    db.engine.dispose()
+
+    failures_file = open(failures_output, 'w') if failures_output else None
+    pool = Pool(processes=workers, initializer=_init_local_migration_worker)
+    try:
+        failures_writer = csv.writer(failures_file) if failures_file else None
+        migrated, failed = 0, 0
+        start_time = time()
+        for chunk_size, failures in pool.imap_unordered(_migrate_recids_locally, chunks):
+            migrated += chunk_size
+            failed += len(failures)
+            if failures_writer:
+                for recid, error in failures:
+                    failures_writer.writerow((recid, (error or u'').encode('utf8')))
+            print('Migrated {}/{} records ({:.0f} records/s, {} failures)'.format(
+                migrated, total, migrated / (time() - start_time), failed))
+    finally:
+        pool.terminate()
+        pool.join()
+        if failures_file:
+            failures_file.close()
+
+    return failed
+
+
+def _init_local_migration_worker():
+    from inspirehep.factory import create_app
+
+    # A pool of processes cannot be created from the workers themselves.
+    app = create_app(RECORDS_MIGRATION_CONVERSION_WORKERS=1)
+    app.app_context().push()
+
+
+def _migrate_recids_locally(args):
+    recids, skip_files = args
+    try:
+        migrate_recids_from_mirror(recids, skip_files=skip_files)
+    except Exception as exc:
+        LOGGER.exception('Migrator Local Migration Error')
+        db.session.rollback()
+        return len(recids), [(recid, LegacyRecordsMirror.format_error(exc)) for recid in recids]
+
+    failures = LegacyRecordsMirror.query.with_entities(
+        LegacyRecordsMirror.recid,
+        LegacyRecordsMirror.error,
+    ).filter(
+        LegacyRecordsMirror.recid.in_(recids),
+        LegacyRecordsMirror.valid.is_(False),
+    ).all()
+
+    return len(recids), failures
+
+
 def migrate_from_file(source, wait_for_results=False):
     populate_mirror_from_file(source)
     migrate_from_mirror(wait_for_results=wait_for_results)
 
 
 def populate_mirror_from_file(source):
-    for i, chunk in enumerate(chunker(split_stream(read_file(source)), CHUNK_SIZE)):
+    records = split_records(read_file(source, chunk_size=READ_CHUNK_SIZE))
+    for i, chunk in enumerate(chunker(records, CHUNK_SIZE)):
         insert_into_mirror(chunk)
         print("Inserted {} records into mirror".format(i * CHUNK_SIZE + len(chunk)))
 
 
+def populate_mirror_from_file_in_parallel(source, workers, resume_from=None,
+                                          batch_size=LARGE_CHUNK_SIZE):
+    """Populate the mirror from a file using a pool of processes.
+
+    The workers compress the records and extract their recids, while the
+    current process upserts them in the mirror in batches of ``batch_size``.
+    The members of a prodsync tarball are also read and split by the
+    workers, several at a time, but they are inserted in the order in which
+    they appear in the tarball.
+
+    Args:
+        source(str): path to the file, which can be an (optionally-gzipped)
+            XML file containing MARCXML, or a prodsync tarball.
+        workers(int): number of worker processes.
+        resume_from(Optional[str]): name of the prodsync tarball member from
+            which to start, skipping the previous ones.
+        batch_size(int): number of records inserted in the mirror at once.
+    """
+    pool = Pool(processes=workers)
+    try:
+        if source.endswith('.tar'):
+            results = pool.imap(
+                _prepare_mirror_rows_from_tar_member,
+                _get_tar_members(source, resume_from),
+            )
+        else:
+            results = (
+                (None, rows, errors) for rows, errors in pool.imap(
+                    _prepare_mirror_rows,
+                    chunker(split_records(read_file(source, chunk_size=READ_CHUNK_SIZE)), batch_size),
+                )
+            )
+
+        inserted, errors = 0, 0
+        start_time = time()
+        for member_name, rows, member_errors in results:
+            errors += member_errors
+            for batch in chunker(rows, batch_size):
+                upsert_into_mirror(batch)
+                inserted += len(batch)
+                print('Inserted {} records into mirror ({:.0f} records/s, {} errors)'.format(
+                    inserted, inserted / (time() - start_time), errors))
+            if member_name:
+                print('Done with {}'.format(member_name))
+    finally:
+        pool.terminate()
+        pool.join()
+
+
+def _get_tar_members(source, resume_from=None):
+    with closing(tarfile.open(source)) as tar:
+        members = [member for member in tar.getmembers() if member.isfile()]
+
+    if resume_from:
+        names = [member.name for member in members]
+        if resume_from not in names:
+            raise ValueError('{} is not a member of {}'.format(resume_from, source))
+        members = members[names.index(resume_from):]
+
+    return [(source, member.name, member.offset_data, member.size) for member in members]
+
+
+def _prepare_mirror_rows_from_tar_member(args):
+    source, member_name, offset, size = args
+    with open(source, 'rb') as fd:
+        fd.seek(offset)
+        unzipped = gzip.GzipFile(fileobj=BytesIO(fd.read(size)), mode='rb')
+        chunks = iter(lambda: unzipped.read(READ_CHUNK_SIZE), b'')
+
+        rows, errors = _prepare_mirror_rows(split_records(chunks))
+    return member_name, rows, errors
+
+
+def _prepare_mirror_rows(records):
+    rows, errors = [], 0
+    for recid, raw_record in records:
+        if recid is None:
+            errors += 1
+            continue
+
+        rows.append({
+            'recid': recid,
+            'marcxml': compress_marcxml(raw_record),
+            'content_hash': LegacyRecordsMirror.hash_marcxml(raw_record),
+            'collection': get_collection_from_marcxml(raw_record),
+        })
+
+    return rows, errors
+
+
+def upsert_into_mirror(rows):
+    """Insert or update many records in the mirror with a single statement.
+
+    Like :func:`insert_into_mirror`, it resets the ``valid`` flag of updated
+    records, so that they are migrated again.
+
+    Args:
+        rows(List[dict]): the rows to upsert, with their ``recid``,
+            compressed ``marcxml``, ``content_hash`` and ``collection``. When
+            a recid appears more than once, the last row wins.
+    """
+    now = datetime.utcnow()
+    rows_by_recid = {}
+    for row in rows:
+        rows_by_recid[row['recid']] = dict(row, last_updated=now, valid=None)
+
+    table = LegacyRecordsMirror.__table__
+    statement = insert(table).values(list(rows_by_recid.values()))
+    statement = statement.on_conflict_do_update(
+        index_elements=[table.c.recid],
+        set_={
+            'marcxml': statement.excluded.marcxml,
+            'content_hash': statement.excluded.content_hash,
+            'last_updated': statement.excluded.last_updated,
+            'collection': statement.excluded.collection,
+            'valid': None,
+        },
+    )
+    db.session.execute(statement)
+    db.session.commit()
+
+
+@shared_task(ignore_result=True)
+def recompress_mirror(batch_size=CHUNK_SIZE):
+    """Compress again the records of the mirror with the configured codec.
+
+    Only the records compressed with another codec, or not compressed at
+    all, are processed, see :func:`~.compression.get_current_header`. Their ``last_updated`` is left untouched, as their
+    content does not change.
+
+    Args:
+        batch_size(int): number of records recompressed in each transaction.
+
+    Returns:
+        int: the number of recompressed records.
+    """
+    table = LegacyRecordsMirror.__table__
+    outdated = func.substring(table.c.marcxml, 1, 1) != literal(get_current_header(), db.LargeBinary)
+    update = table.update().where(
+        table.c.recid == bindparam('_recid'),
+    ).values(
+        marcxml=bindparam('_marcxml'),
+    )
+
+    last_recid, recompressed = 0, 0
+    while True:
+        rows = db.session.execute(
+            select([table.c.recid, table.c.marcxml]).where(
+                and_(table.c.recid > last_recid, outdated),
+            ).order_by(table.c.recid).limit(batch_size)
+        ).fetchall()
+        if not rows:
+            break
+
+        db.session.execute(update, [
+            {'_recid': recid, '_marcxml': compress_marcxml(decompress_marcxml(marcxml))}
+            for recid, marcxml in rows
+        ])
+        db.session.commit()
+
+        last_recid = rows[-1][0]
+        recompressed += len(rows)
+        LOGGER.info('Recompressed %d records of the mirror', recompressed)
+
+    return recompressed
+
+
 @shared_task(ignore_result=True)
 def continuous_migration(skip_files=None):
-    """Task to continuously migrate what is pushed up by Legacy."""
+    """Task to continuously migrate what is pushed up by Legacy.
+
+    The records are moved from the ``legacy_records`` queue to the
+    ``legacy_records_processing`` list in batches of
+    ``RECORDS_MIGRATION_CONTINUOUS_BATCH_SIZE``. Each batch is migrated in a
+    single transaction, and is removed from the processing list only after
+    being committed, so that the records of a batch interrupted by a crash
+    are migrated again by the next run.
+    """
     if skip_files is None:
         skip_files = current_app.config.get(
             'RECORDS_MIGRATION_SKIP_FILES',
             False,
         )
+    batch_size = current_app.config.get('RECORDS_MIGRATION_CONTINUOUS_BATCH_SIZE', CHUNK_SIZE)
     redis_url = current_app.config.get('CACHE_REDIS_URL')
     r = StrictRedis.from_url(redis_url)
     lock = Lock(r, 'continuous_migration', expire=120, auto_renewal=True)
     if lock.acquire(blocking=False):
         try:
-            while r.llen('legacy_records'):
-                raw_record = r.lrange('legacy_records', 0, 0)
-                if raw_record:
-                    migrate_and_insert_record(
-                        zlib.decompress(raw_record[0]),
-                        skip_files=skip_files,
+            move_batch = r.register_script(MOVE_BATCH_TO_PROCESSING_SCRIPT)
+            raw_records = r.lrange(LEGACY_RECORDS_PROCESSING, 0, -1)
+            if raw_records:
+                LOGGER.info('Resuming the migration of %d records.', len(raw_records))
+
+            while True:
+                if not raw_records:
+                    raw_records = move_batch(
+                        keys=[LEGACY_RECORDS_QUEUE, LEGACY_RECORDS_PROCESSING],
+                        args=[batch_size],
                     )
-                    db.session.commit()
-                r.lpop('legacy_records')
+                if not raw_records:
+                    break
+
+                start_time = time()
+                skipped, last_modified = migrate_legacy_records_batch(raw_records, skip_files=skip_files)
+                r.delete(LEGACY_RECORDS_PROCESSING)
+                _report_continuous_migration_stats(
+                    r, len(raw_records), skipped, time() - start_time, last_modified)
+                raw_records = None
         finally:
             lock.release()
     else:
         LOGGER.info("Continuous_migration already executed. Skipping.")
 
 
+def migrate_legacy_records_batch(raw_records, skip_files=False):
+    """Migrate compressed records pushed by Legacy in a single transaction.
+
+    Each record is migrated in its own savepoint, and records that cannot
+    even be inserted in the mirror are logged and skipped. As they are all
+    committed at once, the records are then indexed in bulk.
+
+    Returns:
+        Tuple[int, Optional[datetime]]: the number of records skipped because
+        their content was already migrated, and the last modification date on
+        Legacy of the most recently modified record, if known.
+    """
+    skipped, last_modified = 0, None
+    for compressed_record in raw_records:
+        try:
+            raw_record = zlib.decompress(compressed_record)
+            with db.session.begin_nested():
+                if migrate_and_insert_record(raw_record, skip_files=skip_files) is SKIPPED:
+                    skipped += 1
+        except Exception:
+            LOGGER.exception('Migrator Continuous Migration Error')
+            continue
+
+        match = re_last_modified.search(raw_record)
+        if match:
+            record_last_modified = datetime.strptime(match.group('date'), '%Y%m%d%H%M%S')
+            last_modified = max(last_modified or record_last_modified, record_last_modified)
+
+    db.session.commit()
+    return skipped, last_modified
+
+
+def _report_continuous_migration_stats(r, migrated, skipped, duration, last_modified):
+    """Log the queue depth and lag, and store them in Redis for monitoring.
+
+    The lag is the time elapsed since the last modification on Legacy of the
+    most recently modified record of the batch.
+    """
+    depth = r.llen(LEGACY_RECORDS_QUEUE)
+    lag = (datetime.now() - last_modified).total_seconds() if last_modified else None
+    LOGGER.info(
+        'Migrated %d records (%d unchanged skipped) in %.2fs, %d records left in the queue, lag %ss.',
+        migrated, skipped, duration, depth, lag,
+    )
+    stats = {
+        'depth': depth,
+        'last_batch_size': migrated,
+        'last_batch_skipped': skipped,
+        'last_batch_duration': duration,
+        'updated': datetime.utcnow().isoformat(),
+    }
+    if lag is not None:
+        stats['lag'] = lag
+    r.hmset(LEGACY_RECORDS_STATS, stats)
+
+
 @shared_task(ignore_result=False, queue='migrator')
 @disable_orcid_push
 def migrate_recids_from_mirror(prod_recids, skip_files=False):
+    """Migrate a chunk of records from the mirror.
+
+    The mirrored records are loaded in one query and converted, in a pool of
+    ``RECORDS_MIGRATION_CONVERSION_WORKERS`` processes if more than one. The
+    converted records are then stored in a single transaction, see
+    :func:`store_converted_records`.
+    """
     models_committed.disconnect(index_after_commit)
+    try:
+        prod_records = LegacyRecordsMirror.query.filter(
+            LegacyRecordsMirror.recid.in_(prod_recids),
+        ).all()
+
+        workers = current_app.config.get('RECORDS_MIGRATION_CONVERSION_WORKERS', 1)
+        converted = convert_mirror_records(prod_records, workers=workers)
+
+        records = store_converted_records(converted, skip_files=skip_files)
+
+        index_queue = [create_index_op(record) for record in records]
+        db.session.commit()
+
+        req_timeout = current_app.config['INDEXER_BULK_REQUEST_TIMEOUT']
+        es_bulk(
+            es,
+            index_queue,
+            stats_only=True,
+            request_timeout=req_timeout,
+        )
+    finally:
+        models_committed.connect(index_after_commit)
+
+
+def convert_mirror_records(prod_records, workers=1):
+    """Convert mirrored records to JSON, using a pool of processes if ``workers > 1``.
+
+    The records that cannot be converted are marked with their error.
+
+    Note:
+        A pool of processes cannot be created from a daemonic process, like
+        the ones of the default Celery pool.
+
+    Args:
+        prod_records(List[LegacyRecordsMirror]): the mirrored records.
+        workers(int): number of worker processes.
+
+    Returns:
+        List[Tuple[LegacyRecordsMirror, dict]]: the converted records, each
+        with its mirrored record.
+    """
+    marcxmls = [prod_record.marcxml for prod_record in prod_records]
+    if workers > 1:
+        pool = Pool(processes=workers)
+        try:
+            results = pool.map(_marcxml2record, marcxmls)
+        finally:
+            pool.terminate()
+            pool.join()
+    else:
+        results = [_marcxml2record(marcxml) for marcxml in marcxmls]
+
+    converted = []
+    for prod_record, (json_record, error) in zip(prod_records, results):
+        if error:
+            prod_record.set_error_message(*error)
+        else:
+            converted.append((prod_record, json_record))
 
-    index_queue = []
+    return converted
 
-    for recid in prod_recids:
+
+def _marcxml2record(marcxml):
+    try:
+        json_record = marcxml2record(marcxml)
+    except Exception as exc:
+        LOGGER.exception('Migrator DoJSON Error')
+        return None, (
+            LegacyRecordsMirror.format_error(exc),
+            LegacyRecordsMirror.get_error_signature(exc),
+        )
+
+    if '$schema' in json_record:
+        ensure_valid_schema(json_record)
+
+    return json_record, None
+
+
+def store_converted_records(converted, skip_files=False):
+    """Store converted records in bulk, or one at a time if this fails.
+
+    The existing PIDs and records are fetched in two queries. The new
+    records and the new revisions of the existing ones are then added to
+    the session with the same steps and signals as ``InspireRecord.create``
+    and ``commit``, their PIDs are registered in bulk and everything is
+    flushed at once, see :func:`_store_records_in_bulk`. Records failing
+    validation are marked with their error.
+
+    If anything else fails, the chunk is rolled back to its savepoint and
+    its records are stored by :func:`store_migrated_record`, each in its
+    own savepoint, so that only the faulty ones are marked with an error.
+
+    Args:
+        converted(List[Tuple[LegacyRecordsMirror, dict]]): the converted
+            records, as returned by :func:`convert_mirror_records`.
+        skip_files(bool): see :func:`store_migrated_record`.
+
+    Returns:
+        List[InspireRecord]: the stored records.
+    """
+    pids = _get_existing_pids(json_record for _, json_record in converted)
+    existing_records = dict(
+        (record.id, record) for record in InspireRecord.get_records(list(pids.values()))
+    )
+
+    try:
         with db.session.begin_nested():
-            record = migrate_record_from_mirror(
-                LegacyRecordsMirror.query.get(recid),
+            records, remaining = _store_records_in_bulk(
+                converted, pids, existing_records, skip_files=skip_files,
+            )
+    except Exception:
+        LOGGER.exception('Migrator Bulk Insert Error')
+        records, remaining = [], converted
+
+    for prod_record, json_record in remaining:
+        existing_record = existing_records.get(pids.get(_get_pid_key(json_record)))
+        with db.session.begin_nested():
+            record = store_migrated_record(
+                prod_record,
+                json_record,
                 skip_files=skip_files,
+                existing_record=existing_record,
             )
             if record:
-                index_queue.append(create_index_op(record))
-    db.session.commit()
+                records.append(record)
 
-    req_timeout = current_app.config['INDEXER_BULK_REQUEST_TIMEOUT']
-    es_bulk(
-        es,
-        index_queue,
-        stats_only=True,
-        request_timeout=req_timeout,
-    )
+    return records
+
+
+def _store_records_in_bulk(converted, pids, existing_records, skip_files=False):
+    """Create or update many records with a few statements.
+
+    Deleted records, records without a PID and records whose PID exists
+    but which were not fetched are left to :func:`store_migrated_record`.
+
+    Returns:
+        Tuple[List[InspireRecord], List[Tuple[LegacyRecordsMirror, dict]]]:
+        the stored records, and the converted records left to store.
+    """
+    app = current_app._get_current_object()
+    inserted, stored, remaining, new_pids = [], [], [], []
+
+    for prod_record, json_record in converted:
+        pid_key = _get_pid_key(json_record)
+        object_uuid = pids.get(pid_key)
+        if pid_key is None or json_record.get('deleted') or (
+            object_uuid is not None and object_uuid not in existing_records
+        ):
+            remaining.append((prod_record, json_record))
+            continue
 
-    models_committed.connect(index_after_commit)
+        try:
+            if object_uuid is None:
+                data = strip_empty_values(json_record)
+                record = InspireRecord.add_to_session(data, id_=uuid4())
+                new_pids.append(pid_key + (record.id,))
+                inserted.append(record)
+            else:
+                record = existing_records[object_uuid]
+                record.clear()
+                record.update(json_record, skip_files=True)
+        except ValidationError as exc:
+            _mark_validation_error(prod_record, exc)
+            continue
+
+        if json_record.get('legacy_creation_date'):
+            record.model.created = datetime.strptime(json_record['legacy_creation_date'], '%Y-%m-%d')
+        stored.append((prod_record, record))
+
+    InspireRecordIdProvider.register_many(new_pids)
+    db.session.flush()
+
+    for record in inserted:
+        after_record_insert.send(app, record=record)
+
+    records = []
+    for prod_record, record in stored:
+        if not skip_files:
+            record.download_documents_and_figures(only_new=record.id in existing_records)
+        try:
+            record.update_model()
+        except ValidationError as exc:
+            _mark_validation_error(prod_record, exc)
+            continue
+
+        prod_record.mark_as_migrated()
+        db.session.merge(prod_record)
+        records.append(record)
 
+    db.session.flush()
 
-def _build_recid_to_uuid_map(citations_lookup):
-    numeric_pid_types = get_pid_types_from_endpoints()
-    pids = PersistentIdentifier.query.filter(
-        PersistentIdentifier.object_type == 'rec',
-        PersistentIdentifier.pid_type.in_(numeric_pid_types)).yield_per(
-        1000)
-    with click.progressbar(pids) as bar:
-        return {
-            pid.object_uuid: citations_lookup[int(pid.pid_value)]
-            for pid in bar if int(pid.pid_value) in citations_lookup
-        }
+    for record in records:
+        after_record_update.send(app, record=record)
+
+    return records, remaining
+
+
+def _get_pid_key(json_record):
+    try:
+        pid_type = get_pid_type_from_schema(json_record['$schema'])
+    except (KeyError, TypeError):
+        return None
+
+    control_number = json_record.get('control_number')
+    if control_number is None:
+        return None
+
+    return pid_type, str(control_number)
+
+
+def _get_existing_pids(json_records):
+    keys = set(filter(None, (_get_pid_key(json_record) for json_record in json_records)))
+    if not keys:
+        return {}
+
+    query = PersistentIdentifier.query.with_entities(
+        PersistentIdentifier.pid_type,
+        PersistentIdentifier.pid_value,
+        PersistentIdentifier.object_uuid,
+    ).filter(
+        tuple_(PersistentIdentifier.pid_type, PersistentIdentifier.pid_value).in_(keys),
+    )
+
+    return dict(
+        ((pid_type, pid_value), object_uuid)
+        for pid_type, pid_value, object_uuid in query
+    )
 
 
 @shared_task()
-def add_citation_counts(chunk_size=500, request_timeout=120):
-    def _get_records_to_update_generator(citations_lookup):
-        with click.progressbar(citations_lookup.iteritems()) as bar:
-            for uuid, citation_count in bar:
-                yield {
-                    '_op_type': 'update',
-                    '_index': index,
-                    '_type': doc_type,
-                    '_id': str(uuid),
-                    'doc': {'citation_count': citation_count}
-                }
+def add_citation_counts(chunk_size=500, request_timeout=120, slices=None):
+    """Update the citation counts of all HEP documents in ES.
 
-    index, doc_type = schema_to_index('records/hep.json')
-    citations_lookup = Counter()
+    The counts are computed by the DB from the ``records_citations`` table,
+    for one chunk of documents scanned from ES at a time, so that the memory
+    used does not grow with the size of the corpus. Only the documents whose
+    count changed are indexed again, at the revision of their record.
 
-    click.echo('Extracting all citations...')
-    with click.progressbar(es_scan(
-            es,
-            query={
-                'query': {
-                    'exists': {
-                        'field': 'references.recid'
-                    },
-                },
-                'size': LARGE_CHUNK_SIZE
-            },
-            scroll=u'2m',
-            index=index,
-            doc_type=doc_type)) as records:
-        for record in records:
-            unique_refs_ids = dedupe_list(list(chain.from_iterable(map(
-                force_list, get_value(record, '_source.references.recid')))))
-
-            for unique_refs_id in unique_refs_ids:
-                citations_lookup[unique_refs_id] += 1
-    click.echo('... DONE.')
-
-    click.echo('Mapping recids to UUIDs...')
-    citations_lookup = _build_recid_to_uuid_map(citations_lookup)
-    click.echo('... DONE.')
+    Args:
+        slices(Optional[int]): number of slices scrolled in parallel, see
+            :func:`~inspirehep.modules.search.scan.sliced_scan`. If not set,
+            ``SEARCH_SCAN_SLICES`` is used.
+    """
+    if slices is None:
+        slices = current_app.config['SEARCH_SCAN_SLICES']
+    index, doc_type = schema_to_index('records/hep.json')
 
     click.echo('Adding citation numbers...')
     success, failed = es_bulk(
         es,
-        _get_records_to_update_generator(citations_lookup),
+        _get_citation_count_updates(index, doc_type, slices=slices),
         chunk_size=chunk_size,
         raise_on_exception=False,
         raise_on_error=False,
@@ -346,16 +988,55 @@ def add_citation_counts(chunk_size=500, request_timeout=120):
         success, failed))
 
 
-def insert_into_mirror(raw_records):
-    for raw_record in raw_records:
-        prod_record = LegacyRecordsMirror.from_marcxml(raw_record)
+def _get_citation_count_updates(index, doc_type, slices=1):
+    pid_type = get_pid_type_from_endpoint('literature')
+    hits = sliced_scan(
+        es,
+        source=['control_number', 'citation_count'],
+        slices=slices,
+        size=LARGE_CHUNK_SIZE,
+        scroll=u'2m',
+        index=index,
+        doc_type=doc_type,
+    )
+
+    for chunk in chunker(hits, LARGE_CHUNK_SIZE):
+        pids = dict(
+            (hit['_id'], (pid_type, str(hit['_source']['control_number'])))
+            for hit in chunk if 'control_number' in hit['_source']
+        )
+        counts = RecordCitations.get_counts(list(pids.values()))
+
+        changed_uuids = [
+            hit['_id'] for hit in chunk
+            if hit['_id'] in pids and
+            hit['_source'].get('citation_count') != counts.get(pids[hit['_id']], 0)
+        ]
+        # Partial updates would move the versions of the documents in ES
+        # past the revisions of the records, so they are indexed again.
+        for record in InspireRecord.get_records_bulk(changed_uuids):
+            yield create_index_op(record)
+
+
+def insert_into_mirror(records):
+    """Insert the ``(recid, marcxml)`` pairs yielded by :func:`split_records`."""
+    for recid, raw_record in records:
+        prod_record = LegacyRecordsMirror.from_marcxml(raw_record, recid=recid)
         db.session.merge(prod_record)
     db.session.commit()
 
 
 def migrate_and_insert_record(raw_record, skip_files=False):
-    """Migrate a record and insert it if valid, or log otherwise."""
+    """Migrate a record and insert it if valid, or log otherwise.
+
+    If the content of the record is the same as the last one migrated
+    successfully, it is not migrated again and ``SKIPPED`` is returned.
+    """
     prod_record = LegacyRecordsMirror.from_marcxml(raw_record)
+    existing = LegacyRecordsMirror.query.get(prod_record.recid)
+    if existing and existing.valid and existing.migrated_hash == prod_record.content_hash:
+        return SKIPPED
+
     db.session.merge(prod_record)
     return migrate_record_from_mirror(prod_record, skip_files=skip_files)
 
@@ -383,19 +1064,45 @@ def migrate_record_from_mirror(prod_record, skip_files=False):
     if '$schema' in json_record:
         ensure_valid_schema(json_record)
 
+    return store_migrated_record(prod_record, json_record, skip_files=skip_files)
+
+
+def store_migrated_record(prod_record, json_record, skip_files=False, existing_record=None):
+    """Create or update the record converted from a mirrored legacy record.
+
+    Args:
+        prod_record(LegacyRecordsMirror): the mirrored record.
+        json_record(dict): its conversion to JSON.
+        skip_files(bool): flag indicating whether the files in the record
+            metadata should be copied over from legacy and attach to the
+            record.
+        existing_record(Optional[InspireRecord]): the record to update, if
+            it was already fetched.
+
+    Returns:
+        dict: the migrated record metadata, which is also inserted into the database.
+    """
     try:
-        record = InspireRecord.create_or_update(json_record, skip_files=skip_files)
+        record = InspireRecord.create_or_update(
+            json_record,
+            skip_files=skip_files,
+            existing_record=existing_record,
+        )
         record.commit()
     except ValidationError as exc:
-        pattern = u'Migrator Validator Error: {}, Value: %r, Record: %r'
-        LOGGER.error(pattern.format('.'.join(exc.schema_path)), exc.instance, prod_record.recid)
-        prod_record.error = exc
-        db.session.merge(prod_record)
+        _mark_validation_error(prod_record, exc)
     except Exception as exc:
         LOGGER.exception('Migrator Record Insert Error')
         prod_record.error = exc
         db.session.merge(prod_record)
     else:
-        prod_record.valid = True
+        prod_record.mark_as_migrated()
         db.session.merge(prod_record)
         return record
+
+
+def _mark_validation_error(prod_record, exc):
+    pattern = u'Migrator Validator Error: {}, Value: %r, Record: %r'
+    LOGGER.error(pattern.format('.'.join(exc.schema_path)), exc.instance, prod_record.recid)
+    prod_record.error = exc
+    db.session.merge(prod_record)
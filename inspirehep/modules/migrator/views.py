@@ -25,6 +25,7 @@ from __future__ import absolute_import, division, print_function
 from flask import (
     Blueprint,
     jsonify,
+    request,
 )
 from flask.views import MethodView
 
@@ -33,7 +34,7 @@ from sqlalchemy.sql.expression import false
 
 from inspirehep.modules.migrator.permissions import migrator_use_api_permission
 
-from .dumper import migrator_error_list_dumper
+from .dumper import migrator_error_class_list_dumper, migrator_error_list_dumper
 from .models import LegacyRecordsMirror
 
 
@@ -66,3 +67,25 @@ blueprint.add_url_rule(
     '/errors',
     view_func=migrator_error_list_resource,
 )
+
+
+class MigratorErrorStatsResource(MethodView):
+    """Return the classes of errors of the mirror records, most frequent first."""
+    decorators = [migrator_use_api_permission.require(http_exception=403)]
+
+    def get(self):
+        limit = request.args.get('limit', type=int)
+        errors = LegacyRecordsMirror.count_errors(limit=limit)
+
+        data = {'data': errors}
+        response = jsonify(migrator_error_class_list_dumper(data))
+
+        return response, 200
+
+
+migrator_error_stats_resource = MigratorErrorStatsResource.as_view(
+    'migrator_error_stats_resource')
+blueprint.add_url_rule(
+    '/errors/stats',
+    view_func=migrator_error_stats_resource,
+)
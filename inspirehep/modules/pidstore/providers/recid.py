@@ -27,7 +27,12 @@ from __future__ import absolute_import, division, print_function
 import requests
 from flask import current_app
 
-from invenio_pidstore.models import PIDStatus, RecordIdentifier
+from invenio_db import db
+from invenio_pidstore.models import (
+    PersistentIdentifier,
+    PIDStatus,
+    RecordIdentifier,
+)
 from invenio_pidstore.providers.base import BaseProvider
 
 
@@ -80,3 +85,37 @@ class InspireRecordIdProvider(BaseProvider):
             kwargs['status'] = PIDStatus.REGISTERED
         return super(InspireRecordIdProvider, cls).create(
             object_type=object_type, object_uuid=object_uuid, **kwargs)
+
+    @classmethod
+    def register_many(cls, pids, object_type='rec'):
+        """Register many record identifiers at once.
+
+        Unlike ``create``, which issues a few queries per identifier, the
+        record identifiers and the PIDs are inserted with one statement
+        each and the recid sequence is updated only once.
+
+        Args:
+            pids(List[Tuple[str, str, uuid.UUID]]): the ``pid_type``,
+                ``pid_value`` and ``object_uuid`` of each identifier.
+            object_type(str): the type of the assigned objects.
+        """
+        if not pids:
+            return
+
+        recids = sorted(int(pid_value) for _, pid_value, _ in pids)
+        db.session.bulk_insert_mappings(
+            RecordIdentifier,
+            [{'recid': recid} for recid in recids[:-1]],
+        )
+        # Inserting the largest one moves the sequence past all of them.
+        RecordIdentifier.insert(recids[-1])
+
+        db.session.bulk_insert_mappings(PersistentIdentifier, [
+            {
+                'pid_type': pid_type,
+                'pid_value': str(pid_value),
+                'status': PIDStatus.REGISTERED,
+                'object_type': object_type,
+                'object_uuid': object_uuid,
+            } for pid_type, pid_value, object_uuid in pids
+        ])
@@ -28,47 +28,110 @@ from flask import current_app
 from six import iteritems
 from six.moves.urllib.parse import urlsplit
 
+from inspirehep.utils.cache import LRUCache
 
-def get_pid_types_from_endpoints():
-    return _get_pid_type_endpoint_map().keys()
 
+class PidTypeRegistry(object):
+    """Mappings between the PID types, endpoints and schemas of records.
+
+    The mappings are computed once from ``RECORDS_REST_ENDPOINTS``, and the
+    results of parsing ``$schema`` and ``$ref`` URLs are memoized, as these
+    lookups happen for every record that is stored, indexed or resolved.
+    """
 
-def _get_pid_type_endpoint_map():
-    pid_type_endpoint_map = {}
-    for key, value in iteritems(current_app.config['RECORDS_REST_ENDPOINTS']):
-        if value.get('default_endpoint_prefix'):
-            pid_type_endpoint_map[value['pid_type']] = key
+    def __init__(self, endpoints_config, maxsize=1024):
+        self.endpoint_by_pid_type = {
+            value['pid_type']: key for key, value in iteritems(endpoints_config)
+            if value.get('default_endpoint_prefix')
+        }
+        self.pid_type_by_endpoint = {
+            value: key for key, value in iteritems(self.endpoint_by_pid_type)
+        }
+        self._parsed_urls = LRUCache(maxsize)
+
+    @property
+    def pid_types(self):
+        return list(self.endpoint_by_pid_type)
+
+    def get_endpoint(self, pid_type):
+        """Return the endpoint corresponding to a ``pid_type``."""
+        return self.endpoint_by_pid_type[pid_type]
+
+    def get_pid_type(self, endpoint):
+        """Return the ``pid_type`` corresponding to an endpoint."""
+        return self.pid_type_by_endpoint[endpoint]
+
+    def get_pid_type_from_schema(self, schema):
+        """Return the ``pid_type`` corresponding to a schema URL.
+
+        The schema name corresponds to the ``endpoint`` in all cases except for
+        Literature records.
+        """
+        key = ('schema', schema)
+        pid_type = self._parsed_urls.get(key)
+        if pid_type is None:
+            schema_name = urlsplit(schema).path.split('/')[-1].split('.')[0]
+            if schema_name == 'hep':  # FIXME: remove when hep.json -> literature.json
+                pid_type = 'lit'
+            else:
+                pid_type = self.get_pid_type(schema_name)
+            self._parsed_urls.set(key, pid_type)
+
+        return pid_type
+
+    def get_pid_type_from_ref(self, ref):
+        """Return the ``pid_type`` of the record referenced by a ``$ref`` URL.
+
+        Only the part of the URL before the ``pid_value`` is memoized, as it
+        is shared by all the references to the same endpoint.
+        """
+        key = ('ref', ref.rstrip('/').rsplit('/', 1)[0])
+        pid_type = self._parsed_urls.get(key)
+        if pid_type is None:
+            pid_type = self.get_pid_type(key[1].rsplit('/', 1)[-1])
+            self._parsed_urls.set(key, pid_type)
+
+        return pid_type
+
+    def get_pid_from_ref(self, ref):
+        """Return the ``(pid_type, pid_value)`` of the record referenced by a ``$ref`` URL."""
+        pid_value = ref.rstrip('/').rsplit('/', 1)[-1]
+        return self.get_pid_type_from_ref(ref), pid_value
+
+
+def get_pid_type_registry():
+    """Return the :class:`PidTypeRegistry` of the current application."""
+    return current_app.extensions['inspire-pidstore'].registry
 
-    return pid_type_endpoint_map
+
+def get_pid_types_from_endpoints():
+    return get_pid_type_registry().pid_types
 
 
 def get_endpoint_from_pid_type(pid_type):
     """Return the endpoint corresponding to a ``pid_type``."""
-    PID_TYPE_TO_ENDPOINT = _get_pid_type_endpoint_map()
-
-    return PID_TYPE_TO_ENDPOINT[pid_type]
+    return get_pid_type_registry().get_endpoint(pid_type)
 
 
 def get_pid_type_from_endpoint(endpoint):
     """Return the ``pid_type`` corresponding to an endpoint."""
-    ENDPOINT_TO_PID_TYPE = {
-        v: k for k, v in iteritems(_get_pid_type_endpoint_map())}
-
-    return ENDPOINT_TO_PID_TYPE[endpoint]
+    return get_pid_type_registry().get_pid_type(endpoint)
 
 
 def get_pid_type_from_schema(schema):
     """Return the ``pid_type`` corresponding to a schema URL.
 
     The schema name corresponds to the ``endpoint`` in all cases except for
-    Literature records. This implementation exploits this by falling back to
-    ``get_pid_type_from_endpoint``.
+    Literature records, see :meth:`PidTypeRegistry.get_pid_type_from_schema`.
     """
-    def _get_schema_name_from_schema(schema):
-        return urlsplit(schema).path.split('/')[-1].split('.')[0]
+    return get_pid_type_registry().get_pid_type_from_schema(schema)
+
+
+def get_pid_type_from_ref(ref):
+    """Return the ``pid_type`` of the record referenced by a ``$ref`` URL."""
+    return get_pid_type_registry().get_pid_type_from_ref(ref)
 
-    schema_name = _get_schema_name_from_schema(schema)
-    if schema_name == 'hep':  # FIXME: remove when hep.json -> literature.json
-        return 'lit'
 
-    return get_pid_type_from_endpoint(schema_name)
+def get_pid_from_ref(ref):
+    """Return the ``(pid_type, pid_value)`` of the record referenced by a ``$ref`` URL."""
+    return get_pid_type_registry().get_pid_from_ref(ref)
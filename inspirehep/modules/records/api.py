@@ -33,7 +33,6 @@ from elasticsearch.exceptions import NotFoundError
 from flask import current_app
 from fs.opener import fsopen
 from six.moves.urllib.parse import urlparse, unquote
-from invenio_records.api import RecordMetadata
 
 from inspire_dojson.utils import get_recid_from_ref, strip_empty_values, absolute_url
 from inspire_schemas.api import validate
@@ -41,13 +40,20 @@ from inspire_schemas.builders import LiteratureBuilder
 from invenio_files_rest.models import Bucket
 from invenio_pidstore.errors import PIDDoesNotExistError
 from invenio_pidstore.models import PersistentIdentifier
+from invenio_records.errors import MissingModelError
+from invenio_records.models import RecordMetadata
+from invenio_records.signals import (
+    after_record_insert,
+    after_record_update,
+    before_record_insert,
+    before_record_update,
+)
 from invenio_records_files.api import Record
 from invenio_db import db
-from sqlalchemy import Text
-from sqlalchemy.sql.functions import GenericFunction
-from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm.attributes import flag_modified
 
 from inspirehep.modules.pidstore.minters import inspire_recid_minter
+from inspirehep.modules.records.models import RecordCitations
 from inspirehep.modules.pidstore.utils import get_pid_type_from_schema, get_endpoint_from_pid_type
 from inspirehep.utils.record_getter import (
     RecordGetterError,
@@ -57,10 +63,6 @@ from inspirehep.utils.record_getter import (
 MAX_UNIQUE_KEY_COUNT = 50000
 
 
-class referenced_records(GenericFunction):
-    type = postgresql.ARRAY(Text)
-
-
 class InspireRecord(Record):
     """Record class that fetches records from DataBase."""
 
@@ -104,7 +106,12 @@ class InspireRecord(Record):
 
         with db.session.begin_nested():
             cls.mint(id_, data)
-            record = super(InspireRecord, cls).create(data, id_=id_, **kwargs)
+            record = cls.add_to_session(data, id_=id_, **kwargs)
+
+        after_record_insert.send(
+            current_app._get_current_object(),
+            record=record,
+        )
 
         if not skip_files:
             record.download_documents_and_figures(
@@ -113,6 +120,33 @@ class InspireRecord(Record):
 
         return record
 
+    @classmethod
+    def add_to_session(cls, data, id_=None, **kwargs):
+        """Validate a new record and add its model to the session.
+
+        These are the steps of ``create`` which don't need a savepoint or
+        a flush, so that many records can be inserted at once. It is up to
+        the caller to mint the record and to send the
+        ``after_record_insert`` signal once the record is flushed.
+
+        Args:
+            data(dict): the record metadata.
+            id_(uuid): an optional uuid to assign to the record object.
+
+        Returns:
+            InspireRecord: the new record.
+        """
+        record = cls(data)
+        before_record_insert.send(
+            current_app._get_current_object(),
+            record=record,
+        )
+        record.validate(**kwargs)
+        record.model = RecordMetadata(id=id_, json=record)
+        db.session.add(record.model)
+
+        return record
+
     @classmethod
     def create_or_update(cls, data, **kwargs):
         """Create or update a record.
@@ -132,6 +166,9 @@ class InspireRecord(Record):
                 described above. Note also that, if not passed, it will fall
                 back to the value of the ``RECORDS_SKIP_FILES`` configuration
                 variable.
+            existing_record(InspireRecord): the record registered with the
+                same ``control_number`` and ``pid_type``, if it was already
+                fetched, e.g. together with other records.
 
         Examples:
             >>> record = {
@@ -147,10 +184,12 @@ class InspireRecord(Record):
         files_src_records = kwargs.pop('files_src_records', [])
         skip_files = kwargs.pop(
             'skip_files', current_app.config.get('RECORDS_SKIP_FILES'))
+        record = kwargs.pop('existing_record', None)
 
         try:
-            pid = PersistentIdentifier.get(pid_type, control_number)
-            record = super(InspireRecord, cls).get_record(pid.object_uuid)
+            if record is None:
+                pid = PersistentIdentifier.get(pid_type, control_number)
+                record = super(InspireRecord, cls).get_record(pid.object_uuid)
             record.clear()
             record.update(data, skip_files=skip_files, **kwargs)
 
@@ -202,6 +241,40 @@ class InspireRecord(Record):
                 only_new=True,
             )
 
+    def commit(self, **kwargs):
+        """Override the default ``commit``.
+
+        To share its steps with :meth:`update_model`.
+        """
+        if self.model is None or self.model.json is None:
+            raise MissingModelError()
+
+        with db.session.begin_nested():
+            self.update_model(**kwargs)
+
+        after_record_update.send(
+            current_app._get_current_object(),
+            record=self,
+        )
+        return self
+
+    def update_model(self, **kwargs):
+        """Validate the record and merge its changes into the session.
+
+        These are the steps of ``commit`` which don't need a savepoint or
+        a flush, so that many records can be updated at once. It is up to
+        the caller to send the ``after_record_update`` signal once the
+        record is flushed.
+        """
+        before_record_update.send(
+            current_app._get_current_object(),
+            record=self,
+        )
+        self.validate(**kwargs)
+        self.model.json = dict(self)
+        flag_modified(self.model, 'json')
+        db.session.merge(self.model)
+
     def merge(self, other):
         """Redirect pidstore of current record to the other InspireRecord.
 
@@ -602,11 +675,14 @@ class InspireRecord(Record):
 
     def _query_citing_records(self):
         """Returns records which cites this one."""
-        ref = self._get_ref()
-        if not ref:
-            raise Exception("There is no $ref for this object")
-        citations = RecordMetadata.query.with_entities(RecordMetadata.id).filter(
-            referenced_records(RecordMetadata.json).contains([ref]))
+        pid_type = get_pid_type_from_schema(self.get('$schema'))
+        pid_value = self.get('control_number')
+        if not pid_value:
+            raise Exception("There is no control_number for this object")
+        citations = RecordCitations.query.with_entities(RecordCitations.citer_id).filter_by(
+            cited_pid_type=pid_type,
+            cited_pid_value=str(pid_value),
+        )
         return citations
 
     @property
@@ -614,10 +690,43 @@ class InspireRecord(Record):
         return self._query_citing_records()
 
     def get_citations_count(self):
-        """Returns citations count for this record."""
+        """Returns citations count for this record.
+
+        If the count was prefetched by ``get_records_bulk``, no query is made.
+        """
+        if getattr(self, '_citations_count', None) is not None:
+            return self._citations_count
+
         count = self.get_citing_records_query.count()
         return count
 
+    @classmethod
+    def get_records_bulk(cls, ids, with_deleted=False):
+        """Get several records, and their citation counts, in two queries.
+
+        Args:
+            ids(List[str]): the UUIDs of the records.
+            with_deleted(bool): whether to also return deleted records.
+
+        Returns:
+            List[InspireRecord]: the records found, ready to be indexed
+            without further per-record queries.
+        """
+        records = cls.get_records(ids, with_deleted=with_deleted)
+
+        pids = {}
+        for record in records:
+            if record.get('$schema') and record.get('control_number'):
+                pid_type = get_pid_type_from_schema(record['$schema'])
+                pids[record.id] = (pid_type, str(record['control_number']))
+
+        counts = RecordCitations.get_counts(list(set(pids.values())))
+        for record in records:
+            if record.id in pids:
+                record._citations_count = counts.get(pids[record.id], 0)
+
+        return records
+
 
 class ESRecord(InspireRecord):
     """Record class that fetches records from ElasticSearch."""
@@ -22,7 +22,10 @@
 
 from __future__ import absolute_import, division, print_function
 
-from time import sleep
+import os
+from collections import deque
+from datetime import datetime, timedelta
+from time import sleep, time
 
 import click
 import click_spinner
@@ -32,9 +35,24 @@ from invenio_db import db
 from invenio_pidstore.models import PersistentIdentifier, PIDStatus
 from flask import current_app
 from flask.cli import with_appcontext
+from invenio_search import current_search_client as es
+
+from inspire_utils.dedupers import dedupe_list
 
 from .checkers import check_unlinked_references
-from .tasks import batch_reindex
+from .indices import (
+    create_shadow_index,
+    delete_from_index,
+    get_index_from_pid_type,
+    get_record_uuids,
+    get_serving_settings,
+    is_concrete_index,
+    swap_index_alias,
+)
+from .tasks import batch_reindex, populate_records_citations
+
+
+REBUILD_CLOCK_SKEW = timedelta(minutes=1)
 
 
 @click.group()
@@ -68,6 +86,23 @@ def unlinked_references(doi_file_name, arxiv_file_name):
         arxiv_file_name.write(u'{i[0]}: {i[1]}\n'.format(i=item))
 
 
+@click.group()
+def citations():
+    """Commands to manage the citations between records"""
+
+
+@citations.command()
+@click.option('-s', '--batch-size', default=1000)
+@with_appcontext
+def backfill(batch_size):
+    """Rebuild the citations table from the references of all records."""
+    with click_spinner.spinner():
+        click.echo('Extracting the citations of all records...')
+        count = populate_records_citations(batch_size=batch_size)
+
+    click.secho('Done! Inserted {} citations.'.format(count), fg='green')
+
+
 def next_batch(iterator, batch_size):
     """Get first batch_size elements from the iterable, or remaining if less.
 
@@ -86,131 +121,414 @@ def next_batch(iterator, batch_size):
     return batch
 
 
+class ReindexCheckpoint(object):
+    """Progress of a ``simpleindex`` run, persisted to a JSON file.
+
+    ``last_uuid`` is the last UUID of the longest sequence of batches, in
+    submission order, which have all finished, so that a resumed run never
+    skips a record that was not indexed. The counters only include these
+    batches too, while the failures and errors are appended to their logs,
+    one JSON object per line.
+    """
+
+    def __init__(self, path, pid_types, last_uuid=None, success=0, failures=0,
+                 batch_errors=0, failures_log_path=None, errors_log_path=None):
+        self.path = path
+        self.pid_types = sorted(pid_types)
+        self.last_uuid = last_uuid
+        self.success = success
+        self.failures = failures
+        self.batch_errors = batch_errors
+        self.failures_log_path = failures_log_path
+        self.errors_log_path = errors_log_path
+
+    @classmethod
+    def load(cls, path, **kwargs):
+        with open(path) as fd:
+            data = json.load(fd)
+        data.update(kwargs)
+
+        return cls(path, **data)
+
+    def add_batch(self, uuids, task):
+        """Count the results of a finished ``batch_reindex`` task."""
+        if task.failed():
+            self.batch_errors += 1
+            _append_to_log(self.errors_log_path, [{
+                'ids': uuids,
+                'error': repr(task.result),
+            }])
+        else:
+            self.success += task.result['success']
+            self.failures += len(task.result['failures'])
+            _append_to_log(
+                self.failures_log_path,
+                [_format_index_failure(failure) for failure in task.result['failures']],
+            )
+
+        self.last_uuid = uuids[-1]
+
+    def save(self):
+        if not self.path:
+            return
+
+        data = {
+            'pid_types': self.pid_types,
+            'last_uuid': self.last_uuid,
+            'success': self.success,
+            'failures': self.failures,
+            'batch_errors': self.batch_errors,
+        }
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as fd:
+            json.dump(data, fd)
+        os.rename(tmp_path, self.path)
+
+    def remove(self):
+        if self.path and os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def _format_index_failure(failure):
+    try:
+        return {
+            'id': failure['index']['_id'],
+            'error': failure['index']['error'],
+        }
+    except Exception:
+        return {
+            'error': repr(failure),
+        }
+
+
+def _append_to_log(log_path, entries):
+    if not (log_path and entries):
+        return
+
+    with open(log_path, 'a') as log:
+        for entry in entries:
+            log.write(json.dumps(entry) + '\n')
+
+
+def _read_log(log_path):
+    if not os.path.exists(log_path):
+        return []
+
+    with open(log_path) as log:
+        return [json.loads(line) for line in log if line.strip()]
+
+
+def reindex_batches(batches, checkpoint, total, queue_name, max_in_flight,
+                    request_timeout, report_interval=10, task_kwargs=None):
+    """Reindex batches of UUIDs with a bounded number of ``batch_reindex`` tasks.
+
+    Only the tasks in flight are polled. The results of the batches are added
+    to the checkpoint, which is then saved, every time the oldest batch in
+    flight finishes.
+
+    Args:
+        batches(Iterator[List[str]]): the batches of record UUIDs.
+        checkpoint(ReindexCheckpoint): where the progress is stored.
+        total(int): the number of records, to compute the ETA.
+        queue_name(str): name of the celery queue.
+        max_in_flight(int): maximum number of tasks running at the same time.
+        request_timeout(float): timeout of the ES bulk requests.
+        report_interval(int): seconds between two progress reports.
+        task_kwargs(dict): extra arguments passed to ``batch_reindex``.
+    """
+    in_flight = deque()
+    start = last_report = time()
+    processed = 0
+    running = [0]
+
+    def _submit(uuids):
+        kwargs = dict(task_kwargs or {})
+        kwargs.update({
+            'uuids': uuids,
+            'request_timeout': request_timeout,
+        })
+        task = batch_reindex.apply_async(kwargs=kwargs, queue=queue_name)
+        in_flight.append([task, uuids, False])
+        running[0] += 1
+
+    def _collect(entry):
+        entry[2] = True
+        running[0] -= 1
+
+    def _report():
+        elapsed = time() - start
+        rate = processed / elapsed if elapsed else 0
+        eta = timedelta(seconds=int((total - processed) / rate)) if rate else '-'
+        click.echo('Indexed {}/{} records ({:.1f} docs/s, ETA {}).'.format(
+            processed, total, rate, eta))
+
+    batch = next(batches, None)
+    while batch or in_flight:
+        while batch and running[0] < max_in_flight:
+            _submit(batch)
+            batch = next(batches, None)
+
+        finished = [
+            entry for entry in in_flight
+            if not entry[2] and entry[0].ready()
+        ]
+        for entry in finished:
+            _collect(entry)
+            processed += len(entry[1])
+
+        if in_flight and in_flight[0][2]:
+            while in_flight and in_flight[0][2]:
+                task, uuids, _ = in_flight.popleft()
+                checkpoint.add_batch(uuids, task)
+            checkpoint.save()
+        elif not finished:
+            sleep(0.5)
+
+        if time() - last_report >= report_interval:
+            _report()
+            last_report = time()
+
+    _report()
+
+
+def uuid_batches(query, batch_size):
+    """Iterate over the UUIDs returned by ``query`` in batches of ``batch_size``."""
+    items = iter(query.yield_per(2000))
+    return iter(lambda: [str(item[0]) for item in next_batch(items, batch_size)], [])
+
+
+def _read_failed_uuids(failures_log_path, errors_log_path):
+    uuids = [
+        failure['id'] for failure in _read_log(failures_log_path)
+        if 'id' in failure
+    ]
+    for error in _read_log(errors_log_path):
+        uuids.extend(error['ids'])
+
+    return dedupe_list(uuids)
+
+
+def _remove_logs(*log_paths):
+    for log_path in log_paths:
+        if os.path.exists(log_path):
+            os.remove(log_path)
+
+
 @click.command()
 @click.option('--yes-i-know', is_flag=True)
-@click.option('-t', '--pid-type', multiple=True, required=True)
+@click.option('-t', '--pid-type', multiple=True)
 @click.option('-s', '--batch-size', default=200)
 @click.option('-q', '--queue-name', default='indexer_task')
+@click.option('-m', '--max-in-flight', default=50,
+              help='Maximum number of indexing tasks running at the same time.')
+@click.option('--checkpoint-file', default='/tmp/records_index_checkpoint.json')
+@click.option('--resume', is_flag=True,
+              help='Continue the run interrupted at the saved checkpoint.')
+@click.option('--retry-failures', is_flag=True,
+              help='Only reindex the records that failed in the last run.')
 @with_appcontext
-def simpleindex(yes_i_know, pid_type, batch_size, queue_name):
+def simpleindex(yes_i_know, pid_type, batch_size, queue_name, max_in_flight,
+                checkpoint_file, resume, retry_failures):
     """Bulk reindex all records in a parallel manner.
 
     :param yes_i_know: if True, skip confirmation screen
     :param pid_type: array of PID types, allowed: lit, con, exp, jou, aut, job, ins
     :param batch_size: number of documents per batch sent to workers.
     :param queue_name: name of the celery queue
+    :param max_in_flight: maximum number of batches sent to workers at the same time.
+    :param checkpoint_file: path of the file storing the progress of the run.
+    :param resume: if True, continue from the checkpoint of an interrupted run.
+    :param retry_failures: if True, reindex only the records in the failure logs.
     """
+    failures_log_path = '/tmp/records_index_failures.log'
+    errors_log_path = '/tmp/records_index_errors.log'
+
+    if not pid_type and not retry_failures:
+        raise click.UsageError('Missing option "-t" / "--pid-type".')
+
     if not yes_i_know:
         click.confirm(
             'Do you really want to reindex the record?',
             abort=True,
         )
 
-    click.secho('Sending record UUIDs to the indexing queue...', fg='green')
+    request_timeout = current_app.config.get('INDEXER_BULK_REQUEST_TIMEOUT')
 
-    query = (
-        db.session.query(PersistentIdentifier.object_uuid)
-        .filter(
-            PersistentIdentifier.pid_type.in_(pid_type),
-            PersistentIdentifier.object_type == 'rec',
-            PersistentIdentifier.status == PIDStatus.REGISTERED,
+    if retry_failures:
+        uuids = _read_failed_uuids(failures_log_path, errors_log_path)
+        _remove_logs(failures_log_path, errors_log_path)
+        total = len(uuids)
+        checkpoint = ReindexCheckpoint(
+            None,
+            pid_type,
+            failures_log_path=failures_log_path,
+            errors_log_path=errors_log_path,
         )
-    )
-    request_timeout = current_app.config.get('INDEXER_BULK_REQUEST_TIMEOUT')
-    all_tasks = []
-    records_per_tasks = {}
-
-    with click.progressbar(
-        query.yield_per(2000),
-        length=query.count(),
-        label='Scheduling indexing tasks'
-    ) as items:
-        batch = next_batch(items, batch_size)
-
-        while batch:
-            uuids = [str(item[0]) for item in batch]
-            indexer_task = batch_reindex.apply_async(
-                kwargs={
-                    'uuids': uuids,
-                    'request_timeout': request_timeout,
-                },
-                queue=queue_name,
+        batches = iter([uuids[i:i + batch_size] for i in range(0, total, batch_size)])
+        click.secho('Sending {} failed records to the indexing queue...'.format(total), fg='green')
+    else:
+        if resume:
+            try:
+                checkpoint = ReindexCheckpoint.load(
+                    checkpoint_file,
+                    failures_log_path=failures_log_path,
+                    errors_log_path=errors_log_path,
+                )
+            except IOError:
+                raise click.UsageError('No checkpoint found in {}.'.format(checkpoint_file))
+            if checkpoint.pid_types != sorted(pid_type):
+                raise click.UsageError('The checkpoint was saved for the PID types {}.'.format(
+                    ', '.join(checkpoint.pid_types)))
+        else:
+            _remove_logs(failures_log_path, errors_log_path)
+            checkpoint = ReindexCheckpoint(
+                checkpoint_file,
+                pid_type,
+                failures_log_path=failures_log_path,
+                errors_log_path=errors_log_path,
             )
 
-            records_per_tasks[indexer_task.id] = uuids
-            all_tasks.append(indexer_task)
-            batch = next_batch(items, batch_size)
-
-    click.secho('Created {} tasks.'.format(len(all_tasks)), fg='green')
-
-    with click.progressbar(
-        length=len(all_tasks),
-        label='Indexing records'
-    ) as progressbar:
-        def _finished_tasks_count():
-            return len(filter(lambda task: task.ready(), all_tasks))
-
-        while len(all_tasks) != _finished_tasks_count():
-            sleep(0.5)
-            # this is so click doesn't divide by 0:
-            progressbar.pos = _finished_tasks_count() or 1
-            progressbar.update(0)
+        query = (
+            db.session.query(PersistentIdentifier.object_uuid)
+            .filter(
+                PersistentIdentifier.pid_type.in_(pid_type),
+                PersistentIdentifier.object_type == 'rec',
+                PersistentIdentifier.status == PIDStatus.REGISTERED,
+            )
+        )
+        if checkpoint.last_uuid:
+            query = query.filter(PersistentIdentifier.object_uuid > checkpoint.last_uuid)
+            click.secho('Resuming after record {}...'.format(checkpoint.last_uuid), fg='green')
+        query = query.order_by(PersistentIdentifier.object_uuid)
+
+        total = query.count()
+        batches = uuid_batches(query, batch_size)
+        click.secho('Sending {} record UUIDs to the indexing queue...'.format(total), fg='green')
+
+    reindex_batches(
+        batches,
+        checkpoint,
+        total,
+        queue_name=queue_name,
+        max_in_flight=max_in_flight,
+        request_timeout=request_timeout,
+    )
 
-    failures = []
-    successes = 0
-    batch_errors = []
-
-    for task in all_tasks:
-        result = task.result
-        if task.failed():
-            batch_errors.append({
-                'task_id': task.id,
-                'error': result,
-            })
-        else:
-            successes += result['success']
-            failures += result['failures']
+    failures = checkpoint.failures
+    batch_errors = checkpoint.batch_errors
 
     color = 'red' if failures or batch_errors else 'green'
     click.secho(
         'Reindexing finished: {} failed, {} succeeded, additionally {} batches errored.'.format(
-            len(failures),
-            successes,
-            len(batch_errors),
+            failures,
+            checkpoint.success,
+            batch_errors,
         ),
         fg=color,
     )
 
-    failures_log_path = '/tmp/records_index_failures.log'
-    errors_log_path = '/tmp/records_index_errors.log'
-
     if failures:
-        failures_json = []
-        for failure in failures:
-            try:
-                failures_json.append({
-                    'id': failure['index']['_id'],
-                    'error': failure['index']['error'],
-                })
-            except Exception:
-                failures_json.append({
-                    'error': repr(failure),
-                })
-        with open(failures_log_path, 'w') as log:
-            json.dump(failures_json, log)
-
         click.secho('You can see the index failures in %s' % failures_log_path)
 
     if batch_errors:
-        errors_json = []
-        for error in batch_errors:
-            task_id = error['task_id']
-            failed_uuids = records_per_tasks[task_id]
-            errors_json.append({
-                'ids': failed_uuids,
-                'error': repr(error['error']),
-            })
-        with open(errors_log_path, 'w') as log:
-            json.dump(errors_json, log)
-
         click.secho('You can see the errors in %s' % errors_log_path)
+
+    checkpoint.remove()
+
+
+@click.command()
+@click.option('--yes-i-know', is_flag=True)
+@click.option('-t', '--pid-type', required=True)
+@click.option('-s', '--batch-size', default=200)
+@click.option('-q', '--queue-name', default='indexer_task')
+@click.option('-m', '--max-in-flight', default=50,
+              help='Maximum number of indexing tasks running at the same time.')
+@click.option('--delete-old', is_flag=True,
+              help='Delete the previously served index after the swap.')
+@click.option('--force', is_flag=True,
+              help='Replace the old index even if it is not served under an alias, '
+                   'as after "inspirehep db init". It is deleted by the swap.')
+@with_appcontext
+def rebuildindex(yes_i_know, pid_type, batch_size, queue_name, max_in_flight, delete_old, force):
+    """Rebuild the index of a PID type without downtime.
+
+    The records are indexed in parallel into a new index created from the
+    current mapping, while searches are still served by the old one. The
+    records changed in the meantime are then indexed again, and the new index
+    is atomically swapped in under the alias of the old one.
+
+    :param yes_i_know: if True, skip confirmation screen
+    :param pid_type: PID type of the records, allowed: lit, con, exp, jou, aut, job, ins, dat
+    :param batch_size: number of documents per batch sent to workers.
+    :param queue_name: name of the celery queue
+    :param max_in_flight: maximum number of batches sent to workers at the same time.
+    :param delete_old: if True, delete the old index once the new one is served.
+    :param force: if True, replace the old index even if it is a concrete
+        index instead of an alias, deleting it in the swap.
+    """
+    alias = get_index_from_pid_type(pid_type)
+    if is_concrete_index(alias) and not force:
+        raise click.UsageError(
+            '{} is a concrete index, it would be deleted by the swap. '
+            'Pass --force to replace it anyway.'.format(alias))
+
+    if not yes_i_know:
+        click.confirm(
+            'Do you really want to rebuild the index?',
+            abort=True,
+        )
+
+    request_timeout = current_app.config.get('INDEXER_BULK_REQUEST_TIMEOUT')
+    doc_type = alias.split('-', 1)[-1]
+    settings = get_serving_settings(alias)
+
+    def _reindex(query, index):
+        checkpoint = ReindexCheckpoint(None, [pid_type])
+        reindex_batches(
+            uuid_batches(query, batch_size),
+            checkpoint,
+            query.count(),
+            queue_name=queue_name,
+            max_in_flight=max_in_flight,
+            request_timeout=request_timeout,
+            task_kwargs={'index': index, 'version_type': 'external_gte'},
+        )
+        return checkpoint
+
+    def _replay(since, index):
+        query = get_record_uuids(pid_type, since=since)
+        for uuids in uuid_batches(query, batch_size):
+            delete_from_index(index, doc_type, uuids, request_timeout=request_timeout)
+        return _reindex(query, index)
+
+    # Records are timestamped by the workers, so leave room for clock skew.
+    build_start = datetime.utcnow() - REBUILD_CLOCK_SKEW
+    index = create_shadow_index(alias)
+    click.secho('Filling the new index {}...'.format(index), fg='green')
+    checkpoint = _reindex(get_record_uuids(pid_type), index)
+
+    replay_start = datetime.utcnow() - REBUILD_CLOCK_SKEW
+    click.secho('Replaying the changes made during the build...', fg='green')
+    _replay(build_start, index)
+
+    old_indices = swap_index_alias(alias, index, settings, force=force)
+    click.secho('{} is now served as {}.'.format(index, alias), fg='green')
+
+    click.secho('Replaying the changes made during the swap...', fg='green')
+    _replay(replay_start, index)
+
+    if delete_old:
+        for old_index in old_indices:
+            es.indices.delete(index=old_index)
+        click.secho('Deleted {}.'.format(', '.join(old_indices) or 'nothing'))
+    elif old_indices:
+        click.secho('The old indices {} can be deleted.'.format(', '.join(old_indices)))
+
+    if checkpoint.failures or checkpoint.batch_errors:
+        click.secho(
+            '{} records failed and {} batches errored while filling the index.'.format(
+                checkpoint.failures,
+                checkpoint.batch_errors,
+            ),
+            fg='red',
+        )
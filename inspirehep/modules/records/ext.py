@@ -24,7 +24,7 @@
 
 from __future__ import absolute_import, division, print_function
 
-from .cli import check, simpleindex
+from .cli import check, citations, rebuildindex, simpleindex
 
 
 class InspireRecords(object):
@@ -34,8 +34,11 @@ class InspireRecords(object):
 
     def init_app(self, app):
         app.cli.add_command(check)
+        app.cli.add_command(citations)
+        app.cli.add_command(rebuildindex)
         app.cli.add_command(simpleindex)
         app.extensions['inspire-records'] = self
 
         # Register the receivers:
         from inspirehep.modules.records import receivers  # noqa: F401
+        from inspirehep.modules.records import models  # noqa: F401
@@ -22,9 +22,22 @@
 
 from __future__ import absolute_import, division, print_function
 
-from invenio_indexer.api import RecordIndexer
+import time
+from collections import Counter, OrderedDict
+from itertools import islice
 
+from elasticsearch.helpers import bulk
+from flask import current_app
+from sqlalchemy.orm.exc import NoResultFound
+
+from invenio_indexer.api import RecordIndexer, current_record_to_index
+from invenio_search import current_search_client as es
+
+from inspire_utils.logging import getStackTraceLogger
 from inspirehep.modules.records.api import InspireRecord
+from inspirehep.utils.record import create_index_op
+
+LOGGER = getStackTraceLogger(__name__)
 
 
 class InspireRecordIndexer(RecordIndexer):
@@ -62,17 +75,63 @@ class InspireRecordIndexer(RecordIndexer):
             '_id': payload['id'],
         }
 
-    def _index_action(self, payload):
+    def _actionsiter(self, message_iterator):
+        """Iterate bulk actions, loading the records of each chunk of messages at once.
+
+        If the records of a chunk can't be loaded, all its messages are
+        rejected, as a single message is when its action can't be built.
+
+        Args:
+            message_iterator: Iterator yielding messages from a queue.
+        """
+        chunk_size = current_app.config['INDEXER_BULK_CHUNK_SIZE']
+
+        while True:
+            messages = list(islice(message_iterator, chunk_size))
+            if not messages:
+                return
+
+            try:
+                payloads = [message.decode() for message in messages]
+                records = {
+                    str(record.id): record
+                    for record in InspireRecord.get_records_bulk([
+                        payload['id'] for payload in payloads
+                        if payload['op'] != 'delete'
+                    ])
+                }
+            except Exception:
+                LOGGER.exception('Failed to load the records of %d messages', len(messages))
+                for message in messages:
+                    message.reject()
+                continue
+
+            for message, payload in zip(messages, payloads):
+                try:
+                    if payload['op'] == 'delete':
+                        yield self._delete_action(payload)
+                    else:
+                        yield self._index_action(payload, records.get(str(payload['id'])))
+                    message.ack()
+                except NoResultFound:
+                    message.reject()
+                except Exception:
+                    message.reject()
+                    LOGGER.exception('Failed to index record %s', payload.get('id'))
+
+    def _index_action(self, payload, record=None):
         """
         Bulk index action.
         Args:
             payload: Decoded message body.
+            record: The record to index, if already loaded.
 
         Returns:
             Dictionary defining an Elasticsearch bulk 'index' action.
 
         """
-        record = InspireRecord.get_record(payload['id'])
+        if record is None:
+            record = InspireRecord.get_record(payload['id'])
         index, doc_type = self.record_to_index(record)
 
         return {
@@ -84,3 +143,162 @@ class InspireRecordIndexer(RecordIndexer):
             '_version_type': self._version_type,
             '_source': self._prepare_record(record, index, doc_type),
         }
+
+
+def is_version_conflict(failure):
+    """Tell whether a bulk failure is an ES version conflict of an ``index`` action.
+
+    With the ``external_gte`` version type such a conflict means that ES
+    already holds a newer revision of the document, so there is nothing to
+    do. Other conflicts are real failures.
+    """
+    item = failure.get('index', {})
+    error = item.get('error')
+    return item.get('status') == 409 and isinstance(error, dict) and \
+        error.get('type') == 'version_conflict_engine_exception'
+
+
+def is_missing_document(failure):
+    """Tell whether a bulk failure is a ``delete`` of a missing document."""
+    return failure.get('delete', {}).get('status') == 404
+
+
+class RecordIndexQueue(object):
+    """Deduplicating buffer of records waiting to be sent to ES.
+
+    Records are keyed by UUID and only their latest revision is kept, so a
+    record changed several times before a flush is indexed once. The buffer
+    is sent to ES in ``bulk`` requests, when explicitly flushed or as soon as
+    it holds ``chunk_size`` records.
+
+    Errors reaching ES, like a connection error, are raised to the caller, as
+    they were by ``RecordIndexer.index``. The documents rejected by ES are
+    logged and counted as failures.
+
+    If ``queue_name`` is set, the index operations are delegated to the
+    :func:`~inspirehep.modules.records.tasks.batch_reindex` task on that
+    Celery queue, instead of being sent to ES by the current process.
+    """
+
+    def __init__(self, chunk_size=None, queue_name=None, request_timeout=None):
+        config = current_app.config
+
+        self.chunk_size = chunk_size or config['INDEXER_BULK_CHUNK_SIZE']
+        self.queue_name = queue_name or config['INDEXER_BULK_QUEUE']
+        self.request_timeout = request_timeout or config['INDEXER_BULK_REQUEST_TIMEOUT']
+
+        self.stats = Counter()
+        self._pending = OrderedDict()
+
+    def __len__(self):
+        return len(self._pending)
+
+    def add(self, record, delete=False):
+        """Schedule a record to be indexed, or deleted from the index.
+
+        Args:
+            record(Record): the record, whose ``revision_id`` decides which
+                operation wins when the same record is added several times.
+            delete(bool): whether the record should be removed from ES.
+        """
+        key = str(record.id)
+        pending = self._pending.get(key)
+        if pending and pending[1].revision_id > record.revision_id:
+            return
+
+        self._pending[key] = ('delete' if delete else 'index', record)
+        if len(self) >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        """Send all the pending operations to ES.
+
+        Returns:
+            Counter: the statistics of this flush.
+        """
+        pending, self._pending = self._pending, OrderedDict()
+        if not pending:
+            return Counter()
+
+        start = time.time()
+        if self.queue_name:
+            stats = self._delegate(pending)
+        else:
+            stats = self._send(pending.values())
+        stats['flushes'] = 1
+        stats['size'] = len(pending)
+        self.stats.update(stats)
+
+        LOGGER.info(
+            'Flushed %d records to ES in %.3fs: %d succeeded, %d delegated, '
+            '%d conflicts, %d failures.',
+            stats['size'], time.time() - start, stats['succeeded'],
+            stats['delegated'], stats['conflicts'], stats['failures'],
+        )
+        return stats
+
+    def _delegate(self, pending):
+        from inspirehep.modules.records.tasks import batch_reindex
+
+        stats = self._send(
+            (op, record) for op, record in pending.values() if op == 'delete'
+        )
+
+        uuids = [uuid for uuid, (op, _) in pending.items() if op == 'index']
+        if uuids:
+            batch_reindex.apply_async(
+                kwargs={
+                    'uuids': uuids,
+                    'request_timeout': self.request_timeout,
+                    'version_type': 'external_gte',
+                },
+                queue=self.queue_name,
+            )
+            stats['delegated'] += len(uuids)
+
+        return stats
+
+    def _send(self, pending):
+        stats = Counter()
+
+        def _actions():
+            for op, record in pending:
+                try:
+                    if op == 'delete':
+                        yield self._delete_op(record)
+                    else:
+                        yield create_index_op(record)
+                except Exception:
+                    LOGGER.exception('Cannot prepare record %s for ES', record.id)
+                    stats['failures'] += 1
+
+        success, failures = bulk(
+            es,
+            _actions(),
+            chunk_size=self.chunk_size,
+            request_timeout=self.request_timeout,
+            raise_on_error=False,
+        )
+
+        for failure in failures or []:
+            if is_version_conflict(failure):
+                stats['conflicts'] += 1
+            elif is_missing_document(failure):
+                stats['succeeded'] += 1
+            else:
+                LOGGER.error('Cannot send record to ES: %r', failure)
+                stats['failures'] += 1
+
+        stats['succeeded'] += success
+        return stats
+
+    @staticmethod
+    def _delete_op(record):
+        index, doc_type = current_record_to_index(record)
+
+        return {
+            '_op_type': 'delete',
+            '_index': index,
+            '_type': doc_type,
+            '_id': str(record.id),
+        }
@@ -0,0 +1,198 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of INSPIRE.
+# Copyright (C) 2018 CERN.
+#
+# INSPIRE is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# INSPIRE is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with INSPIRE. If not, see <http://www.gnu.org/licenses/>.
+#
+# In applying this license, CERN does not waive the privileges and immunities
+# granted to it by virtue of its status as an Intergovernmental Organization
+# or submit itself to any jurisdiction.
+
+
+"""Zero-downtime rebuilds of the records indices."""
+
+from __future__ import absolute_import, division, print_function
+
+import json
+from datetime import datetime
+
+from elasticsearch.helpers import bulk
+from flask import current_app
+
+from invenio_db import db
+from invenio_pidstore.models import PersistentIdentifier, PIDStatus
+from invenio_records.models import RecordMetadata
+from invenio_search import current_search, current_search_client as es
+
+from inspire_utils.logging import getStackTraceLogger
+from inspirehep.modules.pidstore.utils import get_endpoint_from_pid_type
+
+LOGGER = getStackTraceLogger(__name__)
+
+LOAD_SETTINGS = {
+    'refresh_interval': '-1',
+    'number_of_replicas': 0,
+}
+
+
+def get_index_from_pid_type(pid_type):
+    """Return the name of the live index of the records of a ``pid_type``."""
+    endpoint = get_endpoint_from_pid_type(pid_type)
+    return current_app.config['INSPIRE_ENDPOINT_TO_INDEX'][endpoint]
+
+
+def create_shadow_index(alias, suffix=None):
+    """Create a new index for ``alias``, set up for a fast bulk load.
+
+    The index is created from the current mapping, with refresh disabled and
+    no replicas.
+
+    Args:
+        alias(str): the name under which the index will be served.
+        suffix(str): the version appended to ``alias`` to name the new index,
+            by default the current timestamp.
+
+    Returns:
+        str: the name of the new index.
+    """
+    suffix = suffix or datetime.utcnow().strftime('%Y%m%d%H%M%S')
+    index = '{}-{}'.format(alias, suffix)
+
+    with open(current_search.mappings[alias]) as fd:
+        body = json.load(fd)
+    body.setdefault('settings', {}).setdefault('index', {}).update(LOAD_SETTINGS)
+
+    es.indices.create(index=index, body=body)
+    return index
+
+
+def get_serving_settings(alias):
+    """Return the refresh and replica settings of the index served as ``alias``."""
+    settings = {
+        'refresh_interval': '1s',
+        'number_of_replicas': 1,
+    }
+    if not es.indices.exists(alias):
+        return settings
+
+    for index_settings in es.indices.get_settings(index=alias).values():
+        current = index_settings['settings']['index']
+        settings['number_of_replicas'] = current.get(
+            'number_of_replicas', settings['number_of_replicas'])
+        settings['refresh_interval'] = current.get(
+            'refresh_interval', settings['refresh_interval'])
+
+    return settings
+
+
+def get_record_uuids(pid_type, since=None):
+    """Return a query on the UUIDs of the records of a ``pid_type``.
+
+    Args:
+        pid_type(str): the PID type of the records.
+        since(datetime): if set, only return the records changed after it,
+            including the deleted ones.
+    """
+    query = db.session.query(PersistentIdentifier.object_uuid).filter(
+        PersistentIdentifier.pid_type == pid_type,
+        PersistentIdentifier.object_type == 'rec',
+    )
+    if since:
+        query = query.join(
+            RecordMetadata,
+            RecordMetadata.id == PersistentIdentifier.object_uuid,
+        ).filter(RecordMetadata.updated >= since)
+    else:
+        query = query.filter(PersistentIdentifier.status == PIDStatus.REGISTERED)
+
+    return query.order_by(PersistentIdentifier.object_uuid)
+
+
+def delete_from_index(index, doc_type, uuids, request_timeout=None):
+    """Delete from ``index`` the records among ``uuids`` that are deleted in the DB."""
+    deleted = db.session.query(RecordMetadata.id).filter(
+        RecordMetadata.id.in_(uuids),
+        RecordMetadata.json.is_(None),
+    )
+
+    success, _ = bulk(
+        es,
+        (
+            {
+                '_op_type': 'delete',
+                '_index': index,
+                '_type': doc_type,
+                '_id': str(uuid),
+            } for uuid, in deleted
+        ),
+        request_timeout=request_timeout,
+        raise_on_error=False,
+        raise_on_exception=False,
+    )
+    return success
+
+
+def is_concrete_index(alias):
+    """Return whether ``alias`` is still a concrete index instead of an alias."""
+    return es.indices.exists(alias) and not es.indices.exists_alias(name=alias)
+
+
+def swap_index_alias(alias, index, settings, force=False):
+    """Serve ``index`` under ``alias`` and the other aliases of the old index.
+
+    The serving ``settings`` are restored on ``index`` before the swap, which
+    is done in a single atomic ``update_aliases`` call.
+
+    If ``alias`` is still a concrete index, as created by ``inspirehep db
+    init``, it is deleted in the same call, so that searches never hit a
+    missing index. As it can't be served again afterwards, this is only done
+    if ``force`` is set.
+
+    Raises:
+        ValueError: if ``alias`` is a concrete index and ``force`` is not set.
+
+    Returns:
+        List[str]: the indices which were served under ``alias`` before.
+    """
+    old_aliases = {}
+    if es.indices.exists(alias):
+        old_aliases = es.indices.get_alias(index=alias)
+
+    if alias in old_aliases and not force:
+        raise ValueError(
+            '{} is a concrete index, it can only be replaced by force.'.format(alias))
+
+    es.indices.put_settings(index=index, body={'index': settings})
+    es.indices.refresh(index=index)
+
+    actions = [{'add': {'index': index, 'alias': alias}}]
+    old_indices = []
+    for old_index, data in old_aliases.items():
+        other_aliases = [name for name in data.get('aliases', {}) if name != alias]
+        actions.extend(
+            {'add': {'index': index, 'alias': name}} for name in other_aliases
+        )
+        if old_index == alias:
+            LOGGER.warning('Deleting the concrete index %s to replace it with an alias.', alias)
+            actions.append({'remove_index': {'index': alias}})
+        else:
+            old_indices.append(old_index)
+            actions.append({'remove': {'index': old_index, 'alias': alias}})
+            actions.extend(
+                {'remove': {'index': old_index, 'alias': name}} for name in other_aliases
+            )
+
+    es.indices.update_aliases(body={'actions': actions})
+    return old_indices
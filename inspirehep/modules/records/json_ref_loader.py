@@ -24,7 +24,9 @@
 
 from __future__ import absolute_import, division, print_function
 
-from flask import current_app, url_for
+from collections import defaultdict
+
+from flask import _request_ctx_stack, current_app, url_for
 from jsonref import JsonLoader, JsonRef
 from werkzeug.urls import url_parse
 
@@ -33,7 +35,7 @@ from jsonresolver.contrib.jsonref import json_loader_factory
 
 from inspire_schemas.utils import load_schema
 from inspire_utils.urls import ensure_scheme
-from inspirehep.modules.pidstore.utils import get_pid_type_from_endpoint
+from inspirehep.modules.pidstore.utils import get_pid_from_ref
 from inspirehep.utils import record_getter
 
 
@@ -47,24 +49,18 @@ class AbstractRecordLoader(JsonLoader):
     def get_record(self, pid_type, recid):
         raise NotImplementedError()
 
-    def get_remote_json(self, uri, **kwargs):
-        parsed_uri = url_parse(uri)
-        # Add http:// protocol so uri.netloc is correctly parsed.
-        server_name = current_app.config.get('SERVER_NAME')
-        parsed_server = url_parse(ensure_scheme(server_name))
+    def get_records(self, pid_type, recids):
+        raise NotImplementedError()
 
-        if parsed_uri.netloc and parsed_uri.netloc != parsed_server.netloc:
+    def get_remote_json(self, uri, **kwargs):
+        if not is_local_uri(uri):
             return super(AbstractRecordLoader, self).get_remote_json(uri,
                                                                      **kwargs)
-        path_parts = parsed_uri.path.strip('/').split('/')
-        if len(path_parts) < 2:
-            current_app.logger.error('Bad JSONref URI: {0}'.format(uri))
+        pid = get_pid_from_local_uri(uri)
+        if not pid:
             return None
 
-        endpoint = path_parts[-2]
-        pid_type = get_pid_type_from_endpoint(endpoint)
-        recid = path_parts[-1]
-        res = self.get_record(pid_type, recid)
+        res = self.get_record(*pid)
         return res
 
 
@@ -77,6 +73,9 @@ class ESJsonLoader(AbstractRecordLoader):
         except record_getter.RecordGetterError:
             return None
 
+    def get_records(self, pid_type, recids):
+        return record_getter.get_es_records(pid_type, recids)
+
 
 class DatabaseJsonLoader(AbstractRecordLoader):
 
@@ -86,6 +85,10 @@ class DatabaseJsonLoader(AbstractRecordLoader):
         except record_getter.RecordGetterError:
             return None
 
+    def get_records(self, pid_type, recids):
+        return record_getter.get_db_records(
+            (pid_type, recid) for recid in recids)
+
 
 es_record_loader = ESJsonLoader()
 db_record_loader = DatabaseJsonLoader()
@@ -118,11 +121,150 @@ def load_resolved_schema(name):
     )
 
 
+def is_local_uri(uri):
+    """Return whether ``uri`` points to a resource of this server."""
+    parsed_uri = url_parse(uri)
+    # Add http:// protocol so uri.netloc is correctly parsed.
+    server_name = current_app.config.get('SERVER_NAME')
+    parsed_server = url_parse(ensure_scheme(server_name))
+
+    return not parsed_uri.netloc or parsed_uri.netloc == parsed_server.netloc
+
+
+def get_pid_from_local_uri(uri):
+    """Return the ``(pid_type, recid)`` of the record referenced by a local ``uri``.
+
+    Returns:
+        tuple: the PID of the record, or ``None`` if ``uri`` is malformed.
+    """
+    try:
+        return get_pid_from_ref(url_parse(uri).path)
+    except KeyError:
+        current_app.logger.error('Bad JSONref URI: {0}'.format(uri))
+        return None
+
+
+def _get_request_cache():
+    """Return the cache of resolved references of the current request.
+
+    Outside of a request there is no cache, as an application context can
+    live for much longer than a record is guaranteed not to change.
+    """
+    request_ctx = _request_ctx_stack.top
+    if request_ctx is None:
+        return None
+
+    if not hasattr(request_ctx, 'inspire_json_ref_cache'):
+        request_ctx.inspire_json_ref_cache = {}
+    return request_ctx.inspire_json_ref_cache
+
+
+def _find_refs(obj):
+    if isinstance(obj, dict):
+        if '$ref' in obj:
+            yield obj['$ref']
+            return
+        for value in obj.values():
+            for ref in _find_refs(value):
+                yield ref
+    elif isinstance(obj, list):
+        for item in obj:
+            for ref in _find_refs(item):
+                yield ref
+
+
+def _replace_resolved_refs(obj, resolved, loader):
+    if isinstance(obj, dict):
+        if '$ref' in obj:
+            uri = obj['$ref']
+            record = resolved.get(uri)
+            if record is None:
+                return None
+            # Like jsonref, the references inside the resolved record are
+            # resolved lazily, when they are accessed.
+            return JsonRef.replace_refs(
+                record, base_uri=uri, loader=loader, load_on_repr=False)
+        return type(obj)(
+            (key, _replace_resolved_refs(value, resolved, loader))
+            for key, value in obj.items()
+        )
+    elif isinstance(obj, list):
+        return [_replace_resolved_refs(item, resolved, loader) for item in obj]
+    return obj
+
+
+def resolve_refs(uris, source='db'):
+    """Resolve many reference URIs with one query per PID type.
+
+    The local references are grouped by PID type, and each group is fetched
+    with one PID query and one ES ``mget`` or DB ``IN`` query, or with a
+    single record lookup if it has only one member. Within a request, the
+    resolved references are cached.
+
+    :param uris: the reference URIs to resolve.
+    :param source: either 'db' or 'es', see :func:`replace_refs`.
+
+    :returns:
+        A ``dict`` mapping each URI to the referenced record, or to ``None``
+        if it could not be resolved.
+    """
+    loader = {
+        'db': db_record_loader,
+        'es': es_record_loader,
+    }[source]
+    cache = _get_request_cache()
+    if cache is None:
+        cache = {}
+
+    resolved = {}
+    pids_to_fetch = defaultdict(dict)
+    for uri in set(uris):
+        if (source, uri) in cache:
+            resolved[uri] = cache[(source, uri)]
+        elif not is_local_uri(uri):
+            try:
+                resolved[uri] = cache[(source, uri)] = loader(uri)
+            except Exception:
+                current_app.logger.exception("Can't load %s", uri)
+                resolved[uri] = None
+        else:
+            pid = get_pid_from_local_uri(uri)
+            if pid:
+                pid_type, recid = pid
+                pids_to_fetch[pid_type][str(recid)] = uri
+            else:
+                resolved[uri] = None
+
+    for pid_type, uris_by_recid in pids_to_fetch.items():
+        if len(uris_by_recid) == 1:
+            recid, uri = uris_by_recid.popitem()
+            resolved[uri] = cache[(source, uri)] = loader.get_record(
+                pid_type, recid)
+            continue
+
+        try:
+            records = loader.get_records(pid_type, list(uris_by_recid))
+        except Exception:
+            current_app.logger.exception(
+                "Can't load recids %s", list(uris_by_recid))
+            records = []
+
+        records_by_recid = {
+            str(record.get('control_number')): record for record in records if record
+        }
+        for recid, uri in uris_by_recid.items():
+            resolved[uri] = cache[(source, uri)] = records_by_recid.get(recid)
+
+    return resolved
+
+
 def replace_refs(obj, source='db'):
     """Replaces record refs in obj by bypassing HTTP requests.
 
     Any reference URI that comes from the same server and references a resource
-    will be resolved directly either from the database or from Elasticsearch.
+    will be resolved directly either from the database or from Elasticsearch,
+    in batches, see :func:`resolve_refs`. The references inside the resolved
+    records are replaced too, and are resolved when they are accessed.
 
     :param obj:
         Dict-like object for which '$ref' fields are recursively replaced.
@@ -145,4 +287,8 @@ def replace_refs(obj, source='db'):
         raise ValueError('source must be one of {}'.format(loaders.keys()))
 
     loader = loaders[source]
-    return JsonRef.replace_refs(obj, loader=loader, load_on_repr=False)
+    if not loader:
+        return JsonRef.replace_refs(obj, loader=loader, load_on_repr=False)
+
+    resolved = resolve_refs(_find_refs(obj), source)
+    return _replace_resolved_refs(obj, resolved, loader)
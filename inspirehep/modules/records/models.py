@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of INSPIRE.
+# Copyright (C) 2018 CERN.
+#
+# INSPIRE is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# INSPIRE is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with INSPIRE. If not, see <http://www.gnu.org/licenses/>.
+#
+# In applying this license, CERN does not waive the privileges and immunities
+# granted to it by virtue of its status as an Intergovernmental Organization
+# or submit itself to any jurisdiction.
+
+
+"""Records models."""
+
+from __future__ import absolute_import, division, print_function
+
+from sqlalchemy import and_, func, select, tuple_
+from sqlalchemy.orm import object_session
+from sqlalchemy_utils.types import UUIDType
+
+from invenio_db import db
+from invenio_records.models import RecordMetadata
+
+from .utils import get_cited_pids
+
+CHANGED_CITED_PIDS = 'inspire_changed_cited_pids'
+"""Key of the session ``info`` holding the PIDs whose citation count changed."""
+
+
+class RecordCitations(db.Model):
+    """Citations between records, as found in their references.
+
+    Cited records are identified by their PID rather than by their UUID, so
+    that a reference is counted even if it was stored before the cited record.
+    """
+
+    __tablename__ = 'records_citations'
+    __table_args__ = (
+        db.PrimaryKeyConstraint('citer_id', 'cited_pid_type', 'cited_pid_value'),
+        db.Index('ix_records_citations_cited', 'cited_pid_type', 'cited_pid_value'),
+    )
+
+    citer_id = db.Column(
+        UUIDType,
+        db.ForeignKey('records_metadata.id', ondelete='CASCADE'),
+        nullable=False,
+    )
+    cited_pid_type = db.Column(db.String(6), nullable=False)
+    cited_pid_value = db.Column(db.String(255), nullable=False)
+
+    @classmethod
+    def get_counts(cls, pids):
+        """Get the citation counts of several records in a single query.
+
+        Args:
+            pids(List[Tuple[str, str]]): the ``(pid_type, pid_value)`` of the
+                cited records.
+
+        Returns:
+            dict: the citation count of each cited PID, missing if zero.
+        """
+        if not pids:
+            return {}
+
+        query = db.session.query(
+            cls.cited_pid_type,
+            cls.cited_pid_value,
+            func.count(),
+        ).filter(
+            tuple_(cls.cited_pid_type, cls.cited_pid_value).in_(pids),
+        ).group_by(
+            cls.cited_pid_type,
+            cls.cited_pid_value,
+        )
+
+        return dict(
+            ((pid_type, pid_value), count)
+            for pid_type, pid_value, count in query
+        )
+
+
+@db.event.listens_for(RecordMetadata, 'after_insert')
+@db.event.listens_for(RecordMetadata, 'after_update')
+def update_records_citations(mapper, connection, target):
+    """Update the citations of a record on ``after_insert`` and ``after_update`` events.
+
+    Only the difference between the stored citations and the references of
+    the new revision is written to the DB. The PIDs of the records whose
+    citation count changed are collected in the session ``info``, so that
+    their count can be updated in ES once the session is committed.
+    """
+    table = RecordCitations.__table__
+    new_cited_pids = get_cited_pids(target.json or {})
+    old_cited_pids = set(
+        (row.cited_pid_type, row.cited_pid_value)
+        for row in connection.execute(
+            select([table.c.cited_pid_type, table.c.cited_pid_value])
+            .where(table.c.citer_id == target.id)
+        )
+    )
+
+    removed = old_cited_pids - new_cited_pids
+    if removed:
+        connection.execute(table.delete().where(and_(
+            table.c.citer_id == target.id,
+            tuple_(table.c.cited_pid_type, table.c.cited_pid_value).in_(removed),
+        )))
+
+    added = new_cited_pids - old_cited_pids
+    if added:
+        connection.execute(table.insert(), [
+            {
+                'citer_id': target.id,
+                'cited_pid_type': pid_type,
+                'cited_pid_value': pid_value,
+            } for pid_type, pid_value in added
+        ])
+
+    changed = added | removed
+    if changed:
+        session_info = object_session(target).info
+        session_info.setdefault(CHANGED_CITED_PIDS, set()).update(changed)
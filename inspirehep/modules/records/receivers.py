@@ -34,7 +34,7 @@ from celery import Task
 from flask import current_app
 from flask_sqlalchemy import models_committed
 
-from invenio_indexer.api import RecordIndexer
+from invenio_db import db
 from invenio_indexer.signals import before_record_index
 from invenio_records.api import Record
 from invenio_records.models import RecordMetadata
@@ -45,15 +45,30 @@ from invenio_records.signals import (
 )
 
 from inspire_dojson.utils import get_recid_from_ref
+from inspire_schemas.errors import SchemaNotFound
+from inspire_schemas.utils import load_schema
 from inspire_utils.date import earliest_date
 from inspire_utils.helpers import force_list
-from inspire_utils.name import generate_name_variations
 from inspire_utils.record import get_value
-from inspirehep.modules.authors.utils import phonetic_blocks
+from inspirehep.modules.authors.utils import get_name_cache
 from inspirehep.modules.orcid.utils import (
     get_push_access_tokens,
     get_orcids_for_push,
 )
+from inspirehep.modules.records.indexer import RecordIndexQueue
+from inspirehep.modules.records.models import CHANGED_CITED_PIDS
+from inspirehep.modules.records.tasks import schedule_citation_counts_update
+
+LIST_REF_FIELDS_TRANSLATIONS = {
+    'deleted_records': 'deleted_recids',
+}
+
+_REF_FIELDS_CACHE = {}
+
+
+def get_schema_name(record):
+    """Return the name of the schema of a record, e.g. ``hep``."""
+    return record.get('$schema', '').rsplit('/', 1)[-1].split('.')[0]
 
 
 def is_author(record):
@@ -87,7 +102,7 @@ def assign_phonetic_block(sender, record, *args, **kwargs):
     author_names = get_value(record, 'authors.full_name', default=[])
 
     try:
-        signature_blocks = phonetic_blocks(author_names)
+        signature_blocks = get_name_cache().get_phonetic_blocks(author_names)
     except Exception as err:
         current_app.logger.error(
             'Cannot extract phonetic blocks for record %d: %s',
@@ -155,15 +170,33 @@ def index_after_commit(sender, changes):
     This cannot happen in an ``after_record_commit`` receiver from Invenio-Records
     because, despite the name, at that point we are not yet sure whether the record
     has been really committed to the DB.
+
+    All the records of the commit go through a :class:`RecordIndexQueue`, so
+    that they are sent to ES in ``bulk`` requests and each record is indexed
+    only once per commit, with its latest revision.
     """
-    indexer = RecordIndexer()
+    queue = RecordIndexQueue()
 
     for model_instance, change in changes:
         if isinstance(model_instance, RecordMetadata):
-            if change in ('insert', 'update'):
-                indexer.index(Record(model_instance.json, model_instance))
-            else:
-                indexer.delete(Record(model_instance.json, model_instance))
+            queue.add(
+                Record(model_instance.json, model_instance),
+                delete=change not in ('insert', 'update'),
+            )
+
+    queue.flush()
+
+
+@models_committed.connect
+def update_citation_counts_after_commit(sender, changes):
+    """Schedule the update in ES of the citation counts changed by a commit.
+
+    The records whose citation count changed are collected by
+    :func:`~inspirehep.modules.records.models.update_records_citations`.
+    """
+    changed_cited_pids = db.session.info.pop(CHANGED_CITED_PIDS, None)
+    if changed_cited_pids:
+        schedule_citation_counts_update(changed_cited_pids)
 
 
 #
@@ -174,6 +207,9 @@ def index_after_commit(sender, changes):
 def enhance_after_index(sender, json, *args, **kwargs):
     """Run all the receivers that enhance the record for ES in the right order.
 
+    The schema of the record is looked up once, and only the receivers that
+    apply to it are run, see ``ENHANCERS``.
+
     .. note::
 
        ``populate_recid_from_ref`` **MUST** come before ``populate_bookautocomplete``
@@ -181,19 +217,48 @@ def enhance_after_index(sender, json, *args, **kwargs):
        would be expanded to an incorrect ``_source_recid`` by the former.
 
     """
-    populate_recid_from_ref(sender, json, *args, **kwargs)
-    populate_bookautocomplete(sender, json, *args, **kwargs)
-    populate_abstract_source_suggest(sender, json, *args, **kwargs)
-    populate_affiliation_suggest(sender, json, *args, **kwargs)
-    populate_author_count(sender, json, *args, **kwargs)
-    populate_authors_full_name_unicode_normalized(sender, json, *args, **kwargs)
-    populate_earliest_date(sender, json, *args, **kwargs)
-    populate_experiment_suggest(sender, json, *args, **kwargs)
-    populate_inspire_document_type(sender, json, *args, **kwargs)
-    populate_authors_name_variations(sender, json, *args, **kwargs)
-    populate_name_variations(sender, json, *args, **kwargs)
-    populate_title_suggest(sender, json, *args, **kwargs)
-    populate_citations_count(sender, json, *args, **kwargs)
+    schema_name = get_schema_name(json)
+
+    ref_fields = get_ref_fields(schema_name)
+    if ref_fields is None:
+        populate_recid_from_ref(sender, json, *args, **kwargs)
+    else:
+        populate_recid_from_ref_fields(json, ref_fields)
+
+    for enhancer in ENHANCERS.get(schema_name, []):
+        enhancer(sender, json, *args, **kwargs)
+
+
+def populate_authors_fields(sender, json, *args, **kwargs):
+    """Populate in a single pass the fields derived from the authors of Literature records.
+
+    These are the ``author_count``, excluding supervisors, and for each author
+    the ``full_name_unicode_normalized``, ``name_variations`` and
+    ``name_suggest`` fields.
+    """
+    if not is_hep(json):
+        return
+
+    name_cache = get_name_cache()
+    author_count = 0
+    for author in json.get('authors', []):
+        if 'supervisor' not in author.get('inspire_roles', []):
+            author_count += 1
+
+        full_name = author.get('full_name')
+        if not full_name:
+            continue
+
+        name_variations = name_cache.get_name_variations(full_name)
+        author.update({
+            'full_name_unicode_normalized': normalize('NFKC', six.text_type(full_name)).lower(),
+            'name_variations': name_variations,
+            'name_suggest': {
+                'input': [variation for variation in name_variations if variation],
+            },
+        })
+
+    json['author_count'] = author_count
 
 
 def populate_citations_count(sender, json, record, *args, **kwargs):
@@ -292,10 +357,6 @@ def populate_recid_from_ref(sender, json, *args, **kwargs):
         }
 
     """
-    list_ref_fields_translations = {
-        'deleted_records': 'deleted_recids'
-    }
-
     def _recursive_find_refs(json_root):
         if isinstance(json_root, list):
             items = enumerate(json_root)
@@ -308,14 +369,11 @@ def populate_recid_from_ref(sender, json, *args, **kwargs):
 
         for key, value in items:
             if (isinstance(json_root, dict) and isinstance(value, dict) and '$ref' in value):
-                # Append '_recid' and remove 'record' from the key name.
-                key_basename = key.replace('record', '').rstrip('_')
-                new_key = '{}_recid'.format(key_basename).lstrip('_')
-                json_root[new_key] = get_recid_from_ref(value)
+                json_root[_get_recid_key(key)] = get_recid_from_ref(value)
             elif (isinstance(json_root, dict) and isinstance(value, list) and
-                  key in list_ref_fields_translations):
+                  key in LIST_REF_FIELDS_TRANSLATIONS):
                 new_list = [get_recid_from_ref(v) for v in value]
-                new_key = list_ref_fields_translations[key]
+                new_key = LIST_REF_FIELDS_TRANSLATIONS[key]
                 json_root[new_key] = new_list
             else:
                 _recursive_find_refs(value)
@@ -323,6 +381,111 @@ def populate_recid_from_ref(sender, json, *args, **kwargs):
     _recursive_find_refs(json)
 
 
+def populate_recid_from_ref_fields(json, ref_fields):
+    """Add the recids of the JSON reference fields found in ``ref_fields``.
+
+    Does the same as ``populate_recid_from_ref``, but only visits the paths
+    of a precomputed tree of reference fields, see ``get_ref_fields``.
+    """
+    if isinstance(json, list):
+        for item in json:
+            populate_recid_from_ref_fields(item, ref_fields)
+        return
+
+    if not isinstance(json, dict):
+        return
+
+    for key, children in six.iteritems(ref_fields):
+        value = json.get(key)
+        if value is None:
+            continue
+
+        if isinstance(value, dict) and '$ref' in value:
+            json[_get_recid_key(key)] = get_recid_from_ref(value)
+        elif isinstance(value, list) and key in LIST_REF_FIELDS_TRANSLATIONS:
+            json[LIST_REF_FIELDS_TRANSLATIONS[key]] = [get_recid_from_ref(v) for v in value]
+        elif children:
+            populate_recid_from_ref_fields(value, children)
+
+
+def get_ref_fields(schema_name):
+    """Return the tree of the JSON reference fields of a schema.
+
+    The tree is a nested ``dict`` keyed by field name, whose leaves are empty
+    ``dict``s. It is computed from the resolved schema, including the
+    alternatives of ``allOf``, ``anyOf`` and ``oneOf``, the first time it is
+    requested, then kept for the lifetime of the process.
+
+    Returns:
+        dict: the tree of JSON reference fields, or ``None`` if the schema
+        is unknown.
+    """
+    if schema_name not in _REF_FIELDS_CACHE:
+        try:
+            schema = load_schema(schema_name, resolved=True)
+        except SchemaNotFound:
+            schema = None
+
+        _REF_FIELDS_CACHE[schema_name] = _find_ref_fields(schema) if schema else None
+
+    return _REF_FIELDS_CACHE[schema_name]
+
+
+def _find_ref_fields(schema):
+    ref_fields = {}
+    for alternative in _get_alternatives(schema):
+        if alternative.get('type') == 'array':
+            items = alternative.get('items', {})
+            if isinstance(items, dict):
+                _merge_ref_fields(ref_fields, _find_ref_fields(items))
+            continue
+
+        for key, subschema in six.iteritems(alternative.get('properties', {})):
+            if _is_ref_schema(subschema):
+                ref_fields.setdefault(key, {})
+
+            children = _find_ref_fields(subschema)
+            if children:
+                _merge_ref_fields(ref_fields.setdefault(key, {}), children)
+
+    return ref_fields
+
+
+def _get_alternatives(schema):
+    """Yield a schema and the subschemas of its ``allOf``, ``anyOf`` and ``oneOf``."""
+    yield schema
+    for combinator in ('allOf', 'anyOf', 'oneOf'):
+        for subschema in schema.get(combinator, []):
+            for alternative in _get_alternatives(subschema):
+                yield alternative
+
+
+def _is_ref_schema(schema):
+    """Tell whether a schema allows a JSON reference, or a list of them."""
+    for alternative in _get_alternatives(schema):
+        if '$ref' in alternative.get('properties', {}):
+            return True
+
+        items = alternative.get('items')
+        if isinstance(items, dict) and any(
+            '$ref' in item.get('properties', {}) for item in _get_alternatives(items)
+        ):
+            return True
+
+    return False
+
+
+def _merge_ref_fields(ref_fields, other):
+    for key, children in six.iteritems(other):
+        _merge_ref_fields(ref_fields.setdefault(key, {}), children)
+
+
+def _get_recid_key(key):
+    """Append '_recid' and remove 'record' from the key name."""
+    key_basename = key.replace('record', '').rstrip('_')
+    return '{}_recid'.format(key_basename).lstrip('_')
+
+
 def populate_abstract_source_suggest(sender, json, *args, **kwargs):
     """Populate the ``abstract_source_suggest`` field in Literature records."""
     if not is_hep(json):
@@ -440,24 +603,6 @@ def populate_experiment_suggest(sender, json, *args, **kwargs):
     })
 
 
-def populate_name_variations(sender, json, *args, **kwargs):
-    """Generate name variations for each signature of a Literature record."""
-    if not is_hep(json):
-        return
-
-    authors = json.get('authors', [])
-
-    for author in authors:
-        full_name = author.get('full_name')
-        if full_name:
-            name_variations = generate_name_variations(full_name)
-
-            author.update({'name_variations': name_variations})
-            author.update({'name_suggest': {
-                'input': [variation for variation in name_variations if variation],
-            }})
-
-
 def populate_authors_name_variations(sender, json, *args, **kwargs):
     """Generate name variations for an Author record."""
     if not is_author(json):
@@ -466,33 +611,33 @@ def populate_authors_name_variations(sender, json, *args, **kwargs):
     author_name = get_value(json, 'name.value')
 
     if author_name:
-        name_variations = generate_name_variations(author_name)
+        name_variations = get_name_cache().get_name_variations(author_name)
         json.update({'name_variations': name_variations})
 
 
-def populate_author_count(sender, json, *args, **kwargs):
-    """Populate the ``author_count`` field of Literature records."""
-    if not is_hep(json):
-        return
-
-    authors = json.get('authors', [])
-
-    authors_excluding_supervisors = [
-        author for author in authors
-        if 'supervisor' not in author.get('inspire_roles', [])
-    ]
-    json['author_count'] = len(authors_excluding_supervisors)
-
-
-def populate_authors_full_name_unicode_normalized(sender, json, *args, **kwargs):
-    """Populate the ``authors.full_name_normalized`` field of Literature records."""
-    if not is_hep(json):
-        return
-
-    authors = json.get('authors', [])
-
-    for index, author in enumerate(authors):
-        full_name = six.text_type(author['full_name'])
-        json['authors'][index].update({
-            'full_name_unicode_normalized': normalize('NFKC', full_name).lower()
-        })
+ENHANCERS = {
+    'authors': [
+        populate_authors_name_variations,
+    ],
+    'experiments': [
+        populate_experiment_suggest,
+    ],
+    'hep': [
+        populate_bookautocomplete,
+        populate_abstract_source_suggest,
+        populate_authors_fields,
+        populate_earliest_date,
+        populate_inspire_document_type,
+        populate_citations_count,
+    ],
+    'data': [
+        populate_citations_count,
+    ],
+    'institutions': [
+        populate_affiliation_suggest,
+    ],
+    'journals': [
+        populate_title_suggest,
+    ],
+}
+"""The receivers run by ``enhance_after_index`` for each schema, in order."""
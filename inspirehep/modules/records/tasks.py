@@ -26,24 +26,35 @@ from __future__ import absolute_import, division, print_function
 
 from celery import shared_task
 from celery.utils.log import get_task_logger
-from elasticsearch.helpers import bulk, scan
+from elasticsearch.helpers import bulk
 from flask import current_app
+from redis import StrictRedis
 from six import iteritems
-from sqlalchemy.orm.exc import NoResultFound
+from sqlalchemy import tuple_
 
 from invenio_db import db
 from invenio_pidstore.models import PersistentIdentifier
+from invenio_records.models import RecordMetadata
 from invenio_search import current_search_client as es
 
 from inspire_dojson.utils import get_recid_from_ref
 from inspirehep.modules.records.api import InspireRecord
-from inspirehep.modules.records.utils import get_endpoint_from_record
+from inspirehep.modules.records.indexer import is_version_conflict
+from inspirehep.modules.records.models import RecordCitations
+from inspirehep.modules.records.utils import (
+    get_cited_pids,
+    get_endpoint_from_record,
+)
 from inspirehep.modules.pidstore.utils import get_pid_type_from_schema
+from inspirehep.modules.search.scan import sliced_scan
 from inspirehep.utils.record import create_index_op
 
 
 logger = get_task_logger(__name__)
 
+CITATION_COUNTS_TO_UPDATE_KEY = 'citation_counts_to_update'
+CITATION_COUNTS_UPDATE_SCHEDULED_KEY = 'citation_counts_update_scheduled'
+
 
 @shared_task(ignore_result=True)
 def update_refs(old_ref, new_ref):
@@ -116,9 +127,15 @@ def get_records_to_update(old_ref):
             }
 
             index = current_app.config['INSPIRE_ENDPOINT_TO_INDEX'][endpoint]
-            query = scan(es, query=body, index=index)
+            query = sliced_scan(
+                es,
+                query=body,
+                slices=current_app.config['SEARCH_SCAN_SLICES'],
+                source=False,
+                index=index,
+            )
 
-            result.extend(el['_id'] for el in list(query))
+            result.extend(el['_id'] for el in query)
 
         return result
 
@@ -170,7 +187,13 @@ def get_merged_records():
         }
 
         index = 'records-*'
-        query = scan(es, query=body, index=index)
+        query = sliced_scan(
+            es,
+            query=body,
+            slices=current_app.config['SEARCH_SCAN_SLICES'],
+            source=False,
+            index=index,
+        )
 
         for result in query:
             yield result['_id']
@@ -182,15 +205,23 @@ def get_merged_records():
 
 
 @shared_task(ignore_result=False, max_retries=0)
-def batch_reindex(uuids, request_timeout):
-    """Task for bulk reindexing records."""
+def batch_reindex(uuids, request_timeout, version_type='force', index=None):
+    """Task for bulk reindexing records.
+
+    Version conflicts are not reported as failures when ``version_type`` is
+    ``external_gte``, as they mean that ES already has a newer revision.
+    If ``index`` is set, the records are written to it instead of the index
+    corresponding to their schema.
+    """
     def actions():
-        for uuid in uuids:
-            try:
-                record = InspireRecord.get_record(uuid)
-                yield create_index_op(record, version_type='force')
-            except NoResultFound as e:
-                logger.warn('Record %s failed to load: %s', uuid, e)
+        records = InspireRecord.get_records_bulk(uuids)
+
+        missing = set(uuids) - set(str(record.id) for record in records)
+        for uuid in missing:
+            logger.warn('Record %s failed to load: not found', uuid)
+
+        for record in records:
+            yield create_index_op(record, version_type=version_type, index=index)
 
     success, failures = bulk(
         es,
@@ -200,7 +231,136 @@ def batch_reindex(uuids, request_timeout):
         raise_on_exception=False,
     )
 
+    if version_type == 'external_gte':
+        failures = [
+            failure for failure in failures or []
+            if not is_version_conflict(failure)
+        ]
+
     return {
         'success': success,
         'failures': [failure for failure in failures or []],
     }
+
+
+def populate_records_citations(batch_size=1000):
+    """Rebuild the ``records_citations`` table from the references of all records.
+
+    Returns:
+        int: the number of citations inserted.
+    """
+    table = RecordCitations.__table__
+    query = db.session.query(
+        RecordMetadata.id,
+        RecordMetadata.json['references'],
+    ).yield_per(batch_size)
+
+    db.session.execute(table.delete())
+
+    count = 0
+    rows = []
+    for record_id, references in query:
+        cited_pids = get_cited_pids({'references': references or []})
+        rows.extend({
+            'citer_id': record_id,
+            'cited_pid_type': pid_type,
+            'cited_pid_value': pid_value,
+        } for pid_type, pid_value in cited_pids)
+
+        if len(rows) >= batch_size:
+            db.session.execute(table.insert(), rows)
+            count += len(rows)
+            rows = []
+
+    if rows:
+        db.session.execute(table.insert(), rows)
+        count += len(rows)
+
+    db.session.commit()
+    return count
+
+
+def schedule_citation_counts_update(pids):
+    """Schedule the update in ES of the citation counts of some records.
+
+    The PIDs are collected in Redis and the update task is scheduled only
+    once per ``INSPIRE_CITATION_COUNTS_UPDATE_WINDOW``, so that the changes
+    made in that window are sent to ES in a single batch.
+
+    Args:
+        pids(Iterable[Tuple[str, str]]): the ``(pid_type, pid_value)`` of
+            the records whose citation count changed.
+    """
+    pids = ['{}:{}'.format(pid_type, pid_value) for pid_type, pid_value in pids]
+    if not pids:
+        return
+
+    window = current_app.config['INSPIRE_CITATION_COUNTS_UPDATE_WINDOW']
+    redis = StrictRedis.from_url(current_app.config['CACHE_REDIS_URL'])
+    redis.sadd(CITATION_COUNTS_TO_UPDATE_KEY, *pids)
+
+    # The key expires on its own in case the task is lost, so that a later
+    # change schedules a new one.
+    if redis.set(CITATION_COUNTS_UPDATE_SCHEDULED_KEY, 1, nx=True, ex=10 * window + 60):
+        update_citation_counts.apply_async(countdown=window)
+
+
+@shared_task(ignore_result=True)
+def update_citation_counts(request_timeout=None):
+    """Update in ES the citation counts collected by ``schedule_citation_counts_update``.
+
+    Version conflicts are not reported as failures, as they mean that ES
+    already has a newer revision of the record, with its current count.
+    """
+    redis = StrictRedis.from_url(current_app.config['CACHE_REDIS_URL'])
+    # Changes arriving from now on schedule a new task.
+    redis.delete(CITATION_COUNTS_UPDATE_SCHEDULED_KEY)
+
+    pipeline = redis.pipeline()
+    pipeline.smembers(CITATION_COUNTS_TO_UPDATE_KEY)
+    pipeline.delete(CITATION_COUNTS_TO_UPDATE_KEY)
+    members, _ = pipeline.execute()
+
+    pids = [tuple(member.decode('utf8').split(':', 1)) for member in members]
+    if not pids:
+        return
+
+    success, failures = bulk(
+        es,
+        get_citation_count_update_ops(pids),
+        request_timeout=request_timeout or current_app.config['INDEXER_BULK_REQUEST_TIMEOUT'],
+        raise_on_error=False,
+        raise_on_exception=False,
+    )
+    failures = [
+        failure for failure in failures or []
+        if not is_version_conflict(failure)
+    ]
+    logger.info(
+        'Updated %d citation counts, %d failures.', success, len(failures))
+
+
+def get_citation_count_update_ops(pids):
+    """Build the ES actions updating the citation counts of some records.
+
+    The whole documents are indexed again at the revision of their records,
+    like any other change, as partial updates would increase the versions
+    of the documents in ES past the ``revision_id`` of the records and make
+    ES reject their next changes. The records and their citation counts are
+    fetched in a constant number of queries.
+
+    Args:
+        pids(List[Tuple[str, str]]): the ``(pid_type, pid_value)`` of the records.
+
+    Yields:
+        dict: an ES bulk ``index`` action for each record found in the DB.
+    """
+    uuids = db.session.query(
+        PersistentIdentifier.object_uuid,
+    ).filter(
+        PersistentIdentifier.object_type == 'rec',
+        tuple_(PersistentIdentifier.pid_type, PersistentIdentifier.pid_value).in_(pids),
+    )
+
+    for record in InspireRecord.get_records_bulk([str(uuid) for uuid, in uuids]):
+        yield create_index_op(record)
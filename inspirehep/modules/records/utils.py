@@ -26,12 +26,16 @@ from __future__ import absolute_import, division, print_function
 
 from inspire_utils.record import get_value
 from inspire_utils.helpers import force_list
+from inspire_utils.logging import getStackTraceLogger
 from inspirehep.modules.pidstore.utils import (
     get_endpoint_from_pid_type,
+    get_pid_from_ref,
     get_pid_type_from_schema
 )
 from inspirehep.utils.record_getter import get_db_records
 
+LOGGER = getStackTraceLogger(__name__)
+
 
 def get_endpoint_from_record(record):
     """Return the endpoint corresponding to a record."""
@@ -43,11 +47,30 @@ def get_endpoint_from_record(record):
 
 def get_pid_from_record_uri(record_uri):
     """Transform a URI to a record into a (pid_type, pid_value) pair."""
-    parts = [part for part in record_uri.split('/') if part]
-    pid_type = parts[-2][:3]
-    pid_value = parts[-1]
+    return get_pid_from_ref(record_uri)
+
+
+def get_cited_pids(record):
+    """Return the PIDs of the records cited in the references of a record.
+
+    References to an unknown endpoint are logged and skipped.
+
+    Example:
+        >>> record = {'references': [
+        ...     {'record': {'$ref': 'https://labs.inspirehep.net/api/literature/1234'}},
+        ...     {'record': {'$ref': 'https://labs.inspirehep.net/api/data/421'}},
+        ... ]}
+        >>> sorted(get_cited_pids(record))
+        [('dat', '421'), ('lit', '1234')]
+    """
+    pids = set()
+    for ref in get_value(record, 'references.record.$ref', []):
+        try:
+            pids.add(get_pid_from_record_uri(ref))
+        except KeyError:
+            LOGGER.warning('Skipping the reference to an unknown endpoint: %s', ref)
 
-    return pid_type, pid_value
+    return pids
 
 
 def get_linked_records_in_field(record, field_path):
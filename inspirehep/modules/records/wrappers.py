@@ -81,25 +81,29 @@ class LiteratureRecord(ESRecord, AdminToolsMixin):
         Returns a list with information about conferences related to the
         record.
         """
+        publication_info = self['publication_info']
+        # Resolve the records linked by all the publication notes at once.
+        linked_records = replace_refs([
+            {
+                'conference_record': pub_info.get('conference_record'),
+                'parent_record': pub_info.get('parent_record'),
+            } for pub_info in publication_info
+        ], 'es')
+
         conf_info = []
-        for pub_info in self['publication_info']:
+        for pub_info, linked in zip(publication_info, linked_records):
             conference_recid = None
             parent_recid = None
-            parent_rec = {}
-            conference_rec = {}
-            if 'conference_record' in pub_info:
-                conference_rec = replace_refs(pub_info['conference_record'],
-                                              'es')
-                if conference_rec and conference_rec.get('control_number'):
-                    conference_recid = conference_rec['control_number']
-                else:
-                    conference_rec = {}
-            if 'parent_record' in pub_info:
-                parent_rec = replace_refs(pub_info['parent_record'], 'es')
-                if parent_rec and parent_rec.get('control_number'):
-                    parent_recid = parent_rec['control_number']
-                else:
-                    parent_rec = {}
+            conference_rec = linked['conference_record']
+            if conference_rec and conference_rec.get('control_number'):
+                conference_recid = conference_rec['control_number']
+            else:
+                conference_rec = {}
+            parent_rec = linked['parent_record']
+            if parent_rec and parent_rec.get('control_number'):
+                parent_recid = parent_rec['control_number']
+            else:
+                parent_rec = {}
             conf_info.append(
                 {
                     "conference_recid": conference_recid,
@@ -29,7 +29,7 @@ from flask import current_app
 
 from invenio_db import db
 
-from inspirehep.modules.refextract.utils import KbWriter
+from inspirehep.modules.refextract.utils import KbWriter, journal_kb_cache
 
 
 @shared_task()
@@ -46,6 +46,9 @@ def create_journal_kb_file():
     Note that refextract expects ``SOURCE`` to be normalized, which means removing
     all non alphanumeric characters, collapsing all contiguous whitespace to one
     space and uppercasing the resulting string.
+
+    The workers pick up the new version of the KB within
+    ``REFEXTRACT_KB_CHECK_INTERVAL`` seconds, this one right away.
     """
     refextract_journal_kb_path = current_app.config['REFEXTRACT_JOURNAL_KB_PATH']
 
@@ -85,3 +88,5 @@ def create_journal_kb_file():
                 value=row['title_variant'],
                 kb_key=row['short_title'],
             )
+
+    journal_kb_cache.invalidate()
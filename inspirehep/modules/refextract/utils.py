@@ -22,16 +22,30 @@
 """Refextract utils."""
 from __future__ import absolute_import, division, print_function
 
+import errno
+import glob
+import hashlib
+import os
 import re
+import threading
+import time
 
 import codecs
-from tempfile import TemporaryFile
-from fs.opener import fsopen
+from tempfile import NamedTemporaryFile, TemporaryFile, gettempdir
+from flask import current_app
+from fs.opener import fsopen, opener
+
+from inspire_utils.logging import getStackTraceLogger
+
 from inspirehep.utils.url import copy_file
 
 
+LOGGER = getStackTraceLogger(__name__)
+
 RE_ALPHANUMERIC = re.compile('\W+', re.UNICODE)
 
+KB_CACHE_MAX_AGE = 24 * 60 * 60
+
 
 class KbWriter(object):
     def __init__(self, kb_path):
@@ -89,3 +103,117 @@ class KbWriter(object):
             return
 
         return result
+
+
+class KbCache(object):
+    """Local copies of refextract's journal KB, one per published version.
+
+    ``REFEXTRACT_JOURNAL_KB_PATH`` can point to a shared or remote space, so it
+    is copied to a stable local path named after its version, given by the
+    etag or the modification time and the size of the file. As refextract
+    keeps the KBs it parsed in memory keyed by their paths, the KB is then
+    parsed once per version in each worker, instead of once per call. Local
+    copies of the previous versions are removed once they are older than a
+    day.
+
+    The version is checked at most every ``REFEXTRACT_KB_CHECK_INTERVAL``
+    seconds, or on the next call after :meth:`invalidate`.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._uri = None
+        self._path = None
+        self._checked = 0
+
+    def get_path(self):
+        """Return the local path of the current version of the journal KB."""
+        uri = current_app.config['REFEXTRACT_JOURNAL_KB_PATH']
+        check_interval = current_app.config['REFEXTRACT_KB_CHECK_INTERVAL']
+
+        with self._lock:
+            now = time.time()
+            is_fresh = (
+                uri == self._uri and
+                now - self._checked < check_interval and
+                os.path.exists(self._path)
+            )
+            if is_fresh:
+                return self._path
+
+            path = self._materialize(uri)
+            if self._path and path != self._path:
+                self._prune(path)
+
+            self._uri, self._path, self._checked = uri, path, now
+            return path
+
+    def invalidate(self):
+        """Check the version of the journal KB again on the next call."""
+        with self._lock:
+            self._checked = 0
+
+    @staticmethod
+    def _get_cache_dir():
+        cache_dir = current_app.config['REFEXTRACT_KB_CACHE_DIR'] or \
+            os.path.join(gettempdir(), 'inspire-refextract-kbs')
+        try:
+            os.makedirs(cache_dir)
+        except OSError as e:
+            if e.errno != errno.EEXIST:
+                raise
+
+        return cache_dir
+
+    @staticmethod
+    def _get_version(uri):
+        try:
+            kb_fs, kb_path = opener.parse(uri)
+            try:
+                info = kb_fs.getinfo(kb_path)
+            finally:
+                kb_fs.close()
+        except Exception:
+            LOGGER.warning('Cannot get the version of the journal KB %s', uri)
+            return
+
+        version = (info.get('etag') or info.get('modified_time'), info.get('size'))
+        if any(version):
+            return repr(version)
+
+    def _materialize(self, uri):
+        cache_dir = self._get_cache_dir()
+        version = self._get_version(uri)
+        if version is not None:
+            key = hashlib.sha1(repr((uri, version))).hexdigest()
+            path = os.path.join(cache_dir, 'journals-{}.kb'.format(key))
+            if os.path.exists(path):
+                return path
+
+        with NamedTemporaryFile(dir=cache_dir, prefix='tmp', delete=False) as local_file:
+            with fsopen(uri, mode='rb') as kb_file:
+                copy_file(kb_file, local_file)
+
+        if version is None:
+            with open(local_file.name, 'rb') as kb_file:
+                digest = hashlib.sha1(kb_file.read()).hexdigest()
+            key = hashlib.sha1(repr((uri, digest))).hexdigest()
+            path = os.path.join(cache_dir, 'journals-{}.kb'.format(key))
+
+        os.rename(local_file.name, path)
+        return path
+
+    @staticmethod
+    def _prune(current_path):
+        """Remove the other versions, unless they were copied recently."""
+        pattern = os.path.join(os.path.dirname(current_path), 'journals-*.kb')
+        for path in glob.glob(pattern):
+            try:
+                if path != current_path and \
+                        time.time() - os.path.getmtime(path) > KB_CACHE_MAX_AGE:
+                    os.remove(path)
+            except OSError:
+                pass
+
+
+journal_kb_cache = KbCache()
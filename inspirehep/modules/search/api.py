@@ -79,7 +79,7 @@ class SearchMixin(object):
 
         :param uuids: uuids of documents to be retrieved.
         :type uuids: list of strings representing uuids
-        :returns: list of JSON documents
+        :returns: list of JSON documents, skipping those that were not found
         """
         results = []
 
@@ -90,7 +90,10 @@ class SearchMixin(object):
                 body={'ids': uuids},
                 **kwargs
             )
-            results = [document['_source'] for document in documents['docs']]
+            results = [
+                document['_source'] for document in documents['docs']
+                if document.get('found')
+            ]
         except RequestError:
             pass
 
@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of INSPIRE.
+# Copyright (C) 2018 CERN.
+#
+# INSPIRE is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# INSPIRE is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with INSPIRE. If not, see <http://www.gnu.org/licenses/>.
+#
+# In applying this license, CERN does not waive the privileges and immunities
+# granted to it by virtue of its status as an Intergovernmental Organization
+# or submit itself to any jurisdiction.
+
+
+"""Parallel scrolling through search results."""
+
+from __future__ import absolute_import, division, print_function
+
+import sys
+import threading
+
+import six
+from elasticsearch.helpers import scan
+from flask import current_app
+from six.moves.queue import Full, Queue
+
+_SLICE_DONE = object()
+
+
+class _SliceError(object):
+    """Exception raised while scrolling a slice, to be re-raised by the consumer."""
+
+    def __init__(self, exc_info):
+        self.exc_info = exc_info
+
+
+def sliced_scan(client, query=None, slices=1, queue_size=None, source=None, **kwargs):
+    """Scroll through the results of a query with several slices in parallel.
+
+    Each slice is scrolled with :func:`elasticsearch.helpers.scan` in its own
+    thread. The hits are yielded in no particular order through a queue of
+    at most ``queue_size`` hits, so that the memory used stays bounded when
+    they are consumed more slowly than they are fetched.
+
+    Args:
+        client(elasticsearch.Elasticsearch): the ES client.
+        query(dict): the body of the search.
+        slices(int): the number of slices. With one slice, this is a plain
+            ``scan``.
+        queue_size(Optional[int]): the maximum number of hits waiting to be
+            consumed. If not set, ``SEARCH_SCAN_QUEUE_SIZE`` is used.
+        source(Optional[Union[bool, List[str]]]): if set, the fields of the
+            ``_source`` to return, or ``False`` to return none.
+        kwargs: passed to ``scan``, e.g. ``index``, ``doc_type`` or ``scroll``.
+
+    Yields:
+        dict: the hits of the query.
+    """
+    if queue_size is None:
+        queue_size = current_app.config.get('SEARCH_SCAN_QUEUE_SIZE', 10000)
+
+    body = dict(query or {})
+    if source is not None:
+        body['_source'] = source
+
+    if slices <= 1:
+        for hit in scan(client, query=body, **kwargs):
+            yield hit
+        return
+
+    hits = Queue(maxsize=queue_size)
+    stopped = threading.Event()
+    threads = [
+        threading.Thread(
+            target=_scan_slice,
+            args=(client, dict(body, slice={'id': slice_id, 'max': slices}), kwargs, hits, stopped),
+        ) for slice_id in range(slices)
+    ]
+    for thread in threads:
+        thread.daemon = True
+        thread.start()
+
+    try:
+        running = slices
+        while running:
+            hit = hits.get()
+            if hit is _SLICE_DONE:
+                running -= 1
+            elif isinstance(hit, _SliceError):
+                six.reraise(*hit.exc_info)
+            else:
+                yield hit
+    finally:
+        stopped.set()
+        for thread in threads:
+            thread.join()
+
+
+def _scan_slice(client, body, kwargs, hits, stopped):
+    try:
+        for hit in scan(client, query=body, **kwargs):
+            if not _put(hits, hit, stopped):
+                return
+    except Exception:
+        _put(hits, _SliceError(sys.exc_info()), stopped)
+    else:
+        _put(hits, _SLICE_DONE, stopped)
+
+
+def _put(hits, hit, stopped):
+    """Put a hit in the queue, unless the consumer stopped in the meantime."""
+    while not stopped.is_set():
+        try:
+            hits.put(hit, timeout=0.1)
+            return True
+        except Full:
+            pass
+    return False
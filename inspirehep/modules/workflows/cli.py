@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of INSPIRE.
+# Copyright (C) 2018 CERN.
+#
+# INSPIRE is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# INSPIRE is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with INSPIRE. If not, see <http://www.gnu.org/licenses/>.
+#
+# In applying this license, CERN does not waive the privileges and immunities
+# granted to it by virtue of its status as an Intergovernmental Organization
+# or submit itself to any jurisdiction.
+
+
+from __future__ import absolute_import, division, print_function
+
+import click
+
+from flask.cli import with_appcontext
+
+from .models import WorkflowsStepTiming
+from .utils.services import get_services_metrics
+
+
+@click.group()
+def workflows():
+    """Commands related to workflows."""
+
+
+@workflows.command()
+@click.option('--last', '-n', type=int, default=100,
+              help='Number of most recent workflows to consider.')
+@click.option('--workflow', '-w', default=None,
+              help='Only show the steps of this workflow, e.g. "article".')
+@with_appcontext
+def timings(last, workflow):
+    """Show the median and 95th percentile of the time taken by each step."""
+    click.echo(
+        '{:<12} {:<40} {:>6} {:>9} {:>9} {:>9} {:>9} {:>9} {:>6} {:>6} {:>6}'.format(
+            'workflow', 'step', 'runs', 'wall p50', 'wall p95', 'cpu p50', 'cpu p95',
+            'rss (kB)', 'http', 'es', 'db',
+        )
+    )
+    for row in WorkflowsStepTiming.get_percentiles(last=last, workflow=workflow):
+        name, step, runs = row[:3]
+        click.echo(
+            u'{:<12} {:<40} {:>6} {:>9.3f} {:>9.3f} {:>9.3f} {:>9.3f} {:>9.0f} {:>6.1f} {:>6.1f} {:>6.1f}'.format(
+                name, step[:40], runs, *row[3:]
+            )
+        )
+
+
+@workflows.command()
+@with_appcontext
+def services():
+    """Show the metrics of the requests made to each service endpoint."""
+    click.echo('{:<50} {:>9} {:>7} {:>8} {:>8} {:>9} {:>12}'.format(
+        'endpoint', 'requests', 'errors', 'retries', 'rejected', 'coalesced', 'latency (s)'))
+    for endpoint, metrics in sorted(get_services_metrics().items()):
+        mean_latency = metrics['latency'] / metrics['requests'] if metrics['requests'] else 0
+        click.echo('{:<50} {:>9.0f} {:>7.0f} {:>8.0f} {:>8.0f} {:>9.0f} {:>12.3f}'.format(
+            endpoint[:50],
+            metrics['requests'],
+            metrics['errors'],
+            metrics['retries'],
+            metrics['rejected'],
+            metrics['coalesced'],
+            mean_latency,
+        ))
@@ -222,8 +222,54 @@ WORKFLOWS_REFERENCE_MATCHER_DATA_CONFIG = {
 """Configuration for matching data records. Please note that the
 index and doc_type are different for data records."""
 
+WORKFLOWS_REFERENCE_MATCHER_MSEARCH_SIZE = 100
+"""Number of reference matcher queries sent in a single ``_msearch`` request."""
+
+WORKFLOWS_REFERENCE_MATCHER_CACHE_SIZE = 100000
+"""Number of normalized reference keys whose matched record is cached in each process."""
+
+WORKFLOWS_REFERENCE_MATCHER_CACHE_TTL = 60 * 60
+"""Time in seconds a matched record is cached for a normalized reference key."""
+
 WORKFLOWS_REFEXTRACT_TIMEOUT = 10 * 60
 """Time in seconds a refextract task is allowed to run before it is killed."""
 
 WORKFLOWS_PLOTEXTRACT_TIMEOUT = 5 * 60
 """Time in seconds a plotextract task is allowed to run before it is killed."""
+
+WORKFLOWS_CONCURRENT_STEPS_MAX_WORKERS = 4
+"""Number of threads running the independent steps of a workflow stage."""
+
+WORKFLOWS_TRACE_STEPS = False
+"""Store the time and resources used by each run of a workflow step.
+
+About 100 rows are stored for each article and they are never pruned, so
+only turn it on to profile the workflows.
+"""
+
+WORKFLOWS_SERVICES_TIMEOUT = (3.05, 30)
+"""Connect and read timeouts in seconds of the requests to the services, like Beard and Magpie."""
+
+WORKFLOWS_SERVICES_RETRIES = 4
+"""Number of times a request to a service is retried on connection errors and server errors."""
+
+WORKFLOWS_SERVICES_BACKOFF = 0.5
+"""Base of the exponential backoff in seconds between retries, to which a random jitter is applied."""
+
+WORKFLOWS_SERVICES_POOL_SIZE = 10
+"""Number of connections kept alive to each service by each process."""
+
+WORKFLOWS_SERVICES_CIRCUIT_BREAKER_THRESHOLD = 5
+"""Number of consecutive failures after which a service is not called anymore."""
+
+WORKFLOWS_SERVICES_CIRCUIT_BREAKER_TIMEOUT = 60
+"""Time in seconds after which a service that failed is called again."""
+
+WORKFLOWS_SERVICES_COALESCE_WINDOW = None
+"""Time in seconds during which the response to a request is reused by identical requests.
+
+Note:
+
+  Identical requests are only coalesced within a process. If ``None``,
+  requests are never coalesced.
+"""
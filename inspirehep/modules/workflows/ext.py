@@ -29,6 +29,8 @@ import os
 import pkg_resources
 
 from . import config
+from .cli import workflows
+from .utils.tracing import CountingRequestsHttpConnection
 from .views import callback_blueprint, workflow_blueprint
 
 
@@ -41,6 +43,7 @@ class InspireWorkflows(object):
         self.init_config(app)
         app.register_blueprint(callback_blueprint)
         app.register_blueprint(workflow_blueprint)
+        app.cli.add_command(workflows)
         app.extensions['inspire-workflows'] = self
 
     def init_config(self, app):
@@ -60,3 +63,7 @@ class InspireWorkflows(object):
         app.config['CLASSIFIER_WORKDIR'] = pkg_resources.resource_filename(
             'inspirehep', "taxonomies"
         )
+
+        search_client_config = dict(app.config.get('SEARCH_CLIENT_CONFIG') or {})
+        search_client_config.setdefault('connection_class', CountingRequestsHttpConnection)
+        app.config['SEARCH_CLIENT_CONFIG'] = search_client_config
@@ -68,6 +68,85 @@ class WorkflowsAudit(db.Model):
             db.session.add(self)
 
 
+class WorkflowsStepTiming(db.Model):
+    """Resources used by one run of a workflow step."""
+
+    __tablename__ = 'workflows_step_timing'
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    created = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    object_id = db.Column(
+        db.Integer,
+        db.ForeignKey('workflows_object.id', ondelete='CASCADE'),
+        nullable=False,
+        index=True,
+    )
+    workflow = db.Column(db.String(255), nullable=False)
+    step = db.Column(db.String(255), nullable=False)
+
+    # Wall and CPU time in seconds, increase of the peak RSS in kilobytes
+    wall_time = db.Column(db.Float, nullable=False)
+    cpu_time = db.Column(db.Float, nullable=False)
+    rss_delta = db.Column(db.Integer, default=0, nullable=False)
+
+    http_calls = db.Column(db.Integer, default=0, nullable=False)
+    es_calls = db.Column(db.Integer, default=0, nullable=False)
+    db_calls = db.Column(db.Integer, default=0, nullable=False)
+
+    @classmethod
+    def get_percentiles(cls, last=100, workflow=None):
+        """Summarize the timings of the steps of the most recent workflows.
+
+        Args:
+            last(int): number of most recent workflow objects to consider.
+            workflow(Optional[str]): only consider the steps of this workflow.
+
+        Returns:
+            List[tuple]: for each workflow and step, the number of runs, the
+            median and 95th percentile of the wall time and CPU time, the
+            mean RSS increase and the mean number of HTTP, ES and DB calls,
+            by decreasing 95th percentile of the wall time.
+        """
+        objects = db.session.query(cls.object_id)
+        if workflow:
+            objects = objects.filter(cls.workflow == workflow)
+        objects = objects.group_by(
+            cls.object_id,
+        ).order_by(
+            db.func.max(cls.id).desc(),
+        ).limit(last).subquery()
+
+        def _percentile(fraction, column):
+            return db.func.percentile_cont(fraction).within_group(column)
+
+        p95_wall_time = _percentile(0.95, cls.wall_time)
+        query = db.session.query(
+            cls.workflow,
+            cls.step,
+            db.func.count(),
+            _percentile(0.5, cls.wall_time),
+            p95_wall_time,
+            _percentile(0.5, cls.cpu_time),
+            _percentile(0.95, cls.cpu_time),
+            db.func.avg(cls.rss_delta),
+            db.func.avg(cls.http_calls),
+            db.func.avg(cls.es_calls),
+            db.func.avg(cls.db_calls),
+        ).filter(
+            cls.object_id.in_(db.session.query(objects.c.object_id)),
+        )
+        if workflow:
+            query = query.filter(cls.workflow == workflow)
+        query = query.group_by(
+            cls.workflow,
+            cls.step,
+        ).order_by(
+            p95_wall_time.desc(),
+        )
+
+        return query.all()
+
+
 class WorkflowsPendingRecord(db.Model):
 
     __tablename__ = "workflows_pending_record"
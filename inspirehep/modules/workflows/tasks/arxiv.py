@@ -54,6 +54,7 @@ from inspirehep.modules.workflows.utils import (
     timeout_with_config,
     with_debug_logging,
 )
+from inspirehep.modules.workflows.utils.tracing import count_http_call
 
 REGEXP_AUTHLIST = re.compile(
     "<collaborationauthorlist.*?>.*?</collaborationauthorlist>", re.DOTALL)
@@ -74,7 +75,7 @@ def populate_arxiv_document(obj, eng):
         if is_valid_pdf_link:
             break
 
-        if NO_PDF_ON_ARXIV in requests.get(url).content:
+        if NO_PDF_ON_ARXIV in requests.get(url, hooks={'response': count_http_call}).content:
             obj.log.info('No PDF is available for %s', arxiv_id)
             return
 
@@ -24,7 +24,11 @@
 
 from __future__ import absolute_import, division, print_function
 
+import time
+
 from flask import current_app
+from six import text_type
+from werkzeug.utils import import_string
 
 from itertools import chain
 
@@ -33,6 +37,8 @@ from inspire_dojson.utils import (
     get_recid_from_ref
 )
 from inspire_matcher import match
+from inspire_matcher.core import compile as compile_matcher_query
+from inspire_matcher.validators import default_validator
 from inspire_schemas.utils import (
     convert_old_publication_info_to_new,
     split_page_artid,
@@ -42,6 +48,8 @@ from inspire_utils.dedupers import dedupe_list
 from inspire_utils.helpers import maybe_int
 from inspire_utils.logging import getStackTraceLogger
 from inspire_utils.record import get_value
+from invenio_search import current_search_client as es
+from inspirehep.utils.cache import LRUCache
 from inspirehep.utils.references import (
     local_refextract_kbs_path,
     map_refextract_to_schema,
@@ -204,15 +212,61 @@ def extract_references_from_raw_ref(reference, custom_kbs_file=None):
 def match_references(references):
     """Match references to their respective records in INSPIRE.
 
+    The queries of all the matcher configurations are built for all the
+    references at once, and sent in a few ``_msearch`` requests, one round
+    per configuration. A round only includes the references which were not
+    matched to a single record by the previous configurations. The fallback
+    from one configuration to the next, which depends on the record matched
+    by the previous reference, is then applied in memory.
+
+    The references which match a single record by their DOIs and arXiv
+    eprint, or by their publication info, are kept in a cache shared by the
+    workflows of the process (see :func:`get_reference_match_cache`).
+
     Args:
         references (list): the list of references.
 
     Returns:
         list: the matched references.
     """
+    match_cache = get_reference_match_cache()
+    configs = [_get_reference_matcher_configs(ref) for ref in references]
+    cache_keys = [_get_reference_cache_keys(ref, ref_configs[0]) for ref, ref_configs in zip(references, configs)]
+    cached_matches = [match_cache.get(keys) for keys in cache_keys]
+
+    matched_recids = [[None] * len(ref_configs) for ref_configs in configs]
+    for round_ in range(len(configs[0]) if configs else 0):
+        pending = [
+            i for i, cached_match in enumerate(cached_matches)
+            if cached_match is None and not any(
+                recids and len(set(recids)) == 1 for recids in matched_recids[i][:round_])
+        ]
+        searches = list(chain.from_iterable(
+            _get_searches(i, references[i], configs[i][round_]) for i in pending))
+        for i in pending:
+            matched_recids[i][round_] = []
+        for (i, reference, validator, _, _), hits in zip(searches, _msearch(searches)):
+            matched_recids[i][round_].extend(
+                hit['_source']['control_number'] for hit in hits if validator(reference, hit))
+
     matched_references, previous_matched_recid = [], None
-    for ref in references:
-        ref = match_reference(ref, previous_matched_recid)
+    for ref, ref_configs, keys, cached_match, ref_matched_recids in zip(
+            references, configs, cache_keys, cached_matches, matched_recids):
+        if cached_match:
+            _add_match_to_reference(ref, cached_match[1], cached_match[0])
+
+        for i, (config, recids) in enumerate(zip(ref_configs, ref_matched_recids)):
+            if 'record' in ref or recids is None:
+                break
+
+            recids = dedupe_list(recids)
+            if len(recids) == 1:
+                _add_match_to_reference(ref, recids[0], config['index'])
+                if keys and keys[0] == i:
+                    match_cache.set(keys, (config['index'], recids[0]))
+            elif previous_matched_recid in recids:
+                _add_match_to_reference(ref, previous_matched_recid, config['index'])
+
         matched_references.append(ref)
         if 'record' in ref:
             previous_matched_recid = get_recid_from_ref(ref['record'])
@@ -220,17 +274,8 @@ def match_references(references):
     return matched_references
 
 
-def match_reference(reference, previous_matched_recid=None):
-    """Match a reference using inspire-matcher.
-
-    Args:
-        reference (dict): the metadata of a reference.
-        previous_matched_recid (int): the record id of the last matched
-            reference from the list of references.
-
-    Returns:
-        dict: the matched reference.
-    """
+def _get_reference_matcher_configs(reference):
+    """Return the inspire-matcher configurations to try, in order."""
     config_unique_identifiers = current_app.config[
         'WORKFLOWS_REFERENCE_MATCHER_UNIQUE_IDENTIFIERS_CONFIG']
     config_default_publication_info = current_app.config[
@@ -244,7 +289,139 @@ def match_reference(reference, previous_matched_recid=None):
     config_publication_info = config_jcap_and_jhep_publication_info if \
         journal_title in ['JCAP', 'JHEP'] else config_default_publication_info
 
-    configs = [config_unique_identifiers, config_publication_info, config_data]
+    return [config_unique_identifiers, config_publication_info, config_data]
+
+
+def _get_searches(position, reference, config):
+    """Return the ES searches of a configuration for a reference.
+
+    Each search is a tuple ``(position, reference, validator, header, body)``,
+    built like in :func:`inspire_matcher.match`.
+    """
+    collections = config.get('collections')
+    match_deleted = config.get('match_deleted', False)
+    header = {'index': config['index'], 'type': config['doc_type']}
+
+    # XXX: avoid this type casting.
+    try:
+        reference['reference']['publication_info']['year'] = str(
+            reference['reference']['publication_info']['year'])
+    except KeyError:
+        pass
+
+    searches = []
+    for step in config['algorithm']:
+        validator = _get_validator(step.get('validator'))
+        for query in step['queries']:
+            body = compile_matcher_query(query, reference, collections=collections, match_deleted=match_deleted)
+            if not body:
+                continue
+
+            if config.get('source'):
+                body['_source'] = config['source']
+            searches.append((position, reference, validator, header, body))
+
+    # XXX: avoid this type casting.
+    try:
+        reference['reference']['publication_info']['year'] = int(
+            reference['reference']['publication_info']['year'])
+    except KeyError:
+        pass
+
+    return searches
+
+
+def _get_validator(validator):
+    if validator is None:
+        return default_validator
+    elif callable(validator):
+        return validator
+
+    try:
+        return import_string(validator)
+    except (KeyError, ImportError):
+        return default_validator
+
+
+def _msearch(searches):
+    """Run searches in ``_msearch`` requests and return the hits of each.
+
+    The searches which fail are sent again one by one, so that their errors
+    are raised as they would be by :func:`inspire_matcher.match`.
+    """
+    batch_size = current_app.config['WORKFLOWS_REFERENCE_MATCHER_MSEARCH_SIZE']
+
+    hits = []
+    for start in range(0, len(searches), batch_size):
+        batch = searches[start:start + batch_size]
+        body = list(chain.from_iterable((header, query) for _, _, _, header, query in batch))
+        responses = es.msearch(body=body)['responses']
+        for (_, _, _, header, query), response in zip(batch, responses):
+            if 'error' in response:
+                LOGGER.warning('Reference matcher search failed: %s', response['error'])
+                response = es.search(index=header['index'], doc_type=header['type'], body=query)
+            hits.append(response['hits']['hits'])
+
+    return hits
+
+
+def _normalize_key_part(value):
+    return u' '.join(text_type(value).split()).upper()
+
+
+def _get_reference_cache_keys(reference, config_unique_identifiers):
+    """Return the keys of the reference in the reference match cache.
+
+    The keys are either the DOIs and arXiv eprint of the reference, or, if
+    it has no unique identifiers at all, its publication info. The result is
+    a tuple starting with the position of the configuration that matches
+    on these keys, or ``None`` if the reference can't be cached.
+    """
+    if _get_searches(None, reference, config_unique_identifiers):
+        arxiv_eprint = get_value(reference, 'reference.arxiv_eprint')
+        dois = get_value(reference, 'reference.dois', [])
+        keys = [u'doi:' + _normalize_key_part(doi) for doi in dois]
+        if arxiv_eprint:
+            arxiv_eprint = _normalize_key_part(arxiv_eprint)
+            if arxiv_eprint.startswith(u'ARXIV:'):
+                arxiv_eprint = arxiv_eprint[len(u'ARXIV:'):]
+            keys.append(u'arxiv:' + arxiv_eprint)
+
+        return (0,) + tuple(sorted(keys)) if keys else None
+
+    publication_info = get_value(reference, 'reference.publication_info', {})
+    if not (
+        publication_info.get('journal_title') and
+        publication_info.get('journal_volume') and
+        (publication_info.get('page_start') or publication_info.get('artid'))
+    ):
+        return None
+
+    return 1, u'pubinfo:' + u'|'.join(
+        _normalize_key_part(publication_info.get(field, u''))
+        for field in (
+            'journal_title',
+            'journal_volume',
+            'journal_issue',
+            'page_start',
+            'artid',
+            'year',
+        )
+    )
+
+
+def match_reference(reference, previous_matched_recid=None):
+    """Match a reference using inspire-matcher.
+
+    Args:
+        reference (dict): the metadata of a reference.
+        previous_matched_recid (int): the record id of the last matched
+            reference from the list of references.
+
+    Returns:
+        dict: the matched reference.
+    """
+    configs = _get_reference_matcher_configs(reference)
 
     matches = (match_reference_with_config(reference, config, previous_matched_recid) for config in configs)
     matches = (matched_record for matched_record in matches if 'record' in matched_record)
@@ -297,3 +474,65 @@ def _add_match_to_reference(reference, matched_recid, es_index):
         reference['record'] = get_record_ref(matched_recid, 'data')
     elif es_index == 'records-hep':
         reference['record'] = get_record_ref(matched_recid, 'literature')
+
+
+class ReferenceMatchCache(object):
+    """Cache of the records matched by normalized references.
+
+    Each key of the reference, a DOI, an arXiv eprint or a publication info,
+    is mapped to the ES index and record id it matched, for ``ttl`` seconds.
+    The same popular papers are cited by thousands of papers, so most of the
+    references are then matched without querying ES.
+    """
+
+    def __init__(self, maxsize, ttl):
+        self.entries = LRUCache(maxsize)
+        self.ttl = ttl
+
+    def get(self, keys):
+        """Return the ``(es_index, recid)`` matched by the keys, if any.
+
+        All the keys must be cached and match the same record, otherwise an
+        identifier of the reference could match another record.
+
+        Args:
+            keys (tuple): the keys returned by ``_get_reference_cache_keys``.
+        """
+        if not keys:
+            return
+
+        matches = set()
+        for key in keys[1:]:
+            entry = self.entries.get(key)
+            if not entry or time.time() - entry[1] >= self.ttl:
+                return
+            matches.add(entry[0])
+
+        if len(matches) == 1:
+            return matches.pop()
+
+    def set(self, keys, match):
+        for key in keys[1:]:
+            self.entries.set(key, (match, time.time()))
+
+    def clear(self):
+        self.entries.clear()
+
+
+_reference_match_cache = None
+
+
+def get_reference_match_cache():
+    """Return the :class:`ReferenceMatchCache` of the current process.
+
+    It is created on first use, from ``WORKFLOWS_REFERENCE_MATCHER_CACHE_SIZE``
+    and ``WORKFLOWS_REFERENCE_MATCHER_CACHE_TTL``.
+    """
+    global _reference_match_cache
+    if _reference_match_cache is None:
+        _reference_match_cache = ReferenceMatchCache(
+            maxsize=current_app.config['WORKFLOWS_REFERENCE_MATCHER_CACHE_SIZE'],
+            ttl=current_app.config['WORKFLOWS_REFERENCE_MATCHER_CACHE_TTL'],
+        )
+
+    return _reference_match_cache
@@ -48,34 +48,23 @@ from inspirehep.modules.workflows.models import (
     WorkflowsAudit,
     WorkflowsRecordSources,
 )
+from inspirehep.modules.workflows.utils.services import get_service_client
+from inspirehep.modules.workflows.utils.tracing import count_http_call
 
 
 LOGGER = getStackTraceLogger(__name__)
 
 
-@backoff.on_exception(backoff.expo, requests.packages.urllib3.exceptions.ConnectionError, base=4, max_tries=5)
 def json_api_request(url, data, headers=None):
-    """Make JSON API request and return JSON response."""
-    final_headers = {
-        "Content-Type": "application/json",
-        "Accept": "application/json"
-    }
-    if headers:
-        final_headers.update(headers)
+    """Make JSON API request and return JSON response.
+
+    The request is sent by the client shared by all requests to the same
+    host, see :class:`~inspirehep.modules.workflows.utils.services.ServiceClient`.
+    """
     current_app.logger.debug("POST {0} with \n{1}".format(
         url, json.dumps(data, indent=4)
     ))
-    try:
-        response = requests.post(
-            url=url,
-            headers=final_headers,
-            data=json.dumps(data),
-        )
-    except requests.exceptions.RequestException as err:
-        current_app.logger.exception(err)
-        raise
-    if response.status_code == 200:
-        return response.json()
+    return get_service_client(url).post_json(url, data, headers=headers)
 
 
 def log_workflows_action(action, relevance_prediction,
@@ -304,7 +293,7 @@ def download_file_to_workflow(workflow, name, url):
     might terminate the connection before sending any data. In this case we
     retry 5 times with exponential backoff before giving up.
     """
-    with closing(requests.get(url=url, stream=True)) as req:
+    with closing(requests.get(url=url, stream=True, hooks={'response': count_http_call})) as req:
         if req.status_code == 200:
             req.raw.decode_content = True
             workflow.files[name] = req.raw
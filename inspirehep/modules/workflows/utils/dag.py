@@ -0,0 +1,220 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of INSPIRE.
+# Copyright (C) 2018 CERN.
+#
+# INSPIRE is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# INSPIRE is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with INSPIRE. If not, see <http://www.gnu.org/licenses/>.
+#
+# In applying this license, CERN does not waive the privileges and immunities
+# granted to it by virtue of its status as an Intergovernmental Organization
+# or submit itself to any jurisdiction.
+
+
+"""Dependency-aware execution of workflow steps."""
+
+from __future__ import absolute_import, division, print_function
+
+import sys
+from copy import deepcopy
+from multiprocessing.pool import ThreadPool
+
+import six
+from flask import current_app
+from six.moves.queue import Queue
+
+KEY_CONTAINERS = ('data', 'extra_data')
+FILES_KEY = 'files'
+
+
+class Step(object):
+    """A workflow step, with the keys of the workflow object it reads and writes.
+
+    Keys are either ``files``, for the files attached to the workflow
+    object, or the name of a top-level key of ``obj.data`` or
+    ``obj.extra_data``, prefixed by ``data.`` or ``extra_data.``.
+
+    Args:
+        task(callable): a workflow task, taking the object and the engine.
+        reads(Iterable[str]): the keys read by the task and its condition.
+        writes(Iterable[str]): the keys written by the task.
+        condition(Optional[callable]): a workflow condition, the task is
+            skipped if it evaluates to ``False``.
+        in_thread(bool): whether the task can run in a thread. Such a task
+            gets a copy of the keys it declares instead of the workflow
+            object, so it cannot use the files, the database or the engine,
+            and it can be interrupted by timeouts relying on signals.
+    """
+
+    def __init__(self, task, reads=(), writes=(), condition=None, in_thread=False):
+        self.task = task
+        self.reads = frozenset(reads)
+        self.writes = frozenset(writes)
+        self.condition = condition
+        self.in_thread = in_thread
+
+        for key in self.reads | self.writes:
+            if key == FILES_KEY and not in_thread:
+                continue
+            container, _, name = key.partition('.')
+            if container not in KEY_CONTAINERS or not name:
+                raise ValueError('Invalid key {} for step {}'.format(key, self.name))
+
+    @property
+    def name(self):
+        return getattr(self.task, '__name__', repr(self.task))
+
+    def conflicts_with(self, other):
+        """Whether the order in which both steps run changes their result."""
+        return bool(
+            self.writes & (other.reads | other.writes) or
+            self.reads & other.writes
+        )
+
+
+class _StepObject(object):
+    """Copy of the keys of a workflow object declared by a step running in a thread."""
+
+    def __init__(self, obj, keys):
+        self.id = obj.id
+        self.log = obj.log
+        self.data = {}
+        self.extra_data = {}
+        for container, name in _split_keys(keys):
+            source = getattr(obj, container)
+            if name in source:
+                getattr(self, container)[name] = deepcopy(source[name])
+
+    def merge_into(self, obj, keys):
+        for container, name in _split_keys(keys):
+            source, destination = getattr(self, container), getattr(obj, container)
+            if name in source:
+                destination[name] = source[name]
+            else:
+                destination.pop(name, None)
+
+
+def _split_keys(keys):
+    for key in sorted(keys):
+        container, _, name = key.partition('.')
+        yield container, name
+
+
+def _run_step_in_thread(app, index, step, step_obj, eng):
+    try:
+        with app.app_context():
+            step.task(step_obj, eng)
+    except Exception:
+        return index, step_obj, sys.exc_info()
+    return index, step_obj, None
+
+
+def run_steps(*steps, **kwargs):
+    """Run workflow steps, in threads when they do not depend on each other.
+
+    A step runs after all the earlier steps it conflicts with, according to
+    the keys they read and write, so the result is the same as running the
+    steps in the order in which they are given. The steps that are not
+    marked ``in_thread`` run one after the other in the workflow process.
+    The ones that are run in a pool of threads as soon as the steps they
+    depend on are done, while the others go on, and their changes are
+    merged back into the workflow object in the workflow process.
+
+    Note:
+        The steps are run by a single workflow task, so they are all run
+        again when the workflow is restarted after one of them failed.
+
+    Args:
+        steps(Step): the steps to run.
+        max_workers(Optional[int]): the number of threads, by default
+            ``WORKFLOWS_CONCURRENT_STEPS_MAX_WORKERS``.
+
+    Returns:
+        callable: the workflow task.
+    """
+    max_workers = kwargs.pop('max_workers', None)
+    dependencies = [
+        {
+            earlier for earlier in range(index)
+            if steps[earlier].conflicts_with(step) or not (step.in_thread or steps[earlier].in_thread)
+        }
+        for index, step in enumerate(steps)
+    ]
+
+    def _run_steps(obj, eng):
+        app = current_app._get_current_object()
+        workers = max_workers or app.config['WORKFLOWS_CONCURRENT_STEPS_MAX_WORKERS']
+        results = Queue()
+        pool = ThreadPool(processes=workers)
+        started, finished, failures = set(), set(), {}
+        in_flight = set()
+
+        def _is_ready(index):
+            return index not in started and dependencies[index] <= finished
+
+        def _should_run(step):
+            return step.condition is None or step.condition(obj, eng)
+
+        def _collect_result(block=True):
+            index, step_obj, exc_info = results.get(block=block)
+            if exc_info:
+                failures[index] = exc_info
+            else:
+                step_obj.merge_into(obj, steps[index].writes)
+            in_flight.discard(index)
+            finished.add(index)
+
+        try:
+            while len(finished) < len(steps) and not failures:
+                for index, step in enumerate(steps):
+                    if step.in_thread and _is_ready(index):
+                        started.add(index)
+                        if not _should_run(step):
+                            finished.add(index)
+                            continue
+                        step_obj = _StepObject(obj, step.reads | step.writes)
+                        in_flight.add(index)
+                        pool.apply_async(
+                            _run_step_in_thread,
+                            (app, index, step, step_obj, eng),
+                            callback=results.put,
+                        )
+
+                local_steps = [
+                    index for index, step in enumerate(steps)
+                    if not step.in_thread and index not in started
+                ]
+                if local_steps and _is_ready(local_steps[0]):
+                    index = local_steps[0]
+                    started.add(index)
+                    if _should_run(steps[index]):
+                        steps[index].task(obj, eng)
+                    finished.add(index)
+                elif in_flight:
+                    _collect_result()
+
+                while not results.empty():
+                    _collect_result(block=False)
+        finally:
+            # A local step or a condition may have raised, only the steps
+            # running in threads will still put their results.
+            while in_flight:
+                _collect_result()
+            pool.terminate()
+
+        if failures:
+            six.reraise(*failures[min(failures)])
+
+    _run_steps.__name__ = 'run_steps'
+    _run_steps.steps = steps
+    return _run_steps
@@ -0,0 +1,288 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of INSPIRE.
+# Copyright (C) 2018 CERN.
+#
+# INSPIRE is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# INSPIRE is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with INSPIRE. If not, see <http://www.gnu.org/licenses/>.
+#
+# In applying this license, CERN does not waive the privileges and immunities
+# granted to it by virtue of its status as an Intergovernmental Organization
+# or submit itself to any jurisdiction.
+
+
+"""HTTP client for the services used by the workflows, like Beard and Magpie."""
+
+from __future__ import absolute_import, division, print_function
+
+import json
+import os
+import random
+import sys
+import threading
+import time
+from copy import deepcopy
+
+import requests
+import six
+from flask import current_app
+from redis import StrictRedis
+from six.moves.urllib.parse import urlsplit
+
+from inspire_utils.logging import getStackTraceLogger
+
+from .tracing import count_http_call
+
+LOGGER = getStackTraceLogger(__name__)
+
+METRICS_ENDPOINTS_KEY = 'workflows_services_endpoints'
+METRICS_KEY = 'workflows_services_metrics:{}'
+
+RETRYABLE_ERRORS = (
+    requests.exceptions.ConnectionError,
+    requests.exceptions.Timeout,
+    requests.packages.urllib3.exceptions.ConnectionError,
+)
+
+_clients = {}
+_clients_lock = threading.Lock()
+_clients_pid = []
+
+
+class ServiceUnavailable(requests.exceptions.RequestException):
+    """The circuit breaker of a service is open."""
+
+
+class CircuitBreaker(object):
+    """Stop calling a service after too many consecutive failures.
+
+    After ``threshold`` consecutive failures the circuit opens and calls
+    fail immediately. After ``reset_timeout`` seconds a single trial call
+    is let through, which closes the circuit if it succeeds.
+    """
+
+    def __init__(self, threshold, reset_timeout):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if time.time() - self.opened_at >= self.reset_timeout:
+                # Let a single call through, the others wait for another timeout.
+                self.opened_at = time.time()
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.failures >= self.threshold:
+                self.opened_at = time.time()
+
+
+class _Call(object):
+    def __init__(self):
+        self.event = threading.Event()
+        self.finished = None
+        self.result = None
+        self.exc_info = None
+
+
+class ServiceClient(object):
+    """Client sending JSON requests to a single host.
+
+    It keeps the connections to the host alive, retries the failed requests
+    with exponential backoff and jitter, and stops calling the host while it
+    is down. Identical requests made at the same time can also be coalesced
+    into a single one.
+    """
+
+    def __init__(self, config):
+        self.timeout = config['WORKFLOWS_SERVICES_TIMEOUT']
+        self.retries = config['WORKFLOWS_SERVICES_RETRIES']
+        self.backoff = config['WORKFLOWS_SERVICES_BACKOFF']
+        self.coalesce_window = config['WORKFLOWS_SERVICES_COALESCE_WINDOW']
+        self.breaker = CircuitBreaker(
+            config['WORKFLOWS_SERVICES_CIRCUIT_BREAKER_THRESHOLD'],
+            config['WORKFLOWS_SERVICES_CIRCUIT_BREAKER_TIMEOUT'],
+        )
+
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=config['WORKFLOWS_SERVICES_POOL_SIZE'],
+        )
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.session.hooks['response'].append(count_http_call)
+
+        redis_url = config.get('CACHE_REDIS_URL')
+        self.redis = StrictRedis.from_url(redis_url) if redis_url else None
+
+        self._calls = {}
+        self._calls_lock = threading.Lock()
+
+    def post_json(self, url, data, headers=None):
+        """POST ``data`` as JSON to ``url``.
+
+        Returns:
+            Optional[dict]: the decoded response, or ``None`` if its status
+            is not 200.
+
+        Raises:
+            requests.exceptions.RequestException: if the request failed after
+                all the retries, or :class:`ServiceUnavailable` if the circuit
+                breaker of the host is open.
+        """
+        final_headers = {
+            "Content-Type": "application/json",
+            "Accept": "application/json"
+        }
+        if headers:
+            final_headers.update(headers)
+        body = json.dumps(data)
+
+        if self.coalesce_window is None:
+            return self._post(url, body, final_headers)
+        return self._post_coalesced(url, body, final_headers)
+
+    def _post_coalesced(self, url, body, headers):
+        key = url, body, tuple(sorted(headers.items()))
+        with self._calls_lock:
+            now = time.time()
+            for other_key, other_call in list(self._calls.items()):
+                if other_call.finished and now - other_call.finished > self.coalesce_window:
+                    del self._calls[other_key]
+            call = self._calls.get(key)
+            is_leader = call is None
+            if is_leader:
+                call = self._calls[key] = _Call()
+
+        if not is_leader:
+            call.event.wait()
+            self._record_metrics(url, coalesced=1)
+            if call.exc_info:
+                six.reraise(*call.exc_info)
+            return deepcopy(call.result)
+
+        try:
+            call.result = self._post(url, body, headers)
+        except Exception:
+            call.exc_info = sys.exc_info()
+            raise
+        finally:
+            call.finished = time.time()
+            call.event.set()
+
+        return deepcopy(call.result)
+
+    def _post(self, url, body, headers):
+        if not self.breaker.allow():
+            self._record_metrics(url, rejected=1)
+            raise ServiceUnavailable('Too many failures of {}, not calling it'.format(url))
+
+        start = time.time()
+        retries = 0
+        while True:
+            try:
+                response = self.session.post(url, data=body, headers=headers, timeout=self.timeout)
+                if response.status_code < 500 or retries == self.retries:
+                    break
+            except (requests.exceptions.RequestException,) + RETRYABLE_ERRORS as err:
+                if not isinstance(err, RETRYABLE_ERRORS) or retries == self.retries:
+                    self.breaker.record_failure()
+                    self._record_metrics(url, latency=time.time() - start, errors=1, retries=retries)
+                    current_app.logger.exception(err)
+                    raise
+
+            time.sleep(random.uniform(0, self.backoff * 2 ** retries))
+            retries += 1
+
+        failed = response.status_code >= 500
+        if failed:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+        self._record_metrics(url, latency=time.time() - start, errors=int(failed), retries=retries)
+
+        if response.status_code == 200:
+            return response.json()
+
+    def _record_metrics(self, url, latency=None, **counters):
+        if self.redis is None:
+            return
+
+        endpoint = get_endpoint(url)
+        key = METRICS_KEY.format(endpoint)
+        try:
+            with self.redis.pipeline() as pipeline:
+                pipeline.sadd(METRICS_ENDPOINTS_KEY, endpoint)
+                if latency is not None:
+                    pipeline.hincrby(key, 'requests', 1)
+                    pipeline.hincrbyfloat(key, 'latency', latency)
+                    pipeline.hset(key, 'last_latency', latency)
+                for name, value in counters.items():
+                    if value:
+                        pipeline.hincrby(key, name, value)
+                pipeline.execute()
+        except Exception:
+            LOGGER.warning('Cannot record the metrics of %s', endpoint, exc_info=True)
+
+
+def get_endpoint(url):
+    """Get the endpoint of a URL, without its query string."""
+    parts = urlsplit(url)
+    return '{}://{}{}'.format(parts.scheme, parts.netloc, parts.path)
+
+
+def get_service_client(url):
+    """Get the client for the host of ``url`` shared by this process."""
+    with _clients_lock:
+        if _clients_pid != [os.getpid()]:
+            # The connections cannot be shared with a forked process.
+            _clients.clear()
+            _clients_pid[:] = [os.getpid()]
+
+        host = urlsplit(url).netloc
+        if host not in _clients:
+            _clients[host] = ServiceClient(current_app.config)
+        return _clients[host]
+
+
+def get_services_metrics():
+    """Get the metrics of the requests made to each endpoint.
+
+    Returns:
+        dict: for each endpoint, the number of ``requests``, ``errors``,
+        ``retries``, requests ``rejected`` by the circuit breaker and
+        ``coalesced`` requests, the total and last ``latency`` in seconds.
+    """
+    redis = StrictRedis.from_url(current_app.config['CACHE_REDIS_URL'])
+    metrics = {}
+    for endpoint in sorted(redis.smembers(METRICS_ENDPOINTS_KEY)):
+        values = redis.hgetall(METRICS_KEY.format(endpoint))
+        metrics[endpoint] = {
+            name: float(values.get(name, 0))
+            for name in ('requests', 'errors', 'retries', 'rejected', 'coalesced', 'latency', 'last_latency')
+        }
+    return metrics
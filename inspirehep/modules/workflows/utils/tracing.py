@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of INSPIRE.
+# Copyright (C) 2018 CERN.
+#
+# INSPIRE is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# INSPIRE is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with INSPIRE. If not, see <http://www.gnu.org/licenses/>.
+#
+# In applying this license, CERN does not waive the privileges and immunities
+# granted to it by virtue of its status as an Intergovernmental Organization
+# or submit itself to any jurisdiction.
+
+
+"""Tracing of the time and resources used by workflow steps."""
+
+from __future__ import absolute_import, division, print_function
+
+import resource
+import time
+from collections import Counter
+from functools import WRAPPER_ASSIGNMENTS, wraps
+
+from elasticsearch import RequestsHttpConnection
+from flask import current_app
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from inspire_utils.logging import getStackTraceLogger
+from invenio_db import db
+
+from ..models import WorkflowsStepTiming
+
+LOGGER = getStackTraceLogger(__name__)
+
+_calls = Counter()
+
+
+def count_http_call(response, *args, **kwargs):
+    """Response hook of ``requests`` counting the HTTP calls of the steps.
+
+    Example:
+        >>> requests.get(url, hooks={'response': count_http_call})
+    """
+    _calls['http'] += 1
+
+
+class CountingRequestsHttpConnection(RequestsHttpConnection):
+    """Elasticsearch connection counting the ES calls of the steps."""
+
+    def perform_request(self, *args, **kwargs):
+        _calls['es'] += 1
+        return super(CountingRequestsHttpConnection, self).perform_request(*args, **kwargs)
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _count_db_call(*args, **kwargs):
+    _calls['db'] += 1
+
+
+def _get_resources():
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return (
+        time.time(),
+        usage.ru_utime + usage.ru_stime,
+        usage.ru_maxrss,
+        _calls['http'],
+        _calls['es'],
+        _calls['db'],
+    )
+
+
+def trace_step(workflow, step=None):
+    """Decorator storing the time and resources used by a workflow step.
+
+    For each run of the step, a :class:`WorkflowsStepTiming` is added to
+    the session with its wall time, CPU time, increase of the peak RSS and
+    numbers of HTTP, ES and DB calls. The CPU time, RSS and calls are the
+    ones of the whole process, which includes the steps running in threads
+    at the same time. Only the HTTP requests sent with the
+    :func:`count_http_call` hook and the ES requests sent through
+    :class:`CountingRequestsHttpConnection` are counted.
+
+    Args:
+        workflow(str): name of the workflow.
+        step(Optional[str]): name of the step, by default the name of the
+            decorated function.
+    """
+    def decorator(func):
+        step_name = step or func.__name__
+
+        # Some tasks, like partials, do not have all the attributes copied by default.
+        @wraps(func, assigned=[attr for attr in WRAPPER_ASSIGNMENTS if hasattr(func, attr)])
+        def _trace_step(obj, eng):
+            if not current_app.config.get('WORKFLOWS_TRACE_STEPS'):
+                return func(obj, eng)
+
+            before = _get_resources()
+            try:
+                return func(obj, eng)
+            finally:
+                _store_timing(obj, workflow, step_name, before, _get_resources())
+
+        _trace_step._traced = True
+        return _trace_step
+    return decorator
+
+
+def _store_timing(obj, workflow, step, before, after):
+    wall_time, cpu_time, rss_delta, http_calls, es_calls, db_calls = [
+        end - start for start, end in zip(before, after)
+    ]
+    try:
+        db.session.add(WorkflowsStepTiming(
+            object_id=obj.id,
+            workflow=workflow,
+            step=step[:255],
+            wall_time=wall_time,
+            cpu_time=cpu_time,
+            rss_delta=rss_delta,
+            http_calls=http_calls,
+            es_calls=es_calls,
+            db_calls=db_calls,
+        ))
+    except Exception:
+        LOGGER.exception('Cannot store the timing of step %s of workflow %s', step, obj.id)
+
+
+def _get_step_name(task):
+    name = getattr(task, '__name__', None) or type(task).__name__
+    if not getattr(task, '__module__', '').startswith('workflow.'):
+        return name
+
+    # Control flow patterns are only traced when they evaluate a
+    # condition, under the name of the condition.
+    closure = dict(zip(task.__code__.co_freevars, task.__closure__ or ()))
+    if 'cond' not in closure:
+        return None
+    condition = closure['cond'].cell_contents
+    return '{}({})'.format(name, getattr(condition, '__name__', type(condition).__name__))
+
+
+def trace_steps(tasks, workflow):
+    """Trace all the steps of a workflow definition with :func:`trace_step`.
+
+    The steps of :func:`inspirehep.modules.workflows.utils.dag.run_steps`
+    that run in the workflow process are traced too.
+
+    Args:
+        tasks(list): the workflow definition.
+        workflow(str): name of the workflow.
+
+    Returns:
+        list: the workflow definition with traced steps.
+    """
+    if isinstance(tasks, (list, tuple)):
+        return type(tasks)(trace_steps(task, workflow) for task in tasks)
+    if not callable(tasks) or getattr(tasks, '_traced', False):
+        return tasks
+
+    for step in getattr(tasks, 'steps', ()):
+        if not step.in_thread:
+            step.task = trace_steps(step.task, workflow)
+
+    step_name = _get_step_name(tasks)
+    if step_name is None:
+        return tasks
+    return trace_step(workflow, step_name)(tasks)
@@ -110,6 +110,8 @@ from inspirehep.modules.workflows.tasks.submission import (
     wait_webcoll,
 )
 from inspirehep.modules.workflows.utils import do_not_repeat
+from inspirehep.modules.workflows.utils.dag import Step, run_steps
+from inspirehep.modules.workflows.utils.tracing import trace_steps
 from inspirehep.modules.literaturesuggest.tasks import (
     curation_ticket_needed,
     reply_ticket_context,
@@ -152,39 +154,113 @@ CHECK_AUTO_APPROVE = [
 ]
 
 ENHANCE_RECORD = [
-    IF(
-        is_arxiv_paper,
-        [
+    run_steps(
+        Step(
             populate_arxiv_document,
+            condition=is_arxiv_paper,
+            reads=['data.acquisition_source', 'data.arxiv_eprints', 'data.documents'],
+            writes=['data.documents'],
+        ),
+        Step(
             arxiv_package_download,
+            condition=is_arxiv_paper,
+            reads=['data.acquisition_source', 'data.arxiv_eprints'],
+            writes=['files'],
+        ),
+        Step(
             arxiv_plot_extract,
+            condition=is_arxiv_paper,
+            reads=['data.acquisition_source', 'data.arxiv_eprints', 'data.figures', 'files'],
+            writes=['data.figures', 'files'],
+        ),
+        Step(
             arxiv_derive_inspire_categories,
+            condition=is_arxiv_paper,
+            reads=['data.acquisition_source', 'data.arxiv_eprints', 'data.inspire_categories'],
+            writes=['data.inspire_categories'],
+        ),
+        Step(
             arxiv_author_list("authorlist2marcxml.xsl"),
-        ]
-    ),
-    IF(
-        is_submission,
-        populate_submission_document,
-    ),
-    download_documents,
-    normalize_journal_titles,
-    refextract,
-    count_reference_coreness,
-    extract_journal_info,
-    populate_journal_coverage,
-    classify_paper(
-        only_core_tags=False,
-        spires=True,
-        with_author_keywords=True,
-    ),
-    filter_core_keywords,
-    guess_categories,
-    IF(
-        is_experimental_paper,
-        guess_experiments,
+            condition=is_arxiv_paper,
+            reads=['data.acquisition_source', 'data.arxiv_eprints', 'data.authors', 'files'],
+            writes=['data.authors'],
+        ),
+        Step(
+            populate_submission_document,
+            condition=is_submission,
+            reads=['data.acquisition_source', 'data.documents', 'extra_data.submission_pdf'],
+            writes=['data.documents'],
+        ),
+        Step(
+            download_documents,
+            reads=['data.documents'],
+            writes=['data.documents', 'files'],
+        ),
+        Step(
+            normalize_journal_titles,
+            reads=['data.publication_info'],
+            writes=['data.publication_info'],
+        ),
+        Step(
+            refextract,
+            reads=['data.documents', 'data.references', 'files'],
+            writes=['data.references'],
+        ),
+        Step(
+            count_reference_coreness,
+            reads=['data.references'],
+            writes=['extra_data.reference_count'],
+        ),
+        Step(
+            extract_journal_info,
+            reads=['data.publication_info'],
+            writes=['data.publication_info'],
+        ),
+        Step(
+            populate_journal_coverage,
+            reads=['data.publication_info'],
+            writes=['extra_data.journal_coverage'],
+        ),
+        Step(
+            classify_paper(
+                only_core_tags=False,
+                spires=True,
+                with_author_keywords=True,
+            ),
+            reads=['data.abstracts', 'data.documents', 'data.keywords', 'data.titles', 'files'],
+            writes=['extra_data.classifier_results'],
+        ),
+        Step(
+            filter_core_keywords,
+            reads=['extra_data.classifier_results'],
+            writes=['extra_data.classifier_results'],
+        ),
+        Step(
+            guess_categories,
+            reads=['data.abstracts', 'data.titles'],
+            writes=['extra_data.categories_prediction'],
+            in_thread=True,
+        ),
+        Step(
+            guess_experiments,
+            condition=is_experimental_paper,
+            reads=['data.abstracts', 'data.arxiv_eprints', 'data.inspire_categories', 'data.titles'],
+            writes=['extra_data.experiments_prediction'],
+            in_thread=True,
+        ),
+        Step(
+            guess_keywords,
+            reads=['data.abstracts', 'data.titles'],
+            writes=['extra_data.keywords_prediction'],
+            in_thread=True,
+        ),
+        Step(
+            guess_coreness,
+            reads=['data.abstracts', 'data.arxiv_eprints', 'data.titles'],
+            writes=['extra_data.relevance_prediction'],
+            in_thread=True,
+        ),
     ),
-    guess_keywords,
-    guess_coreness,
 ]
 
 
@@ -514,7 +590,7 @@ class Article(object):
     name = "HEP"
     data_type = "hep"
 
-    workflow = (
+    workflow = trace_steps(
         PRE_PROCESSING +
         NOTIFY_IF_SUBMISSION +
         MARK_IF_MATCH_IN_HOLDINGPEN +
@@ -543,5 +619,6 @@ class Article(object):
                     close_ticket(ticket_id_key="ticket_id")
                 ),
             )
-        ]
+        ],
+        'article',
     )
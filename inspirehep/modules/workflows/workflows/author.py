@@ -51,6 +51,7 @@ from inspirehep.modules.authors.tasks import (
     update_ticket_context,
 )
 from inspirehep.modules.workflows.utils import do_not_repeat
+from inspirehep.modules.workflows.utils.tracing import trace_steps
 
 
 SEND_TO_LEGACY = [
@@ -140,7 +141,7 @@ class Author(object):
     name = "Author"
     data_type = "authors"
 
-    workflow = [
+    workflow = trace_steps([
         load_from_source_data,
         # Make sure schema is set for proper indexing in Holding Pen
         set_schema,
@@ -167,4 +168,4 @@ class Author(object):
                 ),
             ],
         ),
-    ]
+    ], 'author')
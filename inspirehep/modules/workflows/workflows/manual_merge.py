@@ -30,6 +30,7 @@ from inspirehep.modules.workflows.tasks.manual_merging import (
     save_roots,
     store_records,
 )
+from inspirehep.modules.workflows.utils.tracing import trace_steps
 from inspirehep.utils.record import get_source
 from inspirehep.utils.record_getter import get_db_record
 
@@ -38,12 +39,12 @@ class ManualMerge(object):
     name = 'MERGE'
     data_type = ''
 
-    workflow = ([
+    workflow = trace_steps([
         merge_records,
         halt_for_merge_approval,
         save_roots,
         store_records,
-    ])
+    ], 'manual_merge')
 
 
 def start_merger(head_id, update_id, current_user_id=None):
@@ -272,8 +272,9 @@ def get_title(record):
     return get_value(record, 'titles.title[0]', default='')
 
 
-def create_index_op(record, version_type='external_gte'):
-    index, doc_type = current_record_to_index(record)
+def create_index_op(record, version_type='external_gte', index=None):
+    record_index, doc_type = current_record_to_index(record)
+    index = index or record_index
 
     return {
         '_op_type': 'index',
@@ -24,14 +24,12 @@ from __future__ import absolute_import, division, print_function
 
 from contextlib import contextmanager
 
-from flask import current_app
-
 from inspire_schemas.api import ReferenceBuilder
 from inspire_utils.helpers import force_list
 
+from inspirehep.modules.refextract.utils import journal_kb_cache
 from inspirehep.utils.jinja2 import render_template_to_string
 from inspirehep.utils.record_getter import get_es_records
-from inspirehep.utils.url import retrieve_uri
 
 
 def get_and_format_references(record):
@@ -124,8 +122,9 @@ def map_refextract_to_schema(extracted_references, source=None):
 
 @contextmanager
 def local_refextract_kbs_path():
-    """Get the path to the temporary refextract kbs from the application config.
+    """Get the paths to the local copies of the refextract kbs.
+
+    The copies are shared by all the calls in a worker, so that refextract
+    parses each version of the kbs only once.
     """
-    journal_kb_path = current_app.config.get('REFEXTRACT_JOURNAL_KB_PATH')
-    with retrieve_uri(journal_kb_path) as temp_journal_kb_path:
-        yield {'journals': temp_journal_kb_path}
+    yield {'journals': journal_kb_cache.get_path()}
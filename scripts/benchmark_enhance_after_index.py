@@ -0,0 +1,83 @@
+"""
+BENCHMARK THE ENRICHMENT OF LARGE COLLABORATION RECORDS.
+
+This snippet measures the time spent by ``enhance_after_index`` on a
+synthetic Literature record with thousands of authors, such as the ATLAS
+and CMS papers, and compares the recursive walk of ``populate_recid_from_ref``
+with the walk of the reference fields of the schema. It must be run in
+``inspirehep shell``.
+
+Example:
+    >>> benchmark_enhance_after_index(num_authors=3000, repeat=5)
+"""
+
+from __future__ import print_function
+
+from copy import deepcopy
+from timeit import repeat as timeit_repeat
+
+from inspirehep.modules.records.receivers import (
+    enhance_after_index,
+    get_ref_fields,
+    populate_recid_from_ref,
+    populate_recid_from_ref_fields,
+)
+
+
+def make_record(num_authors, num_references=500):
+    return {
+        '$schema': 'http://localhost:5000/schemas/records/hep.json',
+        'authors': [
+            {
+                'affiliations': [
+                    {
+                        'record': {'$ref': 'http://localhost:5000/api/institutions/902725'},
+                        'value': 'CERN',
+                    },
+                ],
+                'full_name': u'Author{}, Jos\xe9'.format(i),
+                'raw_affiliations': [
+                    {'value': 'CERN, European Organization for Nuclear Research, Geneva'},
+                ],
+                'record': {'$ref': 'http://localhost:5000/api/authors/{}'.format(i)},
+            } for i in range(num_authors)
+        ],
+        'control_number': 1,
+        'document_type': ['article'],
+        'preprint_date': '2018-01-01',
+        'references': [
+            {
+                'record': {'$ref': 'http://localhost:5000/api/literature/{}'.format(i)},
+                'reference': {
+                    'authors': [{'full_name': 'Smith, J.'}],
+                    'title': {'title': 'A reference'},
+                },
+            } for i in range(num_references)
+        ],
+        'titles': [{'title': 'A large collaboration paper'}],
+    }
+
+
+def _populate_recids_recursively(json):
+    populate_recid_from_ref(None, json)
+
+
+def _populate_recids_from_schema(json):
+    populate_recid_from_ref_fields(json, get_ref_fields('hep'))
+
+
+def _enhance(json):
+    enhance_after_index(None, json, record=None)
+
+
+def benchmark_enhance_after_index(num_authors=3000, repeat=5):
+    record = make_record(num_authors)
+
+    for name, enhance in (
+        ('recursive reference walk', _populate_recids_recursively),
+        ('schema reference walk', _populate_recids_from_schema),
+        ('enhance_after_index', _enhance),
+    ):
+        timings = timeit_repeat(
+            lambda: enhance(deepcopy(record)), number=1, repeat=repeat)
+        print('{}: {:.3f}s (best of {})'.format(name, min(timings), repeat))
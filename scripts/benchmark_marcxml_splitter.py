@@ -0,0 +1,49 @@
+"""
+BENCHMARK THE MARCXML SPLITTERS.
+
+This snippet compares the throughput of ``split_stream``, which decodes every
+line and re-scans the buffer with a regular expression, with the one of
+``split_records``, which scans chunks of bytes only once and extracts the
+recid while splitting. The recid extraction is included in both timings, as
+it is needed to populate the mirror. It must be run in ``inspirehep shell``.
+
+Example:
+    >>> benchmark_marcxml_splitter('/path/to/prodsync.tar')
+"""
+
+from __future__ import division, print_function
+
+import time
+
+from inspirehep.modules.migrator.models import LegacyRecordsMirror
+from inspirehep.modules.migrator.tasks import (
+    READ_CHUNK_SIZE,
+    read_file,
+    split_records,
+    split_stream,
+)
+
+
+def _split_with_split_stream(source):
+    for raw_record in split_stream(read_file(source)):
+        match = LegacyRecordsMirror.re_recid.search(raw_record)
+        yield int(match.group('recid')) if match else None, raw_record
+
+
+def _split_with_split_records(source):
+    return split_records(read_file(source, chunk_size=READ_CHUNK_SIZE))
+
+
+def benchmark_marcxml_splitter(source):
+    for name, split in (
+        ('split_stream', _split_with_split_stream),
+        ('split_records', _split_with_split_records),
+    ):
+        start = time.time()
+        records = size = 0
+        for _, raw_record in split(source):
+            records += 1
+            size += len(raw_record)
+        elapsed = time.time() - start
+        print('{}: {} records in {:.2f}s ({:.0f} records/s, {:.1f} MB/s)'.format(
+            name, records, elapsed, records / elapsed, size / elapsed / 1e6))
@@ -0,0 +1,44 @@
+"""
+BENCHMARK THE PID TYPE LOOKUPS.
+
+This snippet compares the cost of resolving a ``pid_type`` from a schema URL
+by iterating ``RECORDS_REST_ENDPOINTS``, as it used to be done on every call,
+with the cost of the same lookup through the ``PidTypeRegistry`` computed at
+application initialization. It must be run in ``inspirehep shell``.
+
+Example:
+    >>> benchmark_pid_type_registry(number=100000)
+"""
+
+from __future__ import print_function
+
+from timeit import timeit
+
+from flask import current_app
+from six import iteritems
+from six.moves.urllib.parse import urlsplit
+
+from inspirehep.modules.pidstore.utils import get_pid_type_from_schema
+
+SCHEMA = 'http://localhost:5000/schemas/records/authors.json'
+
+
+def _get_pid_type_from_schema_without_registry(schema):
+    pid_type_endpoint_map = {}
+    for key, value in iteritems(current_app.config['RECORDS_REST_ENDPOINTS']):
+        if value.get('default_endpoint_prefix'):
+            pid_type_endpoint_map[value['pid_type']] = key
+
+    endpoint_pid_type_map = {v: k for k, v in iteritems(pid_type_endpoint_map)}
+    schema_name = urlsplit(schema).path.split('/')[-1].split('.')[0]
+
+    return endpoint_pid_type_map[schema_name]
+
+
+def benchmark_pid_type_registry(number=100000):
+    for name, lookup in (
+        ('without registry', _get_pid_type_from_schema_without_registry),
+        ('with registry', get_pid_type_from_schema),
+    ):
+        seconds = timeit(lambda: lookup(SCHEMA), number=number)
+        print('{}: {:.2f}us per call'.format(name, seconds / number * 1e6))
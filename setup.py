@@ -93,7 +93,7 @@ install_requires = [
     'invenio-records-ui~=1.0,>=1.0.0',
     'invenio-records~=1.0,>=1.0.0',
     'invenio-rest~=1.0,>=1.0.0',
-    'invenio-search[elasticsearch5]~=1.0,>=1.0.0',
+    'invenio-search[elasticsearch5]~=1.0,>=1.0.2',
     'invenio-userprofiles~=1.0,>=1.0.0',
     'invenio-workflows-files~=1.0,>=1.0.0',
     'invenio-workflows-ui~=2.0,>=2.0.11',
@@ -122,6 +122,7 @@ install_requires = [
     # from python-requests (<1.23) (https://travis-ci.org/inspirehep/inspire-next/builds/388221674)
     'urllib3~=1.0,<1.23',
     'workflow~=2.0,>=2.1.3',
+    'zstandard~=0.0,>=0.9.1',
 ]
 
 docs_require = [
@@ -217,6 +218,7 @@ setup(
             'requirejs = inspirehep.modules.theme.bundles:requirejs',
         ],
         'invenio_base.api_apps': [
+            'inspire_pidstore = inspirehep.modules.pidstore:InspirePidStore',
             'inspire_records = inspirehep.modules.records.ext:InspireRecords',
             'inspire_search = inspirehep.modules.search:InspireSearch',
             'inspire_utils = inspirehep.utils.ext:INSPIREUtils',
@@ -237,6 +239,7 @@ setup(
             'inspire_hal = inspirehep.modules.hal:InspireHAL',
             'inspire_literaturesuggest = inspirehep.modules.literaturesuggest:InspireLiteratureSuggest',
             'inspire_migrator = inspirehep.modules.migrator:InspireMigrator',
+            'inspire_pidstore = inspirehep.modules.pidstore:InspirePidStore',
             'inspire_records = inspirehep.modules.records.ext:InspireRecords',
             'inspire_search = inspirehep.modules.search:InspireSearch',
             'inspire_theme = inspirehep.modules.theme:INSPIRETheme',
@@ -258,6 +261,7 @@ setup(
             'inspirehep = inspirehep:alembic',
         ],
         'invenio_db.models': [
+            'inspire_records = inspirehep.modules.records.models',
             'inspire_workflows_audit = inspirehep.modules.workflows.models',
         ],
         'invenio_jsonschemas.schemas': [
@@ -23,6 +23,10 @@
 from __future__ import absolute_import, division, print_function
 
 import pytest
+from mock import patch
+
+from invenio_db import db
+from jsonschema import ValidationError
 
 from inspirehep.modules.migrator.models import LegacyRecordsMirror
 
@@ -78,3 +82,55 @@ def test_inspire_prod_records_error():
     record.error = error
 
     assert record.error == u'ValueError: This is an error with ùnicode'
+
+
+def test_inspire_prod_records_error_signature_groups_validation_errors_by_schema_path():
+    record = LegacyRecordsMirror(recid='12345', _marcxml='<record></record>', collection='HEP')
+    first = ValidationError(u'First', schema_path=['properties', 'titles', 'minItems'])
+    second = ValidationError(u'Second', schema_path=['properties', 'titles', 'minItems'])
+    other = ValidationError(u'Other', schema_path=['properties', 'authors', 'type'])
+
+    record.error = first
+    first_signature = record.error_signature
+
+    record.error = second
+    assert record.error_signature == first_signature
+
+    record.error = other
+    assert record.error_signature != first_signature
+
+    record.error = ValueError(u'Not a validation error')
+    assert record.error_signature != first_signature
+    assert record.collection == 'HEP'
+
+
+def test_inspire_prod_records_count_errors(isolated_app):
+    for recid, error in enumerate(
+        [ValueError(u'First'), ValueError(u'Second'), KeyError(u'Third')], start=12345
+    ):
+        record = LegacyRecordsMirror(recid=recid, _marcxml='<record></record>', collection='HEP')
+        record.error = error
+        db.session.add(record)
+    db.session.flush()
+
+    result = LegacyRecordsMirror.count_errors(limit=1)
+
+    assert result == [(LegacyRecordsMirror.get_error_signature(ValueError()), 2, u'ValueError: First')]
+
+
+def test_inspire_prod_records_marcxml_is_decompressed_once():
+    raw_record = b'<record><controlfield tag="001">12345</controlfield></record>'
+    record = LegacyRecordsMirror(recid=12345)
+    record._marcxml = LegacyRecordsMirror.from_marcxml(raw_record)._marcxml
+
+    with patch(
+        'inspirehep.modules.migrator.models.decompress_marcxml',
+        return_value=raw_record,
+    ) as mock_decompress:
+        assert record.marcxml == raw_record
+        assert record.marcxml == raw_record
+
+        record.marcxml = raw_record.replace(b'12345', b'12346')
+        assert record.marcxml == raw_record.replace(b'12345', b'12346')
+
+    mock_decompress.assert_called_once()
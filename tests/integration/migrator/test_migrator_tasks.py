@@ -22,7 +22,7 @@
 
 from __future__ import absolute_import, division, print_function
 
-import uuid
+import zlib
 from mock import patch
 
 import os
@@ -30,14 +30,25 @@ import pkg_resources
 import pytest
 
 from invenio_db import db
-from invenio_pidstore.models import PersistentIdentifier
+from invenio_pidstore.models import PersistentIdentifier, RecordIdentifier
 
+from inspirehep.modules.migrator.compression import ZLIB_HEADER, ZSTD_HEADER
 from inspirehep.modules.migrator.models import LegacyRecordsMirror
 from inspirehep.modules.migrator.tasks import (
-    _build_recid_to_uuid_map,
+    convert_mirror_records,
+    SKIPPED,
+    _migrate_recids_locally,
     migrate_from_file,
+    migrate_from_mirror,
     migrate_and_insert_record,
+    mark_unchanged_records_as_migrated,
+    populate_mirror_from_file_in_parallel,
+    store_converted_records,
+    recompress_mirror,
+    upsert_into_mirror,
 )
+from inspirehep.modules.pidstore.providers.recid import InspireRecordIdProvider
+from inspirehep.modules.records.api import InspireRecord
 
 
 @pytest.fixture
@@ -54,40 +65,6 @@ def cleanup():
     assert LegacyRecordsMirror.query.filter(LegacyRecordsMirror.recid == 12345).count() == 0
 
 
-def test_build_recid_to_uuid_map_numeric_pid_allowed_for_lit_and_con(isolated_app):
-    pid1 = PersistentIdentifier.create(pid_type='lit', pid_value='123',
-                                       object_type='rec', object_uuid=uuid.uuid4())
-    pid2 = PersistentIdentifier.create(pid_type='con', pid_value='1234',
-                                       object_type='rec', object_uuid=uuid.uuid4())
-    citations_lookup = {
-        pid1.pid_value: 5,
-        pid2.pid_value: 6,
-    }
-    result = _build_recid_to_uuid_map(citations_lookup)
-    assert result.keys().sort() == [pid1.object_uuid, pid2.object_uuid].sort()
-
-
-def test_build_recid_to_uuid_map_numeric_pid_breaks_for_lit(isolated_app):
-    pid1 = PersistentIdentifier.create(pid_type='lit', pid_value='abcdef',
-                                       object_type='rec', object_uuid=uuid.uuid4())
-    citations_lookup = {
-        pid1.pid_value: 5,
-    }
-    with pytest.raises(ValueError):
-        _build_recid_to_uuid_map(citations_lookup)
-
-
-def test_build_recid_to_uuid_map_ignored_types(isolated_app):
-    citations_lookup = {}
-    for type in ('urn', 'tex', 'cust'):
-        pid = PersistentIdentifier.create(
-            pid_type=type, pid_value='abcd', object_type='rec',
-            object_uuid=uuid.uuid4())
-        citations_lookup[pid.pid_value] = 6
-    result = _build_recid_to_uuid_map(citations_lookup)
-    assert result == {}
-
-
 @patch('inspirehep.modules.migrator.tasks.LOGGER')
 def test_migrate_and_insert_record_valid_record(mock_logger, isolated_app):
     raw_record = (
@@ -196,3 +173,250 @@ def test_orcid_push_disabled_on_migrate_from_mirror(app, cleanup, enable_orcid_p
     assert prod_record.valid
 
     assert app.config['FEATURE_FLAG_ENABLE_ORCID_PUSH']
+
+
+def test_upsert_into_mirror_inserts_and_resets_updated_records(isolated_app):
+    first = b'<record><controlfield tag="001">12345</controlfield><datafield tag="245"/></record>'
+    second = b'<record><controlfield tag="001">12345</controlfield><datafield tag="246"/></record>'
+
+    upsert_into_mirror([{'recid': 12345, 'marcxml': zlib.compress(first), 'collection': 'HEP'}])
+    prod_record = LegacyRecordsMirror.query.get(12345)
+    prod_record.valid = True
+    db.session.commit()
+
+    upsert_into_mirror([{'recid': 12345, 'marcxml': zlib.compress(second), 'collection': 'HEP'}])
+    db.session.expire_all()
+    prod_record = LegacyRecordsMirror.query.get(12345)
+
+    assert prod_record.marcxml == second
+    assert prod_record.valid is None
+
+
+def test_populate_mirror_from_file_in_parallel(isolated_app):
+    file_name = pkg_resources.resource_filename(__name__, os.path.join('fixtures', '1663923.xml'))
+
+    populate_mirror_from_file_in_parallel(file_name, workers=2)
+
+    prod_record = LegacyRecordsMirror.query.get(1663923)
+
+    assert prod_record.valid is None
+    assert b'1663923' in prod_record.marcxml
+
+
+def _insert_into_mirror(raw_records):
+    prod_records = [LegacyRecordsMirror.from_marcxml(raw_record) for raw_record in raw_records]
+    for prod_record in prod_records:
+        db.session.add(prod_record)
+    db.session.flush()
+    return prod_records
+
+
+@patch('inspirehep.modules.migrator.tasks.LOGGER')
+def test_store_converted_records(mock_logger, isolated_app):
+    valid = (
+        '<record>'
+        '  <controlfield tag="001">12345</controlfield>'
+        '  <datafield tag="245" ind1=" " ind2=" ">'
+        '    <subfield code="a">On the validity of INSPIRE records</subfield>'
+        '  </datafield>'
+        '  <datafield tag="980" ind1=" " ind2=" ">'
+        '    <subfield code="a">HEP</subfield>'
+        '  </datafield>'
+        '</record>'
+    )
+    invalid = (
+        '<record>'
+        '  <controlfield tag="001">12346</controlfield>'
+        '  <datafield tag="980" ind1=" " ind2=" ">'
+        '    <subfield code="a">HEP</subfield>'
+        '  </datafield>'
+        '</record>'
+    )
+    prod_records = _insert_into_mirror([valid, invalid])
+
+    with patch.object(InspireRecordIdProvider, 'create') as mock_create:
+        records = store_converted_records(convert_mirror_records(prod_records))
+
+    assert not mock_create.called
+    assert [record['control_number'] for record in records] == [12345]
+    assert RecordIdentifier.query.get(12345)
+    assert prod_records[0].valid is True
+    assert prod_records[1].valid is False
+
+    pid = PersistentIdentifier.get('lit', 12345)
+    assert pid.object_uuid == records[0].id
+    assert mock_logger.error.called
+
+    updated = valid.replace('On the validity', 'On the updates')
+    prod_records[0].marcxml = updated
+
+    with patch.object(PersistentIdentifier, 'get', wraps=PersistentIdentifier.get) as mock_get:
+        records = store_converted_records(convert_mirror_records(prod_records[:1]))
+
+    assert not mock_get.called
+    assert records[0].id == pid.object_uuid
+    assert InspireRecord.get_record(pid.object_uuid)['titles'] == [
+        {'title': 'On the updates of INSPIRE records'},
+    ]
+
+
+@patch('inspirehep.modules.migrator.tasks.LOGGER')
+def test_store_converted_records_stores_one_at_a_time_if_the_bulk_insert_fails(mock_logger, isolated_app):
+    raw_record = (
+        '<record>'
+        '  <controlfield tag="001">12347</controlfield>'
+        '  <datafield tag="245" ind1=" " ind2=" ">'
+        '    <subfield code="a">On the bulk insert of INSPIRE records</subfield>'
+        '  </datafield>'
+        '  <datafield tag="980" ind1=" " ind2=" ">'
+        '    <subfield code="a">HEP</subfield>'
+        '  </datafield>'
+        '</record>'
+    )
+    prod_records = _insert_into_mirror([raw_record])
+
+    with patch.object(InspireRecordIdProvider, 'register_many', side_effect=Exception):
+        records = store_converted_records(convert_mirror_records(prod_records))
+
+    mock_logger.exception.assert_called_once_with('Migrator Bulk Insert Error')
+    assert [record['control_number'] for record in records] == [12347]
+    assert prod_records[0].valid is True
+    assert PersistentIdentifier.get('lit', 12347).object_uuid == records[0].id
+
+
+@patch('inspirehep.modules.migrator.tasks.LOGGER')
+def test_convert_mirror_records_marks_dojson_errors(mock_logger, isolated_app):
+    raw_record = (
+        '<record>'
+        '  <controlfield tag="001">12345</controlfield>'
+        '  <datafield tag="260" ind1=" " ind2=" ">'
+        '    <subfield code="c">Definitely not a date</subfield>'
+        '  </datafield>'
+        '  <datafield tag="980" ind1=" " ind2=" ">'
+        '    <subfield code="a">HEP</subfield>'
+        '  </datafield>'
+        '</record>'
+    )
+    prod_records = _insert_into_mirror([raw_record])
+
+    assert convert_mirror_records(prod_records) == []
+    assert prod_records[0].valid is False
+    assert prod_records[0].error
+    mock_logger.exception.assert_called_once_with('Migrator DoJSON Error')
+
+
+@patch('inspirehep.modules.migrator.tasks.LOGGER')
+def test_migrate_and_insert_record_skips_unchanged_records(mock_logger, isolated_app):
+    raw_record = (
+        '<record>'
+        '  <controlfield tag="001">12345</controlfield>'
+        '  <datafield tag="245" ind1=" " ind2=" ">'
+        '    <subfield code="a">On the validity of INSPIRE records</subfield>'
+        '  </datafield>'
+        '  <datafield tag="980" ind1=" " ind2=" ">'
+        '    <subfield code="a">HEP</subfield>'
+        '  </datafield>'
+        '</record>'
+    )
+
+    assert migrate_and_insert_record(raw_record) is not SKIPPED
+    assert migrate_and_insert_record(raw_record) is SKIPPED
+
+    updated = raw_record.replace('On the validity', 'On the updates')
+
+    assert migrate_and_insert_record(updated) is not SKIPPED
+
+    prod_record = LegacyRecordsMirror.query.get(12345)
+    assert prod_record.valid is True
+    assert prod_record.migrated_hash == LegacyRecordsMirror.hash_marcxml(updated)
+
+
+@patch('inspirehep.modules.migrator.tasks.migrate_recids_from_mirror')
+def test_migrate_from_mirror_skips_unchanged_records(mock_migrate, isolated_app):
+    unchanged = LegacyRecordsMirror.from_marcxml(b'<record><controlfield tag="001">12345</controlfield></record>')
+    unchanged.mark_as_migrated()
+    unchanged.valid = None
+    changed = LegacyRecordsMirror.from_marcxml(b'<record><controlfield tag="001">12346</controlfield></record>')
+    db.session.add_all([unchanged, changed])
+    db.session.commit()
+
+    migrate_from_mirror()
+
+    assert LegacyRecordsMirror.query.get(12345).valid is True
+    migrated_recids = [
+        recid for call in mock_migrate.delay.call_args_list for recid in call[0][0]
+    ]
+    assert 12345 not in migrated_recids
+    assert 12346 in migrated_recids
+
+
+def test_mark_unchanged_records_as_migrated(isolated_app):
+    unchanged = LegacyRecordsMirror.from_marcxml(b'<record><controlfield tag="001">12345</controlfield></record>')
+    unchanged.mark_as_migrated()
+    unchanged.valid = None
+    changed = LegacyRecordsMirror.from_marcxml(b'<record><controlfield tag="001">12346</controlfield></record>')
+    db.session.add_all([unchanged, changed])
+    db.session.commit()
+
+    assert mark_unchanged_records_as_migrated() == 1
+
+    db.session.expire_all()
+    assert LegacyRecordsMirror.query.get(12345).valid is True
+    assert LegacyRecordsMirror.query.get(12346).valid is None
+
+
+@patch('inspirehep.modules.migrator.tasks.LOGGER')
+def test_migrate_recids_locally_returns_failures(mock_logger, isolated_app):
+    valid = LegacyRecordsMirror.from_marcxml(
+        b'<record>'
+        b'  <controlfield tag="001">12345</controlfield>'
+        b'  <datafield tag="245" ind1=" " ind2=" ">'
+        b'    <subfield code="a">On the validity of INSPIRE records</subfield>'
+        b'  </datafield>'
+        b'  <datafield tag="980" ind1=" " ind2=" ">'
+        b'    <subfield code="a">HEP</subfield>'
+        b'  </datafield>'
+        b'</record>'
+    )
+    broken = LegacyRecordsMirror.from_marcxml(
+        b'<record>'
+        b'  <controlfield tag="001">12346</controlfield>'
+        b'  <datafield tag="260" ind1=" " ind2=" ">'
+        b'    <subfield code="c">Definitely not a date</subfield>'
+        b'  </datafield>'
+        b'  <datafield tag="980" ind1=" " ind2=" ">'
+        b'    <subfield code="a">HEP</subfield>'
+        b'  </datafield>'
+        b'</record>'
+    )
+    db.session.add_all([valid, broken])
+    db.session.commit()
+
+    migrated, failures = _migrate_recids_locally(([12345, 12346], False))
+
+    assert migrated == 2
+    assert [recid for recid, _ in failures] == [12346]
+    assert failures[0][1]
+    assert LegacyRecordsMirror.query.get(12345).valid is True
+
+
+def test_recompress_mirror(isolated_app):
+    raw_record = b'<record><controlfield tag="001">12345</controlfield></record>'
+    zlib_record = LegacyRecordsMirror.from_marcxml(raw_record)
+    legacy_record = LegacyRecordsMirror(recid=12346, _marcxml=ZLIB_HEADER + zlib.compress(raw_record))
+    db.session.add_all([zlib_record, legacy_record])
+    db.session.commit()
+    last_updated = LegacyRecordsMirror.query.get(12345).last_updated
+
+    assert recompress_mirror() == 1
+
+    with patch.dict(isolated_app.config, {'MIGRATOR_MARCXML_CODEC': 'zstd'}):
+        assert recompress_mirror(batch_size=1) == 2
+        assert recompress_mirror() == 0
+
+    db.session.expire_all()
+    for recid in (12345, 12346):
+        prod_record = LegacyRecordsMirror.query.get(recid)
+        assert prod_record._marcxml[:1] == ZSTD_HEADER
+        assert prod_record.marcxml == raw_record
+    assert LegacyRecordsMirror.query.get(12345).last_updated == last_updated
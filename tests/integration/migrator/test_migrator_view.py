@@ -146,3 +146,73 @@ def test_get_returns_permission_denied_if_not_logged_in_as_privileged_user(isola
     )
 
     assert response.status_code == 403
+
+
+def test_get_stats_returns_the_most_frequent_errors_first(
+        isolated_api_client,
+        isolated_log_in_as_cataloger,
+):
+    TestLegacyRecordsMirror.create_from_file(__name__, '1674997.xml', collection='HEP',
+                                             _errors='Error: Rare error.', valid=False,
+                                             error_signature='rare')
+    TestLegacyRecordsMirror.create_from_file(__name__, '1674989.xml', collection='HEP',
+                                             _errors='Error: B frequent error.', valid=False,
+                                             error_signature='frequent')
+    TestLegacyRecordsMirror.create_from_file(__name__, '1674987.xml', collection='HEPNAMES',
+                                             _errors='Error: A frequent error.', valid=False,
+                                             error_signature='frequent')
+
+    response = isolated_api_client.get(
+        '/migrator/errors/stats?limit=5',
+        content_type='application/json',
+    )
+
+    expected_data = {
+        'data': [
+            {
+                'signature': 'frequent',
+                'count': 2,
+                'error': 'Error: A frequent error.',
+            },
+            {
+                'signature': 'rare',
+                'count': 1,
+                'error': 'Error: Rare error.',
+            },
+        ]
+    }
+
+    response_data = json.loads(response.data)
+
+    assert response.status_code == 200
+    assert expected_data == response_data
+
+
+def test_get_stats_counts_the_errors_without_signature_together(
+        isolated_api_client,
+        isolated_log_in_as_cataloger,
+):
+    TestLegacyRecordsMirror.create_from_file(__name__, '1674997.xml', collection='HEP',
+                                             _errors='Error: Old error.', valid=False)
+    TestLegacyRecordsMirror.create_from_file(__name__, '1674989.xml', collection='HEP',
+                                             _errors='Error: Other old error.', valid=False)
+
+    response = isolated_api_client.get(
+        '/migrator/errors/stats',
+        content_type='application/json',
+    )
+
+    expected_data = {
+        'data': [
+            {
+                'signature': None,
+                'count': 2,
+                'error': 'Error: Old error.',
+            },
+        ]
+    }
+
+    response_data = json.loads(response.data)
+
+    assert response.status_code == 200
+    assert expected_data == response_data
@@ -27,11 +27,14 @@ import os
 from tempfile import NamedTemporaryFile
 import pytest
 
+from invenio_db import db
 from invenio_pidstore.models import PersistentIdentifier, RecordIdentifier
 from jsonschema import ValidationError
 from six.moves.urllib.parse import quote
 
 from inspirehep.modules.records.api import InspireRecord
+from inspirehep.modules.records.models import RecordCitations
+from inspirehep.modules.records.tasks import populate_records_citations
 from inspirehep.utils.record_getter import get_db_record
 from factories.db.invenio_records import TestRecordMetadata
 
@@ -111,3 +114,50 @@ def test_citations_count_non_zero(isolated_app):
     TestRecordMetadata.create_from_kwargs(json=ref)
 
     assert record_1.get_citations_count() == 1L
+
+
+def test_citations_count_is_updated_when_references_change(isolated_app):
+    record_json = {
+        'control_number': 321,
+    }
+    record_1 = TestRecordMetadata.create_from_kwargs(json=record_json).inspire_record
+
+    ref = {'control_number': 4321, 'references': [{'record': {'$ref': record_1._get_ref()}}]}
+    citing_record = TestRecordMetadata.create_from_kwargs(json=ref).record_metadata
+
+    assert record_1.get_citations_count() == 1L
+
+    citing_record.json = {'control_number': 4321, 'references': []}
+    db.session.flush()
+
+    assert record_1.get_citations_count() == 0L
+
+
+def test_populate_records_citations(isolated_app):
+    record_json = {
+        'control_number': 321,
+    }
+    record_1 = TestRecordMetadata.create_from_kwargs(json=record_json).inspire_record
+
+    ref = {'control_number': 4321, 'references': [{'record': {'$ref': record_1._get_ref()}}]}
+    TestRecordMetadata.create_from_kwargs(json=ref)
+    RecordCitations.query.delete()
+
+    assert record_1.get_citations_count() == 0L
+
+    assert populate_records_citations() == 1
+    assert record_1.get_citations_count() == 1L
+
+
+def test_get_records_bulk_prefetches_citations_counts(isolated_app):
+    cited = TestRecordMetadata.create_from_kwargs(json={'control_number': 321})
+    ref = {'control_number': 4321, 'references': [{'record': {'$ref': cited.inspire_record._get_ref()}}]}
+    citing = TestRecordMetadata.create_from_kwargs(json=ref)
+
+    records = InspireRecord.get_records_bulk([
+        str(cited.record_metadata.id),
+        str(citing.record_metadata.id),
+    ])
+    counts = {record['control_number']: record._citations_count for record in records}
+
+    assert counts == {321: 1, 4321: 0}
@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of INSPIRE.
+# Copyright (C) 2018 CERN.
+#
+# INSPIRE is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# INSPIRE is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with INSPIRE. If not, see <http://www.gnu.org/licenses/>.
+#
+# In applying this license, CERN does not waive the privileges and immunities
+# granted to it by virtue of its status as an Intergovernmental Organization
+# or submit itself to any jurisdiction.
+
+
+from __future__ import absolute_import, division, print_function
+
+from inspirehep.modules.records.tasks import get_citation_count_update_ops
+
+from factories.db.invenio_records import TestRecordMetadata
+
+
+def test_get_citation_count_update_ops(isolated_app):
+    cited = TestRecordMetadata.create_from_kwargs(json={'control_number': 321})
+    ref = {'control_number': 4321, 'references': [{'record': {'$ref': cited.inspire_record._get_ref()}}]}
+    TestRecordMetadata.create_from_kwargs(json=ref)
+
+    result = list(get_citation_count_update_ops([('lit', '321'), ('lit', '4321')]))
+    op = next(op for op in result if op['_id'] == str(cited.record_metadata.id))
+
+    assert op['_op_type'] == 'index'
+    assert op['_index'] == 'records-hep'
+    assert op['_type'] == 'hep'
+    assert op['_version'] == cited.inspire_record.revision_id
+    assert op['_version_type'] == 'external_gte'
+    assert op['_source']['citation_count'] == 1
+    assert len(result) == 2
@@ -32,6 +32,33 @@ def test_downgrade(isolated_app):
     alembic = Alembic(isolated_app)
     alembic.upgrade()
 
+    # downgrade e4d2b8a6c1f7 == downgrade to c5a9e2d7f3b1
+
+    alembic.downgrade(target='c5a9e2d7f3b1')
+    assert 'workflows_step_timing' in _get_table_names()
+
+    # downgrade c5a9e2d7f3b1 == downgrade to b3e8d5f2a1c4
+
+    alembic.downgrade(target='b3e8d5f2a1c4')
+    assert 'workflows_step_timing' not in _get_table_names()
+
+    # downgrade b3e8d5f2a1c4 == downgrade to a7f1d3c5e9b2
+
+    alembic.downgrade(target='a7f1d3c5e9b2')
+    assert 'content_hash' not in _get_column_names('legacy_records_mirror')
+    assert 'migrated_hash' not in _get_column_names('legacy_records_mirror')
+
+    # downgrade a7f1d3c5e9b2 == downgrade to 1c4c5996712d
+
+    alembic.downgrade(target='1c4c5996712d')
+    assert 'ix_legacy_records_mirror_error_signature' not in _get_indexes(
+        'legacy_records_mirror')
+
+    # downgrade 1c4c5996712d == downgrade to 0bc0a6ee1bc0
+
+    alembic.downgrade(target='0bc0a6ee1bc0')
+    assert 'records_citations' not in _get_table_names()
+
     # downgrade 0bc0a6ee1bc0 == downgrade to 2f5368ff6d20
 
     alembic.downgrade(target='2f5368ff6d20')
@@ -168,6 +195,46 @@ def test_upgrade(app):
     assert 'ix_records_metadata_json_referenced_records' in _get_indexes(
         'records_metadata')
 
+    # 1c4c5996712d
+
+    alembic.upgrade(target='1c4c5996712d')
+
+    assert 'records_citations' in _get_table_names()
+    assert 'ix_records_citations_cited' in _get_indexes('records_citations')
+
+    # a7f1d3c5e9b2
+
+    alembic.upgrade(target='a7f1d3c5e9b2')
+
+    assert 'ix_legacy_records_mirror_error_signature' in _get_indexes(
+        'legacy_records_mirror')
+
+    # b3e8d5f2a1c4
+
+    alembic.upgrade(target='b3e8d5f2a1c4')
+
+    assert 'content_hash' in _get_column_names('legacy_records_mirror')
+    assert 'migrated_hash' in _get_column_names('legacy_records_mirror')
+
+    # c5a9e2d7f3b1
+
+    alembic.upgrade(target='c5a9e2d7f3b1')
+
+    assert 'workflows_step_timing' in _get_table_names()
+    assert 'ix_workflows_step_timing_object_id' in _get_indexes('workflows_step_timing')
+
+    # e4d2b8a6c1f7
+
+    alembic.upgrade(target='e4d2b8a6c1f7')
+
+    assert 'workflows_step_timing' in _get_table_names()
+
+
+def _get_column_names(tablename):
+    inspector = inspect(db.engine)
+
+    return [column['name'] for column in inspector.get_columns(tablename)]
+
 
 def _get_indexes(tablename):
     query = text('''
@@ -28,6 +28,7 @@ import zlib
 
 import pytest
 from flask import current_app
+from mock import patch
 from redis import StrictRedis
 
 from inspirehep.modules.migrator.models import LegacyRecordsMirror
@@ -51,7 +52,7 @@ def push_to_redis(record_file):
 def flush_redis():
     redis_url = current_app.config.get('CACHE_REDIS_URL')
     r = StrictRedis.from_url(redis_url)
-    r.delete('legacy_records')
+    r.delete('legacy_records', 'legacy_records_processing', 'legacy_records_stats')
 
 
 @pytest.fixture(scope='function')
@@ -64,6 +65,18 @@ def record_1502656():
     _delete_record('lit', 1502656)
 
 
+@pytest.fixture(scope='function')
+def record_1502656_in_processing():
+    record = push_to_redis('1502656.xml')
+    r = StrictRedis.from_url(current_app.config.get('CACHE_REDIS_URL'))
+    r.rpoplpush('legacy_records', 'legacy_records_processing')
+
+    yield record
+
+    flush_redis()
+    _delete_record('lit', 1502656)
+
+
 @pytest.fixture(scope='function')
 def record_1502655_and_1502656():
     record1 = push_to_redis('1502655.xml')
@@ -148,3 +161,34 @@ def test_continuous_migration_handles_record_updates(app, record_1502656_and_upd
     result = LegacyRecordsMirror.query.get(1502656).marcxml
 
     assert expected == result
+
+
+def test_continuous_migration_migrates_records_left_in_processing(app, record_1502656_in_processing):
+    r = StrictRedis.from_url(current_app.config.get('CACHE_REDIS_URL'))
+
+    assert r.lrange('legacy_records', 0, 0) == []
+    assert r.lrange('legacy_records_processing', 0, 0) != []
+
+    continuous_migration()
+
+    assert r.lrange('legacy_records_processing', 0, 0) == []
+
+    get_db_record('lit', 1502656)  # Does not raise.
+
+
+def test_continuous_migration_migrates_in_batches_and_reports_stats(app, record_1502655_and_1502656):
+    r = StrictRedis.from_url(current_app.config.get('CACHE_REDIS_URL'))
+
+    with patch.dict(current_app.config, {'RECORDS_MIGRATION_CONTINUOUS_BATCH_SIZE': 1}):
+        continuous_migration()
+
+    assert r.lrange('legacy_records', 0, 0) == []
+    assert r.lrange('legacy_records_processing', 0, 0) == []
+
+    get_db_record('aut', 1502655)  # Does not raise.
+    get_db_record('lit', 1502656)  # Does not raise.
+
+    stats = r.hgetall('legacy_records_stats')
+
+    assert stats[b'depth'] == b'0'
+    assert stats[b'last_batch_size'] == b'1'
@@ -38,6 +38,7 @@ from inspirehep.factory import create_app
 from inspirehep.modules.fixtures.files import init_all_storage_paths
 from inspirehep.modules.fixtures.users import init_users_and_permissions
 from inspirehep.modules.records.api import InspireRecord
+from inspirehep.modules.workflows.tasks.refextract import get_reference_match_cache
 
 # Use the helpers folder to store test helpers.
 # See: http://stackoverflow.com/a/33515264/374865
@@ -145,6 +146,7 @@ def cleanup_workflows(workflow_app):
     db.session.close_all()
     drop_all(app=workflow_app)
     create_all(app=workflow_app)
+    get_reference_match_cache().clear()
 
 
 @pytest.fixture
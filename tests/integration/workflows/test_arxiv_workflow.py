@@ -29,6 +29,7 @@ import mock
 import pkg_resources
 import pytest
 
+from flask_alembic import Alembic
 from invenio_search import current_search_client as es
 from invenio_db import db
 from invenio_workflows import (
@@ -317,6 +318,82 @@ def test_harvesting_arxiv_workflow_manual_accepted(
     assert obj.extra_data['approved'] is True
 
 
+@mock.patch(
+    'inspirehep.modules.workflows.tasks.arxiv.download_file_to_workflow',
+    side_effect=fake_download_file,
+)
+@mock.patch(
+    'inspirehep.modules.workflows.tasks.arxiv.is_pdf_link'
+)
+@mock.patch(
+    'inspirehep.modules.workflows.tasks.actions.download_file_to_workflow',
+    side_effect=fake_download_file,
+)
+@mock.patch(
+    'inspirehep.modules.workflows.tasks.beard.json_api_request',
+    side_effect=fake_beard_api_request,
+)
+@mock.patch(
+    'inspirehep.modules.workflows.tasks.magpie.json_api_request',
+    side_effect=fake_magpie_api_request,
+)
+@mock.patch(
+    'inspirehep.modules.workflows.tasks.refextract.extract_references_from_file',
+    return_value=[],
+)
+def test_harvesting_arxiv_workflow_halted_with_the_old_enhance_record_layout(
+    mocked_refextract_extract_refs,
+    mocked_api_request_magpie,
+    mocked_api_request_beard,
+    mocked_download_utils,
+    mocked_download_arxiv,
+    mocked_package_download,
+    workflow_app,
+    mocked_external_services,
+):
+    record = generate_record()
+
+    workflow_uuid, eng, obj = get_halted_workflow(
+        app=workflow_app,
+        record=record,
+    )
+    callback_pos = obj.callback_pos
+    db.session.commit()
+
+    alembic = Alembic(workflow_app)
+    # ``ENHANCE_RECORD`` used to be 14 top-level tasks instead of 1.
+    alembic.downgrade(target='c5a9e2d7f3b1')
+    db.session.expire_all()
+    obj = workflow_object_class.get(obj.id)
+    assert obj.callback_pos == [callback_pos[0] + 13] + callback_pos[1:]
+
+    alembic.upgrade()
+    db.session.expire_all()
+    obj = workflow_object_class.get(obj.id)
+    assert obj.callback_pos == callback_pos
+
+    do_accept_core(
+        app=workflow_app,
+        workflow_id=obj.id,
+    )
+
+    eng = WorkflowEngine.from_uuid(workflow_uuid)
+    obj = eng.processed_objects[0]
+    assert obj.status == ObjectStatus.WAITING
+
+    do_robotupload_callback(
+        app=workflow_app,
+        workflow_id=obj.id,
+        recids=[12345],
+    )
+    do_webcoll_callback(app=workflow_app, recids=[12345])
+
+    eng = WorkflowEngine.from_uuid(workflow_uuid)
+    obj = eng.processed_objects[0]
+    assert obj.status == ObjectStatus.COMPLETED
+    assert obj.extra_data['approved'] is True
+
+
 @mock.patch(
     'inspirehep.modules.workflows.tasks.arxiv.download_file_to_workflow',
     side_effect=fake_download_file,
@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of INSPIRE.
+# Copyright (C) 2018 CERN.
+#
+# INSPIRE is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# INSPIRE is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with INSPIRE. If not, see <http://www.gnu.org/licenses/>.
+#
+# In applying this license, CERN does not waive the privileges and immunities
+# granted to it by virtue of its status as an Intergovernmental Organization
+# or submit itself to any jurisdiction.
+
+
+from __future__ import absolute_import, division, print_function
+
+import requests
+import requests_mock
+from mock import patch
+
+from invenio_db import db
+from invenio_workflows import workflow_object_class
+
+from inspirehep.modules.workflows.models import WorkflowsStepTiming
+from inspirehep.modules.workflows.utils.tracing import count_http_call, trace_step
+
+
+def test_trace_step_stores_timing(workflow_app):
+    @trace_step('test')
+    def fetch(obj, eng):
+        requests.get('http://example.com/api', hooks={'response': count_http_call})
+        obj.save()
+
+    obj = workflow_object_class.create({}, data_type='hep')
+    db.session.commit()
+
+    with patch.dict(workflow_app.config, {'WORKFLOWS_TRACE_STEPS': True}):
+        with requests_mock.Mocker() as requests_mocker:
+            requests_mocker.get('http://example.com/api', json={})
+            fetch(obj, None)
+    db.session.commit()
+
+    timing = WorkflowsStepTiming.query.filter_by(object_id=obj.id).one()
+    assert timing.workflow == 'test'
+    assert timing.step == 'fetch'
+    assert timing.wall_time >= timing.cpu_time >= 0
+    assert timing.http_calls == 1
+    assert timing.es_calls == 0
+    assert timing.db_calls >= 1
+
+
+def test_trace_step_is_disabled_by_default(workflow_app):
+    @trace_step('test')
+    def noop(obj, eng):
+        pass
+
+    obj = workflow_object_class.create({}, data_type='hep')
+    db.session.commit()
+
+    noop(obj, None)
+    db.session.commit()
+
+    assert WorkflowsStepTiming.query.count() == 0
+
+
+def test_get_percentiles(workflow_app):
+    objects = [workflow_object_class.create({}, data_type='hep') for _ in range(3)]
+    db.session.flush()
+    for wall_time, obj in enumerate(objects, start=1):
+        for step in ('fast', 'slow'):
+            db.session.add(WorkflowsStepTiming(
+                object_id=obj.id,
+                workflow='test',
+                step=step,
+                wall_time=wall_time if step == 'fast' else 10 * wall_time,
+                cpu_time=0.5,
+                rss_delta=0,
+                http_calls=1,
+                es_calls=0,
+                db_calls=2,
+            ))
+    db.session.commit()
+
+    result = WorkflowsStepTiming.get_percentiles(last=2, workflow='test')
+
+    assert [(row[1], row[2], row[3]) for row in result] == [('slow', 2, 25.0), ('fast', 2, 2.5)]
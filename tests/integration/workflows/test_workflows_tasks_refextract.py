@@ -374,26 +374,34 @@ def test_match_reference_ignores_deleted():
 
 
 @patch(
-    'inspirehep.modules.workflows.tasks.refextract.match',
-    return_value=[
-        {
-            u'_score': 1.6650109,
-            u'_type': u'hep',
-            u'_id': u'AWRuwf9plgR0Y_yvhtt4',
-            u'_source': {u'control_number': 1},
-            u'_index': u'records-hep'
-        },
-        {
-            u'_score': 3.2345618,
-            u'_type': u'hep',
-            u'_id': u'AWRuwf9plgR0Y_yvhtt4',
-            u'_source': {u'control_number': 1},
-            u'_index': u'records-hep'
-        }
-    ],
+    'inspirehep.modules.workflows.tasks.refextract.es.msearch',
+    return_value={
+        'responses': [
+            {
+                'hits': {
+                    'hits': [
+                        {
+                            u'_score': 1.6650109,
+                            u'_type': u'hep',
+                            u'_id': u'AWRuwf9plgR0Y_yvhtt4',
+                            u'_source': {u'control_number': 1},
+                            u'_index': u'records-hep'
+                        },
+                        {
+                            u'_score': 3.2345618,
+                            u'_type': u'hep',
+                            u'_id': u'AWRuwf9plgR0Y_yvhtt4',
+                            u'_source': {u'control_number': 1},
+                            u'_index': u'records-hep'
+                        }
+                    ],
+                },
+            },
+        ] * 2,
+    },
 )
 def test_match_references_finds_match_when_repeated_record_with_different_scores(
-    mocked_inspire_matcher_match
+    mocked_msearch
 ):
     references = [
         {
@@ -22,7 +22,10 @@
 
 from __future__ import absolute_import, division, print_function
 
-from inspirehep.modules.authors.utils import bai
+from mock import MagicMock, patch
+
+from inspire_utils.name import generate_name_variations
+from inspirehep.modules.authors.utils import NameCache, bai, phonetic_blocks
 
 
 def test_that_bai_conforms_to_the_spec():
@@ -46,3 +49,37 @@ def test_that_bai_conforms_to_the_spec():
     assert bai("Müller, Andreas") == "A.Mueller"
     assert bai("Hernández-Tomé, G.") == "G.Hernandez.Tome"
     assert bai("José de Goya y Lucientes, Francisco Y H") == "F.Y.H.Jose.de.Goya.y.Lucientes"
+
+
+def test_name_cache_get_name_variations():
+    cache = NameCache(maxsize=10)
+
+    expected = generate_name_variations('Aad, Georges')
+
+    assert cache.get_name_variations('Aad, Georges') == expected
+    assert cache.get_name_variations('Aad, Georges') == expected
+    assert cache.info()['hits'] == 1
+    assert cache.info()['misses'] == 1
+
+
+def test_name_cache_get_phonetic_blocks_only_computes_missing_names():
+    cache = NameCache(maxsize=10)
+    cache.get_phonetic_blocks(['Aad, Georges'])
+
+    with patch('inspirehep.modules.authors.utils.phonetic_blocks', wraps=phonetic_blocks) as mock_phonetic_blocks:
+        result = cache.get_phonetic_blocks(['Aad, Georges', 'Abbott, Brad'])
+
+    mock_phonetic_blocks.assert_called_once_with(['Abbott, Brad'], phonetic_algorithm='nysiis')
+    assert result == phonetic_blocks(['Aad, Georges', 'Abbott, Brad'])
+
+
+def test_name_cache_uses_redis_on_local_misses():
+    redis = MagicMock()
+    redis.mget.return_value = ['["georges aad"]']
+    cache = NameCache(maxsize=10, redis=redis, redis_ttl=60)
+
+    result = cache.get_name_variations('Aad, Georges')
+
+    assert result == ['georges aad']
+    assert cache.info()['redis_hits'] == 1
+    redis.pipeline.assert_not_called()
@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of INSPIRE.
+# Copyright (C) 2018 CERN.
+#
+# INSPIRE is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# INSPIRE is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with INSPIRE. If not, see <http://www.gnu.org/licenses/>.
+#
+# In applying this license, CERN does not waive the privileges and immunities
+# granted to it by virtue of its status as an Intergovernmental Organization
+# or submit itself to any jurisdiction.
+
+
+from __future__ import absolute_import, division, print_function
+
+import os
+import threading
+import zlib
+
+import pkg_resources
+import pytest
+from flask import Flask
+
+from inspirehep.modules.migrator.compression import (
+    ZLIB_HEADER,
+    ZLIB_PREFIX,
+    ZSTD_DICTIONARY_HEADER,
+    ZSTD_HEADER,
+    _get_zstd_decompressor,
+    compress_marcxml,
+    decompress_marcxml,
+    train_zstd_dictionary,
+)
+
+
+@pytest.fixture
+def marcxml():
+    xml_file = pkg_resources.resource_filename(__name__, os.path.join('fixtures', '1663924.xml'))
+
+    with open(xml_file, 'rb') as f:
+        return f.read()
+
+
+def _app_context(**config):
+    app = Flask(__name__)
+    app.config.update(config)
+    return app.app_context()
+
+
+def test_compress_marcxml_uses_zlib_without_header_by_default(marcxml):
+    compressed = compress_marcxml(marcxml)
+
+    assert compressed == zlib.compress(marcxml)
+    assert compressed[:1] == ZLIB_PREFIX
+    assert decompress_marcxml(compressed) == marcxml
+
+
+def test_compress_marcxml_uses_configured_codec(marcxml):
+    with _app_context(MIGRATOR_MARCXML_CODEC='zstd'):
+        compressed = compress_marcxml(marcxml)
+
+    assert compressed[:1] == ZSTD_HEADER
+    assert len(compressed) < len(zlib.compress(marcxml))
+    assert decompress_marcxml(compressed) == marcxml
+
+
+def test_compress_marcxml_uses_zstd_dictionary(tmpdir, marcxml):
+    samples = [marcxml.replace(b'1663924', str(recid).encode('ascii')) for recid in range(1000)]
+    dictionary = tmpdir.join('marcxml.dict')
+    dictionary.write_binary(train_zstd_dictionary(samples, 4096))
+
+    with _app_context(MIGRATOR_MARCXML_CODEC='zstd', MIGRATOR_MARCXML_ZSTD_DICTIONARY=str(dictionary)):
+        compressed = compress_marcxml(marcxml)
+
+        assert compressed[:1] == ZSTD_DICTIONARY_HEADER
+        assert decompress_marcxml(compressed) == marcxml
+
+    with pytest.raises(ValueError):
+        decompress_marcxml(compressed)
+
+
+def test_decompress_marcxml_supports_records_without_header(marcxml):
+    assert decompress_marcxml(zlib.compress(marcxml)) == marcxml
+    assert decompress_marcxml(marcxml) == marcxml
+
+
+def test_decompress_marcxml_supports_zlib_records_with_header(marcxml):
+    assert decompress_marcxml(ZLIB_HEADER + zlib.compress(marcxml)) == marcxml
+
+
+def test_zstd_objects_are_not_shared_between_threads(marcxml):
+    with _app_context(MIGRATOR_MARCXML_CODEC='zstd'):
+        compressed = compress_marcxml(marcxml)
+
+    results = {}
+
+    def _decompress():
+        results[threading.current_thread().name] = (
+            _get_zstd_decompressor(None),
+            decompress_marcxml(compressed),
+        )
+
+    threads = [threading.Thread(target=_decompress) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    decompressors = [decompressor for decompressor, _ in results.values()]
+    assert decompressors[0] is not decompressors[1]
+    assert all(result == marcxml for _, result in results.values())
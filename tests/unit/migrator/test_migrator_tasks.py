@@ -23,9 +23,22 @@
 from __future__ import absolute_import, division, print_function
 
 import os
-import pkg_resources
 
-from inspirehep.modules.migrator.tasks import read_file
+import pkg_resources
+from flask import current_app
+from mock import patch
+
+from inspirehep.modules.migrator.compression import decompress_marcxml
+from inspirehep.modules.migrator.tasks import (
+    _get_citation_count_updates,
+    _get_tar_members,
+    _prepare_mirror_rows,
+    _prepare_mirror_rows_from_tar_member,
+    add_citation_counts,
+    read_file,
+    split_records,
+    split_stream,
+)
 
 
 def test_read_file_reads_xml_file_correctly():
@@ -64,3 +77,116 @@ def test_read_file_reads_prodsync_file_correctly():
     result = list(read_file(prodsync_file))
 
     assert expected == result
+
+
+def test_read_file_reads_xml_file_by_chunks():
+    xml_file = pkg_resources.resource_filename(__name__, os.path.join('fixtures', '1663924.xml'))
+
+    with open(xml_file, 'rb') as f:
+        expected = f.read()
+    result = list(read_file(xml_file, chunk_size=100))
+
+    assert len(result) > 1
+    assert expected == b''.join(result)
+
+
+def test_split_records_matches_split_stream_whatever_the_chunk_size():
+    xml_file = pkg_resources.resource_filename(__name__, os.path.join('fixtures', 'micro-prodsync.tar'))
+
+    expected = list(split_stream(read_file(xml_file)))
+
+    for chunk_size in (1, 7, 100, 1024 * 1024):
+        result = list(split_records(read_file(xml_file, chunk_size=chunk_size)))
+
+        assert [record for _, record in result] == expected
+        assert [recid for recid, _ in result] == [1663923, 1663924]
+
+
+def test_split_records_skips_other_tags_starting_like_record():
+    chunks = [
+        b'<collection><records-info/><rec',
+        b'ord>\n<controlfield tag="001">1</controlfield>\n</rec',
+        b'ord><record type="x"><controlfield tag="005">2</controlfield></record>',
+        b'<record><controlfield',
+    ]
+
+    result = list(split_records(chunks))
+
+    assert result == [
+        (1, b'<record>\n<controlfield tag="001">1</controlfield>\n</record>'),
+        (None, b'<record type="x"><controlfield tag="005">2</controlfield></record>'),
+    ]
+
+
+def test_prepare_mirror_rows():
+    records = [
+        (1663923, b'<record><controlfield tag="001">1663923</controlfield></record>'),
+        (None, b'<record><controlfield tag="005">20180101</controlfield></record>'),
+    ]
+
+    rows, errors = _prepare_mirror_rows(records)
+
+    assert errors == 1
+    assert len(rows) == 1
+    assert rows[0]['recid'] == 1663923
+    assert rows[0]['collection'] == 'HEP'
+    assert decompress_marcxml(rows[0]['marcxml']) == records[0][1]
+
+
+def test_get_tar_members_resumes_from_member():
+    prodsync_file = pkg_resources.resource_filename(__name__, os.path.join('fixtures', 'micro-prodsync.tar'))
+
+    all_members = _get_tar_members(prodsync_file)
+    resumed_members = _get_tar_members(prodsync_file, resume_from=all_members[1][1])
+
+    assert len(all_members) == 2
+    assert resumed_members == all_members[1:]
+
+
+def test_prepare_mirror_rows_from_tar_member():
+    prodsync_file = pkg_resources.resource_filename(__name__, os.path.join('fixtures', 'micro-prodsync.tar'))
+
+    results = [
+        _prepare_mirror_rows_from_tar_member(member)
+        for member in _get_tar_members(prodsync_file)
+    ]
+    recids = sorted(row['recid'] for _, rows, _ in results for row in rows)
+
+    assert recids == [1663923, 1663924]
+
+
+@patch('inspirehep.modules.migrator.tasks.create_index_op', side_effect=lambda record: record)
+@patch('inspirehep.modules.migrator.tasks.InspireRecord.get_records_bulk', side_effect=lambda uuids: uuids)
+@patch('inspirehep.modules.migrator.tasks.get_pid_type_from_endpoint', return_value='lit')
+@patch('inspirehep.modules.migrator.tasks.RecordCitations.get_counts')
+@patch('inspirehep.modules.migrator.tasks.sliced_scan')
+def test_get_citation_count_updates_reindexes_only_changed_counts(
+    mock_scan, mock_get_counts, mock_get_pid_type, mock_get_records_bulk, mock_create_index_op,
+):
+    def _hit(uuid, source):
+        return {'_index': 'records-hep', '_type': 'hep', '_id': uuid, '_source': source}
+
+    mock_scan.return_value = [
+        _hit('a', {'control_number': 1, 'citation_count': 2}),
+        _hit('b', {'control_number': 2, 'citation_count': 1}),
+        _hit('c', {'control_number': 3, 'citation_count': 4}),
+        _hit('d', {'control_number': 4}),
+        _hit('e', {}),
+    ]
+    mock_get_counts.return_value = {('lit', '1'): 2, ('lit', '2'): 3}
+
+    result = list(_get_citation_count_updates('records-hep', 'hep'))
+
+    assert result == ['b', 'c', 'd']
+    assert sorted(mock_get_counts.call_args[0][0]) == [
+        ('lit', '1'), ('lit', '2'), ('lit', '3'), ('lit', '4'),
+    ]
+
+
+@patch('inspirehep.modules.migrator.tasks.es_bulk', return_value=(0, 0))
+@patch('inspirehep.modules.migrator.tasks._get_citation_count_updates')
+def test_add_citation_counts_scans_with_the_configured_slices(mock_get_updates, mock_bulk):
+    with patch.dict(current_app.config, {'SEARCH_SCAN_SLICES': 4}):
+        add_citation_counts()
+
+    assert mock_get_updates.call_args[1] == {'slices': 4}
@@ -22,13 +22,24 @@
 
 from __future__ import absolute_import, division, print_function
 
+import pytest
+
 from inspirehep.modules.pidstore.utils import (
+    PidTypeRegistry,
     get_endpoint_from_pid_type,
+    get_pid_from_ref,
     get_pid_type_from_endpoint,
     get_pid_type_from_schema,
+    get_pid_type_from_ref,
     get_pid_types_from_endpoints,
 )
 
+ENDPOINTS_CONFIG = {
+    'literature': {'pid_type': 'lit', 'default_endpoint_prefix': True},
+    'literature_db': {'pid_type': 'lit'},
+    'authors': {'pid_type': 'aut', 'default_endpoint_prefix': True},
+}
+
 
 def test_get_endpoint_from_pid_type():
     expected = 'literature'
@@ -61,3 +72,48 @@ def test_get_pid_from_schema_supports_relative_urls():
 def test_get_pid_types_from_endpoint(app):
     pid_types = set(('lit', 'con', 'exp', 'jou', 'aut', 'job', 'ins'))
     assert pid_types.issubset(get_pid_types_from_endpoints())
+
+
+def test_get_pid_type_from_ref():
+    expected = 'lit'
+    result = get_pid_type_from_ref('http://localhost:5000/api/literature/1')
+
+    assert expected == result
+
+
+def test_get_pid_from_ref():
+    expected = ('dat', '421')
+    result = get_pid_from_ref('http://localhost:5000/api/data/421/')
+
+    assert expected == result
+
+
+def test_pid_type_registry_ignores_non_default_endpoints():
+    registry = PidTypeRegistry(ENDPOINTS_CONFIG)
+
+    assert registry.get_endpoint('lit') == 'literature'
+    assert registry.get_pid_type('authors') == 'aut'
+    assert sorted(registry.pid_types) == ['aut', 'lit']
+    with pytest.raises(KeyError):
+        registry.get_pid_type('literature_db')
+
+
+def test_pid_type_registry_memoizes_parsed_urls():
+    registry = PidTypeRegistry(ENDPOINTS_CONFIG)
+
+    assert registry.get_pid_type_from_ref('http://localhost:5000/api/authors/1') == 'aut'
+    assert registry.get_pid_type_from_ref('http://localhost:5000/api/authors/2/') == 'aut'
+    assert registry.get_pid_type_from_schema('http://localhost:5000/schemas/records/hep.json') == 'lit'
+    assert registry.get_pid_type_from_schema('http://localhost:5000/schemas/records/hep.json') == 'lit'
+
+    assert registry._parsed_urls.hits == 2
+    assert registry._parsed_urls.misses == 2
+
+
+def test_pid_type_registry_does_not_memoize_unknown_urls():
+    registry = PidTypeRegistry(ENDPOINTS_CONFIG)
+
+    with pytest.raises(KeyError):
+        registry.get_pid_type_from_ref('http://localhost:5000/api/foo/1')
+
+    assert len(registry._parsed_urls) == 0
@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of INSPIRE.
+# Copyright (C) 2018 CERN.
+#
+# INSPIRE is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# INSPIRE is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with INSPIRE. If not, see <http://www.gnu.org/licenses/>.
+#
+# In applying this license, CERN does not waive the privileges and immunities
+# granted to it by virtue of its status as an Intergovernmental Organization
+# or submit itself to any jurisdiction.
+
+
+from __future__ import absolute_import, division, print_function
+
+import json
+
+from mock import patch
+
+from inspirehep.modules.records.cli import ReindexCheckpoint, reindex_batches
+
+
+class StubTask(object):
+    def __init__(self, uuids, failed=False):
+        self.uuids = uuids
+        self._failed = failed
+        self.polls = 0
+
+    def ready(self):
+        self.polls += 1
+        return self.polls > 1
+
+    def failed(self):
+        return self._failed
+
+    @property
+    def result(self):
+        if self._failed:
+            return Exception('Boom')
+        return {
+            'success': len(self.uuids) - len(self.failures),
+            'failures': self.failures,
+        }
+
+    @property
+    def failures(self):
+        return [
+            {'index': {'_id': uuid, 'error': 'Bad'}}
+            for uuid in self.uuids if uuid.startswith('bad')
+        ]
+
+
+def test_reindex_checkpoint_save_and_load(tmpdir):
+    path = str(tmpdir.join('checkpoint.json'))
+    checkpoint = ReindexCheckpoint(path, ['lit', 'aut'], last_uuid='uuid', success=3)
+    checkpoint.save()
+
+    result = ReindexCheckpoint.load(path)
+
+    assert result.pid_types == ['aut', 'lit']
+    assert result.last_uuid == 'uuid'
+    assert result.success == 3
+    assert result.failures == 0
+
+
+def test_reindex_checkpoint_without_path_is_not_saved(tmpdir):
+    checkpoint = ReindexCheckpoint(None, ['lit'])
+
+    checkpoint.save()
+    checkpoint.remove()
+
+    assert tmpdir.listdir() == []
+
+
+@patch('inspirehep.modules.records.cli.sleep')
+@patch('inspirehep.modules.records.cli.batch_reindex.apply_async')
+def test_reindex_batches(mock_apply_async, mock_sleep, tmpdir):
+    mock_apply_async.side_effect = lambda kwargs, queue: StubTask(
+        kwargs['uuids'], failed='uuid3' in kwargs['uuids'])
+    path = str(tmpdir.join('checkpoint.json'))
+    failures_log = tmpdir.join('failures.log')
+    errors_log = tmpdir.join('errors.log')
+    checkpoint = ReindexCheckpoint(
+        path,
+        ['lit'],
+        failures_log_path=str(failures_log),
+        errors_log_path=str(errors_log),
+    )
+    batches = iter([['uuid1', 'bad2'], ['uuid3'], ['uuid4']])
+
+    reindex_batches(batches, checkpoint, 4, 'indexer_task', 2, 900)
+
+    assert mock_apply_async.call_count == 3
+    assert checkpoint.success == 2
+    assert checkpoint.failures == 1
+    assert checkpoint.batch_errors == 1
+    assert checkpoint.last_uuid == 'uuid4'
+    assert ReindexCheckpoint.load(path).last_uuid == 'uuid4'
+    assert [json.loads(line) for line in failures_log.readlines()] == [
+        {'id': 'bad2', 'error': 'Bad'},
+    ]
+    assert [json.loads(line) for line in errors_log.readlines()] == [
+        {'ids': ['uuid3'], 'error': "Exception('Boom',)"},
+    ]
+
+
+class StubTaskFinishingFirst(StubTask):
+    def ready(self):
+        self.polls += 1
+        return self.uuids != ['uuid1'] or self.polls > 3
+
+
+@patch('inspirehep.modules.records.cli.sleep')
+@patch('inspirehep.modules.records.cli.batch_reindex.apply_async')
+def test_reindex_batches_only_counts_the_finished_prefix(mock_apply_async, mock_sleep, tmpdir):
+    mock_apply_async.side_effect = lambda kwargs, queue: StubTaskFinishingFirst(kwargs['uuids'])
+    checkpoint = ReindexCheckpoint(str(tmpdir.join('checkpoint.json')), ['lit'])
+    progress_while_waiting = []
+    mock_sleep.side_effect = lambda _: progress_while_waiting.append(
+        (checkpoint.last_uuid, checkpoint.success))
+    batches = iter([['uuid1'], ['uuid2'], ['uuid3']])
+
+    reindex_batches(batches, checkpoint, 3, 'indexer_task', 3, 900)
+
+    assert set(progress_while_waiting) == {(None, 0)}
+    assert (checkpoint.last_uuid, checkpoint.success) == ('uuid3', 3)
+
+
+@patch('inspirehep.modules.records.cli.sleep')
+@patch('inspirehep.modules.records.cli.batch_reindex.apply_async')
+def test_reindex_batches_limits_tasks_in_flight(mock_apply_async, mock_sleep, tmpdir):
+    tasks = []
+
+    def _apply_async(kwargs, queue):
+        assert len([task for task in tasks if task.polls < 2]) < 2
+        tasks.append(StubTask(kwargs['uuids']))
+        return tasks[-1]
+
+    mock_apply_async.side_effect = _apply_async
+    checkpoint = ReindexCheckpoint(str(tmpdir.join('checkpoint.json')), ['lit'])
+    batches = iter([['uuid1'], ['uuid2'], ['uuid3'], ['uuid4'], ['uuid5']])
+
+    reindex_batches(batches, checkpoint, 5, 'indexer_task', 2, 900)
+
+    assert checkpoint.success == 5
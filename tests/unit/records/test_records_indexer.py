@@ -0,0 +1,244 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of INSPIRE.
+# Copyright (C) 2018 CERN.
+#
+# INSPIRE is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# INSPIRE is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with INSPIRE. If not, see <http://www.gnu.org/licenses/>.
+#
+# In applying this license, CERN does not waive the privileges and immunities
+# granted to it by virtue of its status as an Intergovernmental Organization
+# or submit itself to any jurisdiction.
+
+
+from __future__ import absolute_import, division, print_function
+
+import pytest
+from elasticsearch import ConnectionError
+from elasticsearch.serializer import JSONSerializer
+from mock import patch
+
+from inspirehep.modules.records.indexer import (
+    InspireRecordIndexer,
+    RecordIndexQueue,
+    is_missing_document,
+    is_version_conflict,
+)
+
+
+class StubRecord(dict):
+    def __init__(self, id_, revision_id):
+        super(StubRecord, self).__init__()
+        self.id = id_
+        self.revision_id = revision_id
+
+
+def test_is_version_conflict():
+    failure = {
+        'index': {
+            '_id': 'uuid',
+            'status': 409,
+            'error': {'type': 'version_conflict_engine_exception'},
+        },
+    }
+
+    assert is_version_conflict(failure)
+
+
+def test_is_version_conflict_returns_false_on_conflicts_of_other_actions():
+    failure = {
+        'update': {
+            '_id': 'uuid',
+            'status': 409,
+            'error': {'type': 'version_conflict_engine_exception'},
+        },
+    }
+
+    assert not is_version_conflict(failure)
+
+
+def test_is_version_conflict_returns_false_on_other_errors():
+    failure = {'index': {'_id': 'uuid', 'status': 400}}
+
+    assert not is_version_conflict(failure)
+
+
+def test_is_missing_document():
+    failure = {'delete': {'_id': 'uuid', 'status': 404}}
+
+    assert is_missing_document(failure)
+
+
+def test_is_missing_document_returns_false_on_index_actions():
+    failure = {'index': {'_id': 'uuid', 'status': 404}}
+
+    assert not is_missing_document(failure)
+
+
+def test_record_index_queue_keeps_the_latest_revision():
+    queue = RecordIndexQueue(chunk_size=10)
+
+    queue.add(StubRecord('uuid', 2))
+    queue.add(StubRecord('uuid', 1))
+    queue.add(StubRecord('uuid', 3), delete=True)
+
+    assert len(queue) == 1
+    assert queue._pending['uuid'][0] == 'delete'
+    assert queue._pending['uuid'][1].revision_id == 3
+
+
+@patch('inspirehep.modules.records.indexer.create_index_op')
+@patch('inspirehep.modules.records.indexer.bulk')
+def test_record_index_queue_flushes_when_full(mock_bulk, mock_create_index_op):
+    mock_bulk.return_value = (2, [])
+    queue = RecordIndexQueue(chunk_size=2)
+
+    queue.add(StubRecord('uuid1', 1))
+    assert not mock_bulk.called
+
+    queue.add(StubRecord('uuid2', 1))
+    assert mock_bulk.call_count == 1
+    assert len(queue) == 0
+    assert queue.stats['succeeded'] == 2
+
+
+@patch('inspirehep.modules.records.indexer.create_index_op')
+@patch('inspirehep.modules.records.indexer.bulk')
+def test_record_index_queue_flush_ignores_version_conflicts(mock_bulk, mock_create_index_op):
+    mock_bulk.return_value = (1, [
+        {
+            'index': {
+                '_id': 'uuid2',
+                'status': 409,
+                'error': {'type': 'version_conflict_engine_exception'},
+            },
+        },
+        {'index': {'_id': 'uuid3', 'status': 400}},
+    ])
+    queue = RecordIndexQueue(chunk_size=10)
+
+    queue.add(StubRecord('uuid1', 1))
+    queue.add(StubRecord('uuid2', 1))
+    queue.add(StubRecord('uuid3', 1))
+    stats = queue.flush()
+
+    assert stats['succeeded'] == 1
+    assert stats['conflicts'] == 1
+    assert stats['failures'] == 1
+
+
+@patch('inspirehep.modules.records.indexer.create_index_op')
+@patch('inspirehep.modules.records.indexer.es')
+def test_record_index_queue_flush_raises_transport_errors(mock_es, mock_create_index_op):
+    mock_es.transport.serializer = JSONSerializer()
+    mock_es.bulk.side_effect = ConnectionError('N/A', 'Connection refused', None)
+    mock_create_index_op.return_value = {
+        '_op_type': 'index',
+        '_index': 'records-hep',
+        '_type': 'hep',
+        '_id': 'uuid1',
+        '_source': {},
+    }
+    queue = RecordIndexQueue(chunk_size=10)
+
+    queue.add(StubRecord('uuid1', 1))
+
+    with pytest.raises(ConnectionError):
+        queue.flush()
+
+
+@patch('inspirehep.modules.records.indexer.bulk')
+def test_record_index_queue_flush_does_nothing_when_empty(mock_bulk):
+    queue = RecordIndexQueue()
+
+    assert queue.flush() == {}
+    assert not mock_bulk.called
+
+
+@patch('inspirehep.modules.records.tasks.batch_reindex.apply_async')
+@patch('inspirehep.modules.records.indexer.bulk')
+def test_record_index_queue_delegates_to_celery(mock_bulk, mock_apply_async):
+    mock_bulk.return_value = (0, [])
+    queue = RecordIndexQueue(chunk_size=10, queue_name='indexer_task')
+
+    queue.add(StubRecord('uuid1', 1))
+    queue.add(StubRecord('uuid2', 1))
+    stats = queue.flush()
+
+    assert stats['delegated'] == 2
+    mock_apply_async.assert_called_once_with(
+        kwargs={
+            'uuids': ['uuid1', 'uuid2'],
+            'request_timeout': queue.request_timeout,
+            'version_type': 'external_gte',
+        },
+        queue='indexer_task',
+    )
+
+
+class StubMessage(object):
+    def __init__(self, payload):
+        self.payload = payload
+        self.acked = False
+        self.rejected = False
+
+    def decode(self):
+        return self.payload
+
+    def ack(self):
+        self.acked = True
+
+    def reject(self):
+        self.rejected = True
+
+
+@patch('inspirehep.modules.records.indexer.InspireRecord.get_record')
+@patch('inspirehep.modules.records.indexer.InspireRecord.get_records_bulk')
+def test_inspire_record_indexer_loads_records_in_bulk(mock_get_records_bulk, mock_get_record):
+    mock_get_records_bulk.return_value = [StubRecord('uuid1', 1)]
+    indexer = InspireRecordIndexer()
+    messages = [
+        StubMessage({'op': 'index', 'id': 'uuid1'}),
+        StubMessage({'op': 'delete', 'id': 'uuid2', 'index': 'records-hep', 'doc_type': 'hep'}),
+    ]
+
+    with patch.object(indexer, '_index_action') as mock_index_action:
+        actions = list(indexer._actionsiter(iter(messages)))
+
+    assert len(actions) == 2
+    assert actions[1]['_op_type'] == 'delete'
+    mock_get_records_bulk.assert_called_once_with(['uuid1'])
+    mock_index_action.assert_called_once_with(
+        {'op': 'index', 'id': 'uuid1'},
+        mock_get_records_bulk.return_value[0],
+    )
+    assert not mock_get_record.called
+    assert all(message.acked for message in messages)
+
+
+@patch('inspirehep.modules.records.indexer.LOGGER')
+@patch('inspirehep.modules.records.indexer.InspireRecord.get_records_bulk')
+def test_inspire_record_indexer_rejects_the_chunk_when_loading_fails(mock_get_records_bulk, mock_logger):
+    mock_get_records_bulk.side_effect = Exception
+    indexer = InspireRecordIndexer()
+    messages = [
+        StubMessage({'op': 'index', 'id': 'uuid1'}),
+        StubMessage({'op': 'index', 'id': 'uuid2'}),
+    ]
+
+    actions = list(indexer._actionsiter(iter(messages)))
+
+    assert actions == []
+    assert all(message.rejected for message in messages)
+    assert not any(message.acked for message in messages)
+    assert mock_logger.exception.called
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of INSPIRE.
+# Copyright (C) 2018 CERN.
+#
+# INSPIRE is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# INSPIRE is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with INSPIRE. If not, see <http://www.gnu.org/licenses/>.
+#
+# In applying this license, CERN does not waive the privileges and immunities
+# granted to it by virtue of its status as an Intergovernmental Organization
+# or submit itself to any jurisdiction.
+
+
+from __future__ import absolute_import, division, print_function
+
+import pytest
+from mock import patch
+
+from inspirehep.modules.records.indices import swap_index_alias
+
+
+@patch('inspirehep.modules.records.indices.es')
+def test_swap_index_alias_moves_all_aliases_in_one_call(mock_es):
+    mock_es.indices.exists.return_value = True
+    mock_es.indices.get_alias.return_value = {
+        'records-hep-20180101000000': {
+            'aliases': {'records-hep': {}, 'records': {}},
+        },
+    }
+    settings = {'refresh_interval': '1s', 'number_of_replicas': 1}
+
+    result = swap_index_alias('records-hep', 'records-hep-20180601000000', settings)
+
+    assert result == ['records-hep-20180101000000']
+    mock_es.indices.put_settings.assert_called_once_with(
+        index='records-hep-20180601000000', body={'index': settings})
+    mock_es.indices.delete.assert_not_called()
+    mock_es.indices.update_aliases.assert_called_once()
+
+    actions = mock_es.indices.update_aliases.call_args[1]['body']['actions']
+    assert {'add': {'index': 'records-hep-20180601000000', 'alias': 'records-hep'}} in actions
+    assert {'add': {'index': 'records-hep-20180601000000', 'alias': 'records'}} in actions
+    assert {'remove': {'index': 'records-hep-20180101000000', 'alias': 'records-hep'}} in actions
+    assert {'remove': {'index': 'records-hep-20180101000000', 'alias': 'records'}} in actions
+
+
+@patch('inspirehep.modules.records.indices.es')
+def test_swap_index_alias_replaces_concrete_index_in_the_same_call(mock_es):
+    mock_es.indices.exists.return_value = True
+    mock_es.indices.get_alias.return_value = {
+        'records-hep': {'aliases': {'records': {}}},
+    }
+    settings = {'refresh_interval': '1s', 'number_of_replicas': 1}
+
+    result = swap_index_alias('records-hep', 'records-hep-20180601000000', settings, force=True)
+
+    assert result == []
+    mock_es.indices.delete.assert_not_called()
+
+    actions = mock_es.indices.update_aliases.call_args[1]['body']['actions']
+    assert actions == [
+        {'add': {'index': 'records-hep-20180601000000', 'alias': 'records-hep'}},
+        {'add': {'index': 'records-hep-20180601000000', 'alias': 'records'}},
+        {'remove_index': {'index': 'records-hep'}},
+    ]
+
+
+@patch('inspirehep.modules.records.indices.es')
+def test_swap_index_alias_refuses_to_replace_concrete_index_without_force(mock_es):
+    mock_es.indices.exists.return_value = True
+    mock_es.indices.get_alias.return_value = {
+        'records-hep': {'aliases': {}},
+    }
+    settings = {'refresh_interval': '1s', 'number_of_replicas': 1}
+
+    with pytest.raises(ValueError):
+        swap_index_alias('records-hep', 'records-hep-20180601000000', settings)
+
+    mock_es.indices.put_settings.assert_not_called()
+    mock_es.indices.update_aliases.assert_not_called()
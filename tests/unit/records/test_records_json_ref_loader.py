@@ -55,13 +55,13 @@ def test_replace_refs_correct_sources(get_db_rec, get_es_rec):
     assert es_rec == with_es_record
 
 
-@patch('inspirehep.modules.records.json_ref_loader.get_pid_type_from_endpoint')
+@patch('inspirehep.modules.pidstore.utils.PidTypeRegistry.get_pid_type_from_ref')
 @patch('inspirehep.modules.records.json_ref_loader.JsonLoader.get_remote_json')
 @patch('inspirehep.modules.records.json_ref_loader.AbstractRecordLoader.get_record')
-def test_abstract_loader_url_fallbacks(get_record, super_get_r_j, g_p_t_f_e):
+def test_abstract_loader_url_fallbacks(get_record, super_get_r_j, g_p_t_f_r):
     with_super = {'SUPER': 'SUPER'}
     with_actual = {'ACTUAL': 'ACTUAL'}
-    g_p_t_f_e.return_value = 'pt'
+    g_p_t_f_r.return_value = 'pt'
     super_get_r_j.return_value = with_super
     get_record.return_value = with_actual
 
@@ -119,11 +119,11 @@ def test_abstract_loader_url_fallbacks(get_record, super_get_r_j, g_p_t_f_e):
         assert expect_super == with_super
 
 
-@patch('inspirehep.modules.records.json_ref_loader.get_pid_type_from_endpoint')
+@patch('inspirehep.modules.pidstore.utils.PidTypeRegistry.get_pid_type_from_ref')
 @patch('inspirehep.modules.records.json_ref_loader.AbstractRecordLoader.get_record')
-def test_abstract_loader_recid_parsing(get_record, g_p_t_f_e):
+def test_abstract_loader_recid_parsing(get_record, g_p_t_f_r):
     with_actual = {'ACTUAL': 'ACTUAL'}
-    g_p_t_f_e.side_effect = ['pt1', 'pt2', 'pt3']
+    g_p_t_f_r.side_effect = ['pt1', 'pt2', 'pt3']
     get_record.return_value = with_actual
 
     config = {'SERVER_NAME': 'http://inspirehep.net'}
@@ -163,11 +163,11 @@ def test_abstract_loader_return_none(get_record):
         assert get_record.call_count == 0
 
 
-@patch('inspirehep.modules.records.json_ref_loader.get_pid_type_from_endpoint')
+@patch('inspirehep.modules.pidstore.utils.PidTypeRegistry.get_pid_type_from_ref')
 @patch('inspirehep.modules.records.json_ref_loader.record_getter.get_es_record')
 @patch('inspirehep.modules.records.json_ref_loader.record_getter.get_db_record')
-def test_specific_loaders_return_none(get_db_rec, get_es_rec, g_p_t_f_e):
-    g_p_t_f_e.return_value = 'pt'
+def test_specific_loaders_return_none(get_db_rec, get_es_rec, g_p_t_f_r):
+    g_p_t_f_r.return_value = 'pt'
     get_es_rec.side_effect = RecordGetterError('err', None)
     get_db_rec.side_effect = RecordGetterError('err', None)
 
@@ -182,3 +182,81 @@ def test_specific_loaders_return_none(get_db_rec, get_es_rec, g_p_t_f_e):
         assert expect_none == None  # noqa: E711
         assert get_db_rec.call_count == 1
         assert get_es_rec.call_count == 1
+
+
+@patch('inspirehep.modules.records.json_ref_loader.record_getter.get_es_record')
+@patch('inspirehep.modules.records.json_ref_loader.record_getter.get_es_records')
+def test_replace_refs_fetches_each_pid_type_once(get_es_recs, get_es_rec):
+    get_es_recs.side_effect = lambda pid_type, recids: [
+        {'control_number': int(recid)} for recid in recids if recid != '3'
+    ]
+    get_es_rec.return_value = {'control_number': 1}
+
+    obj = {
+        'publication_info': [
+            {
+                'conference_record': {'$ref': _build_url('conferences', '1')},
+                'parent_record': {'$ref': _build_url('literature', '2')},
+            },
+            {
+                'conference_record': {'$ref': _build_url('conferences', '1')},
+                'parent_record': {'$ref': _build_url('literature', '3')},
+            },
+        ],
+    }
+
+    expected = {
+        'publication_info': [
+            {
+                'conference_record': {'control_number': 1},
+                'parent_record': {'control_number': 2},
+            },
+            {
+                'conference_record': {'control_number': 1},
+                'parent_record': None,
+            },
+        ],
+    }
+    result = replace_refs(obj, 'es')
+
+    assert expected == result
+    get_es_rec.assert_called_once_with('con', '1')
+    assert get_es_recs.call_count == 1
+    assert get_es_recs.call_args[0][0] == 'lit'
+    assert sorted(get_es_recs.call_args[0][1]) == ['2', '3']
+
+
+@patch('inspirehep.modules.records.json_ref_loader.record_getter.get_db_record')
+def test_replace_refs_caches_records_during_a_request(get_db_rec, app):
+    get_db_rec.return_value = {'control_number': 1}
+
+    with app.test_request_context():
+        replace_refs({'$ref': _build_url('literature', '1')}, 'db')
+        result = replace_refs([{'$ref': _build_url('literature', '1')}], 'db')
+
+    assert result == [{'control_number': 1}]
+    assert get_db_rec.call_count == 1
+
+
+@patch('inspirehep.modules.pidstore.utils.PidTypeRegistry.get_pid_type_from_ref')
+@patch('inspirehep.modules.records.json_ref_loader.record_getter.get_db_record')
+def test_replace_refs_resolves_refs_in_the_resolved_records(get_db_rec, g_p_t_f_r):
+    g_p_t_f_r.return_value = 'pt'
+    records = {
+        '1': {'control_number': 1, 'parent_record': {'$ref': '/api/e/2'}},
+        '2': {'control_number': 2},
+    }
+    get_db_rec.side_effect = lambda pid_type, recid: records[recid]
+
+    config = {'SERVER_NAME': 'http://inspirehep.net'}
+
+    with patch.dict(current_app.config, config):
+        result = replace_refs({'$ref': '/api/e/1'}, 'db')
+
+        assert get_db_rec.call_count == 1
+        assert result['parent_record'] == {'control_number': 2}
+        assert get_db_rec.call_count == 2
+        assert records['1'] == {
+            'control_number': 1,
+            'parent_record': {'$ref': '/api/e/2'},
+        }
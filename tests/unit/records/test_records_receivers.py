@@ -22,8 +22,13 @@
 
 from __future__ import absolute_import, division, print_function
 
+import json
+import os
+from copy import deepcopy
 from uuid import UUID
 
+import pkg_resources
+
 import mock
 
 from inspire_schemas.api import load_schema, validate
@@ -39,8 +44,10 @@ from inspirehep.modules.records.receivers import (
     populate_inspire_document_type,
     populate_recid_from_ref,
     populate_title_suggest,
-    populate_author_count,
-    populate_authors_full_name_unicode_normalized,
+    populate_authors_fields,
+    populate_recid_from_ref_fields,
+    get_ref_fields,
+    _find_ref_fields,
 )
 from inspire_utils.name import generate_name_variations
 
@@ -1139,7 +1146,7 @@ def test_populate_author_count():
     }
     assert validate(record['authors'], subschema) is None
 
-    populate_author_count(None, record)
+    populate_authors_fields(None, record)
 
     assert record['author_count'] == 2
 
@@ -1147,7 +1154,7 @@ def test_populate_author_count():
 def test_populate_author_count_does_nothing_if_record_is_not_literature():
     record = {'$schema': 'http://localhost:5000/schemas/records/other.json'}
 
-    populate_author_count(None, record)
+    populate_authors_fields(None, record)
 
     assert 'author_count' not in record
 
@@ -1169,19 +1176,10 @@ def test_populate_authors_full_name_unicode_normalized():
     }
     assert validate(record['authors'], subschema) is None
 
-    populate_authors_full_name_unicode_normalized(None, record)
+    populate_authors_fields(None, record)
 
-    expected = [
-        {
-            'full_name': u'Müller, J.',
-            'full_name_unicode_normalized': u'müller, j.',
-        },
-        {
-            'full_name': u'Muller, J.',
-            'full_name_unicode_normalized': u'muller, j.',
-        },
-    ]
-    result = record['authors']
+    expected = [u'müller, j.', u'muller, j.']
+    result = [author['full_name_unicode_normalized'] for author in record['authors']]
 
     assert expected == result
 
@@ -1199,7 +1197,7 @@ def test_populate_authors_full_name_unicode_normalized_does_nothing_if_record_is
         ],
     }
 
-    populate_authors_full_name_unicode_normalized(None, record)
+    populate_authors_fields(None, record)
 
     expected = [
         {
@@ -1212,3 +1210,143 @@ def test_populate_authors_full_name_unicode_normalized_does_nothing_if_record_is
     result = record['authors']
 
     assert expected == result
+
+
+def test_populate_authors_fields_populates_name_variations():
+    record = {
+        '$schema': 'http://localhost:5000/records/schemas/hep.json',
+        'authors': [
+            {
+                'full_name': u'Müller, J.',
+            },
+        ],
+    }
+
+    populate_authors_fields(None, record)
+
+    expected = generate_name_variations(u'Müller, J.')
+    result = record['authors'][0]
+
+    assert expected == result['name_variations']
+    assert {'input': [variation for variation in expected if variation]} == result['name_suggest']
+
+
+def test_populate_authors_fields_does_nothing_if_record_is_not_literature():
+    record = {
+        '$schema': 'http://localhost:5000/schemas/records/other.json',
+        'authors': [
+            {
+                'full_name': 'Smith, John',
+            },
+        ],
+    }
+
+    populate_authors_fields(None, record)
+
+    assert 'author_count' not in record
+    assert record['authors'] == [{'full_name': 'Smith, John'}]
+
+
+def test_get_ref_fields():
+    ref_fields = get_ref_fields('hep')
+
+    assert ref_fields['authors'] == {
+        'affiliations': {'record': {}},
+        'record': {},
+    }
+    assert ref_fields['deleted_records'] == {}
+    assert ref_fields['references'] == {'record': {}}
+    assert ref_fields['self'] == {}
+
+
+def test_get_ref_fields_returns_none_for_unknown_schemas():
+    assert get_ref_fields('other') is None
+
+
+def test_populate_recid_from_ref_fields_is_equivalent_to_populate_recid_from_ref():
+    record = {
+        '$schema': 'http://localhost:5000/records/schemas/hep.json',
+        'authors': [
+            {
+                'affiliations': [
+                    {'record': {'$ref': 'http://x/y/1'}},
+                ],
+                'full_name': 'Smith, John',
+                'record': {'$ref': 'http://x/y/2'},
+            },
+        ],
+        'deleted_records': [
+            {'$ref': 'http://x/y/3'},
+        ],
+        'publication_info': [
+            {'journal_record': {'$ref': 'http://x/y/4'}},
+        ],
+        'references': [
+            {'record': {'$ref': 'http://x/y/5'}},
+            {'reference': {'title': {'title': 'Not linked'}}},
+        ],
+        'self': {'$ref': 'http://x/y/6'},
+    }
+    expected = deepcopy(record)
+
+    populate_recid_from_ref(None, expected)
+
+    populate_recid_from_ref_fields(record, get_ref_fields('hep'))
+
+    assert expected == record
+
+
+def test_find_ref_fields_follows_combinators():
+    schema = {
+        'type': 'object',
+        'properties': {
+            'links': {
+                'type': 'array',
+                'items': {
+                    'anyOf': [
+                        {
+                            'type': 'object',
+                            'properties': {
+                                'record': {
+                                    'type': 'object',
+                                    'properties': {'$ref': {'type': 'string'}},
+                                },
+                            },
+                        },
+                        {
+                            'type': 'object',
+                            'properties': {
+                                'value': {'type': 'string'},
+                            },
+                        },
+                    ],
+                },
+            },
+            'owner': {
+                'oneOf': [
+                    {'type': 'string'},
+                    {
+                        'type': 'object',
+                        'properties': {'$ref': {'type': 'string'}},
+                    },
+                ],
+            },
+        },
+    }
+
+    assert _find_ref_fields(schema) == {
+        'links': {'record': {}},
+        'owner': {},
+    }
+
+
+def test_populate_recid_from_ref_fields_is_equivalent_to_populate_recid_from_ref_on_a_record():
+    record = json.loads(pkg_resources.resource_string(
+        __name__, os.path.join('fixtures', '765515.json')))
+    expected = deepcopy(record)
+
+    populate_recid_from_ref(None, expected)
+
+    populate_recid_from_ref_fields(record, get_ref_fields('hep'))
+
+    assert expected == record
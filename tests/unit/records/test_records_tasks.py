@@ -25,7 +25,11 @@ from __future__ import absolute_import, division, print_function
 from flask import current_app
 from mock import patch
 
-from inspirehep.modules.records.tasks import update_links
+from inspirehep.modules.records.tasks import (
+    get_merged_records,
+    schedule_citation_counts_update,
+    update_links,
+)
 
 
 def test_update_links():
@@ -146,3 +150,50 @@ def test_update_links_ignores_non_whitelisted_paths():
                 'record': {'$ref': 'http://localhost:5000/record/1'},
             }
         }
+
+
+@patch('inspirehep.modules.records.tasks.update_citation_counts.apply_async')
+@patch('inspirehep.modules.records.tasks.StrictRedis')
+def test_schedule_citation_counts_update(mock_redis, mock_apply_async):
+    redis = mock_redis.from_url.return_value
+    redis.set.return_value = True
+
+    config = {'INSPIRE_CITATION_COUNTS_UPDATE_WINDOW': 5}
+
+    with patch.dict(current_app.config, config):
+        schedule_citation_counts_update({('lit', '1')})
+
+    redis.sadd.assert_called_once_with('citation_counts_to_update', 'lit:1')
+    mock_apply_async.assert_called_once_with(countdown=5)
+
+
+@patch('inspirehep.modules.records.tasks.update_citation_counts.apply_async')
+@patch('inspirehep.modules.records.tasks.StrictRedis')
+def test_schedule_citation_counts_update_coalesces_updates(mock_redis, mock_apply_async):
+    redis = mock_redis.from_url.return_value
+    redis.set.return_value = None
+
+    schedule_citation_counts_update({('lit', '1'), ('lit', '2')})
+
+    assert redis.sadd.called
+    assert not mock_apply_async.called
+
+
+@patch('inspirehep.modules.records.tasks.StrictRedis')
+def test_schedule_citation_counts_update_does_nothing_without_pids(mock_redis):
+    schedule_citation_counts_update(set())
+
+    assert not mock_redis.from_url.called
+
+
+@patch('inspirehep.modules.records.tasks.InspireRecord.get_records')
+@patch('inspirehep.modules.records.tasks.sliced_scan')
+def test_get_merged_records_scans_in_slices(mock_sliced_scan, mock_get_records):
+    mock_sliced_scan.return_value = iter([{'_id': 'a'}, {'_id': 'b'}])
+    mock_get_records.side_effect = list
+
+    with patch.dict(current_app.config, {'SEARCH_SCAN_SLICES': 4}):
+        result = get_merged_records()
+
+    assert result == ['a', 'b']
+    assert mock_sliced_scan.call_args[1]['slices'] == 4
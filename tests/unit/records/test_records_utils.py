@@ -22,7 +22,12 @@
 
 from __future__ import absolute_import, division, print_function
 
-from inspirehep.modules.records.utils import get_endpoint_from_record
+from mock import patch
+
+from inspirehep.modules.records.utils import (
+    get_cited_pids,
+    get_endpoint_from_record,
+)
 
 
 def test_get_endpoint_from_record():
@@ -43,3 +48,37 @@ def test_get_endpoint_from_record_supports_relative_urls():
     result = get_endpoint_from_record(record)
 
     assert expected == result
+
+
+def test_get_cited_pids():
+    expected = {('lit', '1234'), ('dat', '421')}
+    record = {
+        'references': [
+            {'record': {'$ref': 'http://localhost:5000/api/literature/1234'}},
+            {'reference': {'title': {'title': 'Not linked'}}},
+            {'record': {'$ref': 'http://localhost:5000/api/data/421'}},
+            {'record': {'$ref': 'http://localhost:5000/api/literature/1234'}},
+        ],
+    }
+    result = get_cited_pids(record)
+
+    assert expected == result
+
+
+def test_get_cited_pids_without_references():
+    assert get_cited_pids({}) == set()
+
+
+@patch('inspirehep.modules.records.utils.LOGGER')
+def test_get_cited_pids_skips_references_to_unknown_endpoints(mock_logger):
+    expected = {('lit', '1234')}
+    record = {
+        'references': [
+            {'record': {'$ref': 'http://localhost:5000/api/literature/1234'}},
+            {'record': {'$ref': 'http://localhost:5000/api/unknown/421'}},
+        ],
+    }
+    result = get_cited_pids(record)
+
+    assert expected == result
+    assert mock_logger.warning.called
@@ -22,6 +22,8 @@
 
 from __future__ import absolute_import, division, print_function
 
+from mock import patch
+
 from inspirehep.modules.records.wrappers import LiteratureRecord
 
 
@@ -216,3 +218,59 @@ def test_literature_record_publication_information_no_publication_info():
     record = LiteratureRecord({})
 
     assert not record.publication_information
+
+
+@patch('inspirehep.modules.records.wrappers.replace_refs')
+def test_literature_record_conference_information_resolves_all_refs_at_once(mock_replace_refs):
+    conference = {'control_number': 1, 'titles': [{'title': 'A Conference'}]}
+    proceedings = {'control_number': 2, 'titles': [{'title': 'Proceedings, A Conference'}]}
+    mock_replace_refs.return_value = [
+        {'conference_record': conference, 'parent_record': proceedings},
+        {'conference_record': None, 'parent_record': None},
+    ]
+    record = LiteratureRecord({
+        'publication_info': [
+            {
+                'conference_record': {'$ref': 'http://localhost:5000/api/conferences/1'},
+                'parent_record': {'$ref': 'http://localhost:5000/api/literature/2'},
+                'page_start': '1',
+            },
+            {
+                'artid': '042',
+            },
+        ],
+    })
+
+    expected = [
+        {
+            'conference_recid': 1,
+            'conference_title': 'A Conference',
+            'parent_recid': 2,
+            'parent_title': 'A Conference',
+            'page_start': '1',
+            'page_end': None,
+            'artid': None,
+        },
+        {
+            'conference_recid': None,
+            'conference_title': '',
+            'parent_recid': None,
+            'parent_title': '',
+            'page_start': None,
+            'page_end': None,
+            'artid': '042',
+        },
+    ]
+    result = record.conference_information
+
+    assert expected == result
+    mock_replace_refs.assert_called_once_with([
+        {
+            'conference_record': {'$ref': 'http://localhost:5000/api/conferences/1'},
+            'parent_record': {'$ref': 'http://localhost:5000/api/literature/2'},
+        },
+        {
+            'conference_record': None,
+            'parent_record': None,
+        },
+    ], 'es')
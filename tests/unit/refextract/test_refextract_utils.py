@@ -22,7 +22,12 @@
 
 from __future__ import absolute_import, division, print_function
 
-from inspirehep.modules.refextract.utils import KbWriter
+import os
+
+from flask import current_app
+from mock import patch
+
+from inspirehep.modules.refextract.utils import KbCache, KbWriter
 
 
 def test_kb_writer_two_entries(tmpdir):
@@ -77,3 +82,66 @@ def test_kb_writer_multiple_runs(tmpdir):
     ]
 
     assert expected == kb_file.readlines()
+
+
+def test_kb_cache_copies_each_version_once(tmpdir):
+    kb_file = tmpdir.join('journal-titles.kb')
+    kb_file.write('JOURNAL OF TESTING---J.Testing\n')
+    config = {
+        'REFEXTRACT_JOURNAL_KB_PATH': str(kb_file),
+        'REFEXTRACT_KB_CACHE_DIR': str(tmpdir.mkdir('cache')),
+    }
+
+    with patch.dict(current_app.config, config):
+        kb_cache = KbCache()
+        path = kb_cache.get_path()
+
+        assert path == kb_cache.get_path()
+        assert kb_file.read() == open(path).read()
+
+
+def test_kb_cache_picks_up_new_version_after_invalidate(tmpdir):
+    kb_file = tmpdir.join('journal-titles.kb')
+    kb_file.write('JOURNAL OF TESTING---J.Testing\n')
+    config = {
+        'REFEXTRACT_JOURNAL_KB_PATH': str(kb_file),
+        'REFEXTRACT_KB_CACHE_DIR': str(tmpdir.mkdir('cache')),
+    }
+
+    with patch.dict(current_app.config, config):
+        kb_cache = KbCache()
+        old_path = kb_cache.get_path()
+
+        kb_file.write('JOURNAL OF MORE TESTING---J.More.Testing\n')
+        assert old_path == kb_cache.get_path()
+
+        kb_cache.invalidate()
+        new_path = kb_cache.get_path()
+
+        assert new_path != old_path
+        assert kb_file.read() == open(new_path).read()
+
+
+def test_kb_cache_prunes_old_versions(tmpdir):
+    kb_file = tmpdir.join('journal-titles.kb')
+    kb_file.write('JOURNAL OF TESTING---J.Testing\n')
+    cache_dir = tmpdir.mkdir('cache')
+    stale_kb_file = cache_dir.join('journals-stale.kb')
+    stale_kb_file.write('')
+    stale_kb_file.setmtime(0)
+    config = {
+        'REFEXTRACT_JOURNAL_KB_PATH': str(kb_file),
+        'REFEXTRACT_KB_CACHE_DIR': str(cache_dir),
+    }
+
+    with patch.dict(current_app.config, config):
+        kb_cache = KbCache()
+        old_path = kb_cache.get_path()
+
+        kb_file.write('JOURNAL OF MORE TESTING---J.More.Testing\n')
+        kb_cache.invalidate()
+        new_path = kb_cache.get_path()
+
+        assert not stale_kb_file.check()
+        assert os.path.exists(old_path)
+        assert os.path.exists(new_path)
@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of INSPIRE.
+# Copyright (C) 2018 CERN.
+#
+# INSPIRE is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# INSPIRE is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with INSPIRE. If not, see <http://www.gnu.org/licenses/>.
+#
+# In applying this license, CERN does not waive the privileges and immunities
+# granted to it by virtue of its status as an Intergovernmental Organization
+# or submit itself to any jurisdiction.
+
+
+from __future__ import absolute_import, division, print_function
+
+import pytest
+from mock import patch
+
+from inspirehep.modules.search.scan import sliced_scan
+
+
+def _scan_slices(client, query=None, **kwargs):
+    slice_id = query['slice']['id'] if 'slice' in query else 0
+    if query.get('fail_slice') == slice_id:
+        raise ValueError('Scroll failed')
+
+    for i in range(100):
+        yield {'_id': '{}-{}'.format(slice_id, i), '_source': query.get('_source')}
+
+
+@patch('inspirehep.modules.search.scan.scan', side_effect=_scan_slices)
+def test_sliced_scan_yields_the_hits_of_all_slices(mock_scan):
+    result = list(sliced_scan(None, query={}, slices=4, queue_size=10, source=['control_number']))
+
+    assert sorted(hit['_id'] for hit in result) == sorted(
+        '{}-{}'.format(slice_id, i) for slice_id in range(4) for i in range(100)
+    )
+    assert all(hit['_source'] == ['control_number'] for hit in result)
+    assert sorted(
+        call[1]['query']['slice']['id'] for call in mock_scan.call_args_list
+    ) == [0, 1, 2, 3]
+
+
+@patch('inspirehep.modules.search.scan.scan', side_effect=_scan_slices)
+def test_sliced_scan_with_one_slice_is_a_plain_scan(mock_scan):
+    result = list(sliced_scan(None, query={}, slices=1, index='records-hep'))
+
+    assert len(result) == 100
+    mock_scan.assert_called_once_with(None, query={}, index='records-hep')
+
+
+@patch('inspirehep.modules.search.scan.scan', side_effect=_scan_slices)
+def test_sliced_scan_raises_the_errors_of_the_slices(mock_scan):
+    with pytest.raises(ValueError):
+        list(sliced_scan(None, query={'fail_slice': 2}, slices=4, queue_size=10))
+
+
+@patch('inspirehep.modules.search.scan.scan', side_effect=_scan_slices)
+def test_sliced_scan_stops_the_slices_when_closed(mock_scan):
+    result = sliced_scan(None, query={}, slices=4, queue_size=10)
+
+    assert next(result)
+    result.close()  # Does not hang.
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of INSPIRE.
+# Copyright (C) 2018 CERN.
+#
+# INSPIRE is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# INSPIRE is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with INSPIRE. If not, see <http://www.gnu.org/licenses/>.
+#
+# In applying this license, CERN does not waive the privileges and immunities
+# granted to it by virtue of its status as an Intergovernmental Organization
+# or submit itself to any jurisdiction.
+
+
+from __future__ import absolute_import, division, print_function
+
+from inspirehep.utils.cache import LRUCache
+
+
+def test_lru_cache_evicts_the_least_recently_used_key():
+    cache = LRUCache(maxsize=2)
+
+    cache.set('foo', 1)
+    cache.set('bar', 2)
+    cache.get('foo')
+    cache.set('baz', 3)
+
+    assert 'foo' in cache
+    assert 'bar' not in cache
+    assert 'baz' in cache
+
+
+def test_lru_cache_counts_hits_and_misses():
+    cache = LRUCache(maxsize=2)
+
+    cache.set('foo', 1)
+
+    assert cache.get('foo') == 1
+    assert cache.get('bar') is None
+
+    expected = {
+        'hit_rate': 0.5,
+        'hits': 1,
+        'maxsize': 2,
+        'misses': 1,
+        'size': 1,
+    }
+    result = cache.info()
+
+    assert expected == result
@@ -22,15 +22,21 @@
 
 from __future__ import absolute_import, division, print_function
 
+import json
 import os
 import pkg_resources
 
+import pytest
+from mock import patch
+
 from inspire_schemas.api import load_schema, validate
 from inspirehep.modules.workflows.tasks.refextract import (
     extract_journal_info,
     extract_references_from_pdf,
     extract_references_from_text,
     extract_references_from_raw_ref,
+    get_reference_match_cache,
+    match_references,
 )
 
 from mocks import MockEng, MockObj
@@ -295,3 +301,102 @@ def test_extract_references_from_raw_ref_reference_exists():
     assert validate(result, subschema) is None
     assert len(result) == 1
     assert result[0] == reference
+
+
+@pytest.fixture
+def mocked_es():
+    """Answer the reference matcher searches from a map of values to recids."""
+    recids_by_value = {}
+
+    def _msearch(body):
+        responses = []
+        for query in body[1::2]:
+            serialized_query = json.dumps(query)
+            hits = [
+                {'_source': {'control_number': recid}}
+                for value, recids in recids_by_value.items()
+                if json.dumps(value) in serialized_query
+                for recid in recids
+            ]
+            responses.append({'hits': {'hits': hits}})
+        return {'responses': responses}
+
+    get_reference_match_cache().clear()
+    with patch('inspirehep.modules.workflows.tasks.refextract.es') as es:
+        es.msearch.side_effect = _msearch
+        es.recids_by_value = recids_by_value
+        yield es
+    get_reference_match_cache().clear()
+
+
+def test_match_references_sends_the_queries_of_all_references_together(mocked_es):
+    mocked_es.recids_by_value.update({
+        '10.1103/PhysRevD.77.042001': [1],
+        'hep-th/9711200': [2],
+    })
+    references = [
+        {'reference': {'dois': ['10.1103/PhysRevD.77.042001']}},
+        {'reference': {'arxiv_eprint': 'hep-th/9711200'}},
+    ]
+
+    result = match_references(references)
+
+    assert result[0]['record']['$ref'] == 'http://localhost:5000/api/literature/1'
+    assert result[1]['record']['$ref'] == 'http://localhost:5000/api/literature/2'
+    assert mocked_es.msearch.call_count == 1
+
+
+def test_match_references_falls_back_to_the_previous_matched_record(mocked_es):
+    mocked_es.recids_by_value.update({
+        'hep-th/9711200': [1],
+        'Phys.Rev.': [1, 2],
+    })
+    references = [
+        {'reference': {'arxiv_eprint': 'hep-th/9711200'}},
+        {
+            'reference': {
+                'publication_info': {
+                    'journal_title': 'Phys.Rev.',
+                    'journal_volume': 'D77',
+                    'page_start': '042001',
+                },
+            },
+        },
+    ]
+
+    result = match_references(references)
+
+    assert result[1]['record']['$ref'] == 'http://localhost:5000/api/literature/1'
+    assert not mocked_es.search.called
+
+
+def test_match_references_caches_matches_by_normalized_keys(mocked_es):
+    mocked_es.recids_by_value.update({
+        '10.1103/PhysRevD.77.042001': [1],
+    })
+
+    match_references([{'reference': {'dois': ['10.1103/PhysRevD.77.042001']}}])
+    result = match_references([{'reference': {'dois': ['10.1103/physrevd.77.042001 ']}}])
+
+    assert result[0]['record']['$ref'] == 'http://localhost:5000/api/literature/1'
+    assert mocked_es.msearch.call_count == 1
+
+
+def test_match_references_does_not_use_the_cache_if_a_key_is_not_cached(mocked_es):
+    mocked_es.recids_by_value.update({
+        '10.1103/PhysRevD.77.042001': [1],
+        'hep-th/9711200': [2],
+    })
+
+    match_references([{'reference': {'dois': ['10.1103/PhysRevD.77.042001']}}])
+    result = match_references([
+        {
+            'reference': {
+                'arxiv_eprint': 'hep-th/9711200',
+                'dois': ['10.1103/PhysRevD.77.042001'],
+            },
+        },
+    ])
+
+    assert 'record' not in result[0]
+    assert mocked_es.msearch.call_count == 2
@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of INSPIRE.
+# Copyright (C) 2018 CERN.
+#
+# INSPIRE is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# INSPIRE is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with INSPIRE. If not, see <http://www.gnu.org/licenses/>.
+#
+# In applying this license, CERN does not waive the privileges and immunities
+# granted to it by virtue of its status as an Intergovernmental Organization
+# or submit itself to any jurisdiction.
+
+
+from __future__ import absolute_import, division, print_function
+
+import threading
+
+import pytest
+
+from inspirehep.modules.workflows.utils.dag import Step, run_steps
+
+from mocks import MockEng, MockObj
+
+
+def test_step_raises_on_invalid_key():
+    with pytest.raises(ValueError):
+        Step(lambda obj, eng: None, reads=['title'])
+
+
+def test_step_raises_on_files_in_thread():
+    with pytest.raises(ValueError):
+        Step(lambda obj, eng: None, reads=['files'], in_thread=True)
+
+
+def test_run_steps_runs_independent_steps_concurrently():
+    first_started = threading.Event()
+    second_started = threading.Event()
+
+    def first(obj, eng):
+        first_started.set()
+        assert second_started.wait(5)
+        obj.extra_data['first'] = obj.data['title'].upper()
+
+    def second(obj, eng):
+        second_started.set()
+        assert first_started.wait(5)
+        obj.extra_data['second'] = obj.data['title'].lower()
+
+    obj = MockObj({'title': 'Title'}, {})
+    eng = MockEng()
+
+    run_steps(
+        Step(first, reads=['data.title'], writes=['extra_data.first'], in_thread=True),
+        Step(second, reads=['data.title'], writes=['extra_data.second'], in_thread=True),
+    )(obj, eng)
+
+    assert obj.extra_data == {'first': 'TITLE', 'second': 'title'}
+
+
+def test_run_steps_respects_dependencies():
+    def set_title(obj, eng):
+        obj.data['title'] = 'Updated title'
+
+    def copy_title(obj, eng):
+        obj.extra_data['title'] = obj.data['title']
+
+    def read_copy(obj, eng):
+        obj.data['copy'] = obj.extra_data['title']
+
+    obj = MockObj({'title': 'Title'}, {})
+    eng = MockEng()
+
+    run_steps(
+        Step(set_title, reads=['data.title'], writes=['data.title']),
+        Step(copy_title, reads=['data.title'], writes=['extra_data.title'], in_thread=True),
+        Step(read_copy, reads=['extra_data.title'], writes=['data.copy']),
+    )(obj, eng)
+
+    assert obj.data == {'title': 'Updated title', 'copy': 'Updated title'}
+
+
+def test_run_steps_only_gives_declared_keys_to_steps_in_threads():
+    def read_undeclared(obj, eng):
+        obj.extra_data['has_abstract'] = 'abstract' in obj.data
+
+    obj = MockObj({'title': 'Title', 'abstract': 'Abstract'}, {})
+    eng = MockEng()
+
+    run_steps(
+        Step(read_undeclared, reads=['data.title'], writes=['extra_data.has_abstract'], in_thread=True),
+    )(obj, eng)
+
+    assert obj.extra_data == {'has_abstract': False}
+
+
+def test_run_steps_skips_steps_whose_condition_is_false():
+    def mark(obj, eng):
+        obj.extra_data['marked'] = True
+
+    obj = MockObj({}, {})
+    eng = MockEng()
+
+    run_steps(
+        Step(mark, writes=['extra_data.marked'], condition=lambda obj, eng: False),
+        Step(mark, writes=['extra_data.marked'], condition=lambda obj, eng: False, in_thread=True),
+    )(obj, eng)
+
+    assert obj.extra_data == {}
+
+
+def test_run_steps_reraises_after_other_steps_are_done():
+    def fail(obj, eng):
+        raise ValueError('Step failed')
+
+    def succeed(obj, eng):
+        obj.extra_data['succeeded'] = True
+
+    obj = MockObj({}, {})
+    eng = MockEng()
+
+    with pytest.raises(ValueError):
+        run_steps(
+            Step(fail, writes=['extra_data.failed'], in_thread=True),
+            Step(succeed, writes=['extra_data.succeeded'], in_thread=True),
+        )(obj, eng)
+
+    assert obj.extra_data == {'succeeded': True}
+
+
+def test_run_steps_reraises_when_a_local_step_fails():
+    def fail(obj, eng):
+        raise ValueError('Step failed')
+
+    with pytest.raises(ValueError):
+        run_steps(Step(fail))(MockObj({}, {}), MockEng())
+
+
+def test_run_steps_waits_for_steps_in_threads_when_a_local_step_fails():
+    thread_started = threading.Event()
+
+    def fail(obj, eng):
+        assert thread_started.wait(5)
+        raise ValueError('Step failed')
+
+    def succeed(obj, eng):
+        thread_started.set()
+        obj.extra_data['succeeded'] = True
+
+    obj = MockObj({}, {})
+    eng = MockEng()
+
+    with pytest.raises(ValueError):
+        run_steps(
+            Step(succeed, writes=['extra_data.succeeded'], in_thread=True),
+            Step(fail),
+        )(obj, eng)
+
+    assert obj.extra_data == {'succeeded': True}
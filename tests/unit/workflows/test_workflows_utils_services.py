@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of INSPIRE.
+# Copyright (C) 2018 CERN.
+#
+# INSPIRE is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# INSPIRE is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with INSPIRE. If not, see <http://www.gnu.org/licenses/>.
+#
+# In applying this license, CERN does not waive the privileges and immunities
+# granted to it by virtue of its status as an Intergovernmental Organization
+# or submit itself to any jurisdiction.
+
+
+from __future__ import absolute_import, division, print_function
+
+import threading
+import time
+
+import pytest
+import requests
+import requests_mock
+from mock import patch
+
+from inspirehep.modules.workflows.utils.services import (
+    CircuitBreaker,
+    ServiceClient,
+    ServiceUnavailable,
+    get_endpoint,
+)
+
+
+@pytest.fixture
+def config():
+    return {
+        'WORKFLOWS_SERVICES_TIMEOUT': 1,
+        'WORKFLOWS_SERVICES_RETRIES': 2,
+        'WORKFLOWS_SERVICES_BACKOFF': 0,
+        'WORKFLOWS_SERVICES_POOL_SIZE': 2,
+        'WORKFLOWS_SERVICES_CIRCUIT_BREAKER_THRESHOLD': 2,
+        'WORKFLOWS_SERVICES_CIRCUIT_BREAKER_TIMEOUT': 60,
+        'WORKFLOWS_SERVICES_COALESCE_WINDOW': None,
+    }
+
+
+def test_circuit_breaker_opens_after_threshold_and_lets_a_trial_through():
+    breaker = CircuitBreaker(threshold=2, reset_timeout=60)
+
+    breaker.record_failure()
+    assert breaker.allow()
+
+    breaker.record_failure()
+    assert not breaker.allow()
+
+    with patch('inspirehep.modules.workflows.utils.services.time.time', return_value=time.time() + 61):
+        assert breaker.allow()
+        assert not breaker.allow()
+
+    breaker.record_success()
+    assert breaker.allow()
+
+
+def test_service_client_retries_server_errors(config):
+    client = ServiceClient(config)
+
+    with requests_mock.Mocker() as requests_mocker:
+        requests_mocker.register_uri(
+            'POST', 'http://example.org/api', [
+                {'status_code': 503},
+                {'exc': requests.exceptions.ConnectTimeout},
+                {'json': {'foo': 'bar'}},
+            ])
+
+        assert client.post_json('http://example.org/api', {}) == {'foo': 'bar'}
+        assert requests_mocker.call_count == 3
+
+
+def test_service_client_fails_fast_when_circuit_is_open(config):
+    client = ServiceClient(config)
+
+    with requests_mock.Mocker() as requests_mocker:
+        requests_mocker.register_uri(
+            'POST', 'http://example.org/api',
+            exc=requests.exceptions.ConnectionError,
+        )
+
+        for _ in range(2):
+            with pytest.raises(requests.exceptions.ConnectionError):
+                client.post_json('http://example.org/api', {})
+        with pytest.raises(ServiceUnavailable):
+            client.post_json('http://example.org/api', {})
+
+        assert requests_mocker.call_count == 6
+
+
+def test_service_client_coalesces_identical_requests(config):
+    config['WORKFLOWS_SERVICES_COALESCE_WINDOW'] = 1
+    client = ServiceClient(config)
+
+    def slow_response(request, context):
+        time.sleep(0.1)
+        return {'foo': 'bar'}
+
+    with requests_mock.Mocker() as requests_mocker:
+        requests_mocker.register_uri('POST', 'http://example.org/api', json=slow_response)
+
+        results = []
+        threads = [
+            threading.Thread(
+                target=lambda: results.append(client.post_json('http://example.org/api', {'text': 'foo'}))
+            ) for _ in range(3)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert results == [{'foo': 'bar'}] * 3
+        assert requests_mocker.call_count == 1
+
+
+def test_get_endpoint():
+    assert get_endpoint('https://example.org/api/predict?foo=bar') == 'https://example.org/api/predict'
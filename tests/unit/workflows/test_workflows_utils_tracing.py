@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of INSPIRE.
+# Copyright (C) 2018 CERN.
+#
+# INSPIRE is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# INSPIRE is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with INSPIRE. If not, see <http://www.gnu.org/licenses/>.
+#
+# In applying this license, CERN does not waive the privileges and immunities
+# granted to it by virtue of its status as an Intergovernmental Organization
+# or submit itself to any jurisdiction.
+
+
+from __future__ import absolute_import, division, print_function
+
+from mock import patch
+from workflow.patterns.controlflow import IF, IF_ELSE
+
+from inspirehep.modules.workflows.utils.dag import Step, run_steps
+from inspirehep.modules.workflows.utils.tracing import (
+    CountingRequestsHttpConnection,
+    _calls,
+    count_http_call,
+    trace_step,
+    trace_steps,
+)
+
+from mocks import MockEng, MockObj
+
+
+def is_true(obj, eng):
+    return True
+
+
+def first_step(obj, eng):
+    obj.extra_data['first'] = True
+
+
+def second_step(obj, eng):
+    obj.extra_data['second'] = True
+
+
+@patch('inspirehep.modules.workflows.utils.tracing.db')
+def test_trace_step_stores_timing(mock_db, app):
+    obj = MockObj({}, {})
+    eng = MockEng()
+
+    with patch.dict(app.config, {'WORKFLOWS_TRACE_STEPS': True}):
+        trace_step('article')(first_step)(obj, eng)
+
+    timing = mock_db.session.add.call_args[0][0]
+    assert obj.extra_data == {'first': True}
+    assert timing.object_id == obj.id
+    assert timing.workflow == 'article'
+    assert timing.step == 'first_step'
+    assert timing.wall_time >= 0
+
+
+def test_trace_steps_names_steps():
+    workflow = trace_steps([
+        first_step,
+        IF(is_true, [second_step]),
+        IF_ELSE(is_true, first_step, [second_step]),
+    ], 'article')
+
+    assert workflow[0].__name__ == 'first_step'
+    assert workflow[0]._traced
+    assert workflow[1][0]._traced
+    assert workflow[1][1][0]._traced
+    assert workflow[2][0]._traced
+    assert workflow[2][1]._traced
+    assert not getattr(workflow[2][2], '_traced', False)
+
+
+@patch('inspirehep.modules.workflows.utils.tracing._store_timing')
+def test_trace_steps_names_control_flow_after_condition(mock_store_timing, app):
+    workflow = trace_steps([IF(is_true, [second_step])], 'article')
+
+    with patch.dict(app.config, {'WORKFLOWS_TRACE_STEPS': True}):
+        try:
+            workflow[0](MockObj({}, {}), MockEng())
+        except Exception:
+            pass  # the engine is needed to jump to the branch
+
+    assert mock_store_timing.call_args[0][2] == 'IF(is_true)'
+
+
+def test_trace_steps_traces_local_steps_of_run_steps():
+    local_step = Step(first_step, writes=['extra_data.first'])
+    thread_step = Step(second_step, writes=['extra_data.second'], in_thread=True)
+
+    trace_steps([run_steps(local_step, thread_step)], 'article')
+
+    assert local_step.task._traced
+    assert not getattr(thread_step.task, '_traced', False)
+
+
+@patch('inspirehep.modules.workflows.utils.tracing.db')
+def test_trace_step_is_disabled_by_default(mock_db):
+    trace_step('article')(first_step)(MockObj({}, {}), MockEng())
+
+    mock_db.session.add.assert_not_called()
+
+
+def test_count_http_call():
+    before = _calls['http']
+
+    count_http_call(None)
+
+    assert _calls['http'] == before + 1
+
+
+@patch('elasticsearch.RequestsHttpConnection.perform_request', return_value=(200, {}, '{}'))
+def test_counting_requests_http_connection(mock_perform_request):
+    before = _calls['es']
+
+    result = CountingRequestsHttpConnection().perform_request('GET', '/')
+
+    assert result == (200, {}, '{}')
+    assert _calls['es'] == before + 1